@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import time
+from array import array
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Current conditions older than this are fetched again rather than served from the cache
+WEATHER_MAX_AGE = float(os.getenv("WEATHER_MAX_AGE_SECONDS", "3600"))
+# Forecasts older than this are fetched again when asked for
+FORECAST_MAX_AGE = float(os.getenv("FORECAST_MAX_AGE_SECONDS", "21600"))
+FORECAST_CACHE_PATH = os.getenv("FORECAST_CACHE_PATH", "forecast_cache.json")
+
+
+def city_key(city: str) -> str:
+    return " ".join(city.casefold().split())
+
+
+class CityForecast:
+    """
+    A city's forecast as compact columns: one array per quantity, indexed by
+    time slot (start + i * step, UTC seconds), rather than a dict per slot.
+    Descriptions are stored once per city and referenced by index.
+    """
+
+    __slots__ = ("name", "city_id", "tz_offset", "fetched_at", "start", "step",
+                 "temp", "pop", "precip", "code", "label", "labels")
+
+    def __init__(self, name: str, city_id: int | None, tz_offset: int, fetched_at: float, start: int, step: int):
+        self.name = name
+        self.city_id = city_id
+        self.tz_offset = tz_offset
+        self.fetched_at = fetched_at
+        self.start = start
+        self.step = step
+        self.temp = array("f")    # °C
+        self.pop = array("f")     # Probability of precipitation, 0..1
+        self.precip = array("f")  # Rain and snow over the slot, mm
+        self.code = array("H")    # OpenWeatherMap condition code
+        self.label = array("B")   # Index into labels
+        self.labels: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.temp)
+
+    @classmethod
+    def from_owm(cls, data: dict, fetched_at: float) -> "CityForecast":
+        """Builds the series from an OpenWeatherMap /forecast response (3-hour slots)."""
+        slots = data.get("list") or []
+        city = data.get("city") or {}
+        start = slots[0]["dt"] if slots else 0
+        step = slots[1]["dt"] - slots[0]["dt"] if len(slots) > 1 else 3 * 3600
+        forecast = cls(city.get("name", ""), city.get("id"), city.get("timezone", 0), fetched_at, start, step)
+        for slot in slots:
+            weather = (slot.get("weather") or [{}])[0]
+            description = weather.get("description", "")
+            if description not in forecast.labels:
+                forecast.labels.append(description)
+            forecast.temp.append(slot.get("main", {}).get("temp", 0.0))
+            forecast.pop.append(slot.get("pop", 0.0))
+            forecast.precip.append((slot.get("rain") or {}).get("3h", 0.0) + (slot.get("snow") or {}).get("3h", 0.0))
+            forecast.code.append(weather.get("id", 0))
+            forecast.label.append(forecast.labels.index(description))
+        return forecast
+
+    def at(self, timestamp: float) -> dict | None:
+        """Returns the slot nearest to a UTC timestamp, or None outside the forecast."""
+        index = round((timestamp - self.start) / self.step)
+        if not 0 <= index < len(self):
+            return None
+        return {
+            "time": self.start + index * self.step,
+            "temp": self.temp[index],
+            "pop": self.pop[index],
+            "precip": self.precip[index],
+            "description": self.labels[self.label[index]],
+            # Condition groups 2xx-6xx are thunderstorms, drizzle, rain and snow
+            "wet": self.precip[index] > 0 or 200 <= self.code[index] < 700,
+        }
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name, "city_id": self.city_id, "tz_offset": self.tz_offset,
+            "fetched_at": self.fetched_at, "start": self.start, "step": self.step,
+            "temp": self.temp.tolist(), "pop": self.pop.tolist(), "precip": self.precip.tolist(),
+            "code": self.code.tolist(), "label": self.label.tolist(), "labels": self.labels,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "CityForecast":
+        forecast = cls(data["name"], data["city_id"], data["tz_offset"], data["fetched_at"], data["start"], data["step"])
+        for column, typecode in (("temp", "f"), ("pop", "f"), ("precip", "f"), ("code", "H"), ("label", "B")):
+            setattr(forecast, column, array(typecode, data[column]))
+        forecast.labels = data["labels"]
+        return forecast
+
+
+class ForecastCache:
+    """
+    Forecasts and current conditions per city, filled in batch by the
+    prefetch job and read by weather requests.
+
+    The cache is saved to a JSON file after every batch; other processes
+    (e.g. workers that do not run the job) reload it when the file changes.
+    Upstream calls are counted by kind, so their number per user and day
+    can be reported.
+    """
+
+    def __init__(self, path: str | None = FORECAST_CACHE_PATH, clock=time.time):
+        self.path = path or None
+        self.clock = clock
+        self.forecasts: dict[str, CityForecast] = {}
+        # city key -> (fetched_at, description, temperature)
+        self.current: dict[str, tuple[float, str, float]] = {}
+        self.counters = Counter()
+        self._loaded_mtime = None
+
+    def _reload_if_changed(self) -> None:
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.forecasts = {key: CityForecast.from_json(value) for key, value in data["forecasts"].items()}
+            self.current = {key: tuple(value) for key, value in data["current"].items()}
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Error loading forecast cache: %s", e)
+        self._loaded_mtime = mtime
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"forecasts": {key: value.to_json() for key, value in self.forecasts.items()},
+                           "current": self.current}, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.error("Error saving forecast cache: %s", e)
+
+    def get_current(self, city: str) -> tuple[str, float] | None:
+        """Returns the cached (description, temperature) of a city if fresh enough."""
+        self._reload_if_changed()
+        entry = self.current.get(city_key(city))
+        if entry is None or self.clock() - entry[0] > WEATHER_MAX_AGE:
+            self.counters["current_misses"] += 1
+            return None
+        self.counters["current_hits"] += 1
+        return entry[1], entry[2]
+
+    def put_current(self, city: str, description: str, temp: float) -> None:
+        self.current[city_key(city)] = (self.clock(), description, temp)
+
+    def get_forecast(self, city: str) -> CityForecast | None:
+        """Returns the cached forecast of a city if fresh enough."""
+        self._reload_if_changed()
+        forecast = self.forecasts.get(city_key(city))
+        if forecast is None or self.clock() - forecast.fetched_at > FORECAST_MAX_AGE:
+            self.counters["forecast_misses"] += 1
+            return None
+        self.counters["forecast_hits"] += 1
+        return forecast
+
+    def put_forecast(self, city: str, forecast: CityForecast) -> None:
+        self.forecasts[city_key(city)] = forecast
+
+    def record_call(self, kind: str) -> None:
+        """Counts one request to OpenWeatherMap ('forecast', 'group' or 'current')."""
+        self.counters[f"calls_{kind}"] += 1
+
+    def upstream_calls(self) -> int:
+        return sum(count for name, count in self.counters.items() if name.startswith("calls_"))
+
+    def metrics(self) -> dict:
+        return {"cities": len(self.forecasts), **self.counters}
+
+
+forecast_cache = ForecastCache()
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import re
+
+import aiohttp
+
+from core.resilience import ServiceUnavailableError, get_service
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+
+
+def _normalize_address(address: str) -> str:
+    return re.sub(r"\s+", " ", address.strip().casefold())
+
+
+class StubGeocoder:
+    """
+    Offline geocoder that looks addresses up in a fixed table, e.g. for tests
+    or when no network geocoding is allowed.
+    """
+
+    def __init__(self, coordinates: dict | None = None, path: str | None = None):
+        """
+        Args:
+            coordinates: address -> (lat, lon).
+            path: Optional JSON file with the same mapping (values as [lat, lon]).
+        """
+        table = dict(coordinates or {})
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                table.update(json.load(f))
+        self._table = {_normalize_address(address): tuple(point) for address, point in table.items()}
+
+    async def geocode(self, address: str) -> tuple[float, float] | None:
+        return self._table.get(_normalize_address(address))
+
+
+class NominatimGeocoder:
+    """Geocodes addresses with the OpenStreetMap Nominatim search API."""
+
+    def __init__(self, url: str = NOMINATIM_URL, country_codes: str = "sk", timeout: float = 10.0):
+        self.url = url
+        self.country_codes = country_codes
+        self.service = get_service("nominatim", timeout=timeout)
+
+    async def geocode(self, address: str) -> tuple[float, float] | None:
+        params = {"q": address, "format": "json", "limit": 1, "countrycodes": self.country_codes}
+        # Nominatim's usage policy requires an identifying User-Agent.
+        headers = {"User-Agent": "gemini-personal-assistant"}
+        async with aiohttp.ClientSession() as session:
+            async def fetch():
+                async with session.get(self.url, params=params, headers=headers) as response:
+                    response.raise_for_status()
+                    return await response.json()
+
+            try:
+                results = await self.service.call(fetch)
+            except (aiohttp.ClientError, ServiceUnavailableError) as e:
+                logger.warning("Error geocoding address '%s': %s", address, e)
+                return None
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+
+class CachingGeocoder:
+    """
+    Wraps another geocoder and remembers its answers (including "not found")
+    in memory and, optionally, in a JSON file shared across restarts.
+    """
+
+    def __init__(self, geocoder, path: str | None = None):
+        self.geocoder = geocoder
+        self.path = path
+        self._cache: dict = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._cache = {key: tuple(value) if value else None for key, value in json.load(f).items()}
+            except (json.JSONDecodeError, IOError) as e:
+                logger.error("Error loading geocoding cache: %s", e)
+        self.hits = 0
+        self.misses = 0
+
+    async def geocode(self, address: str) -> tuple[float, float] | None:
+        key = _normalize_address(address)
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        point = await self.geocoder.geocode(address)
+        self._cache[key] = point
+        self._save()
+        return point
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._cache, f, ensure_ascii=False)
+        except IOError as e:
+            logger.error("Error saving geocoding cache: %s", e)
+
+
+_geocoder = None
+
+
+def get_geocoder():
+    """
+    Returns the configured geocoder, wrapped in a cache. GEOCODER selects the
+    backend: 'nominatim' (default) or 'stub' (reads GEOCODER_STUB_PATH).
+    """
+    global _geocoder
+    if _geocoder is None:
+        if os.getenv("GEOCODER", "nominatim").lower() == "stub":
+            backend = StubGeocoder(path=os.getenv("GEOCODER_STUB_PATH"))
+        else:
+            backend = NominatimGeocoder()
+        _geocoder = CachingGeocoder(backend, os.getenv("GEOCODE_CACHE_PATH", "geocode_cache.json"))
+    return _geocoder
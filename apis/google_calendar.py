@@ -1,17 +1,27 @@
+import asyncio
+import logging
 import os
 import datetime
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from typing import TYPE_CHECKING
+
 from bot.user_data import get_user_data
 
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
 CLIENT_SECRETS_FILE = "client_secrets.json"
 
-def _get_credentials(user_id: int) -> Credentials | None:
-    """Builds Google API credentials from a stored refresh token."""
-    refresh_token = get_user_data(user_id, 'google_refresh_token')
+def _get_credentials(user_id: int, refresh_token: str | None = None) -> "Credentials | None":
+    """Builds Google API credentials from the given or the stored refresh token."""
+    refresh_token = refresh_token or get_user_data(user_id, 'google_refresh_token')
     if not refresh_token:
         return None
 
+    # The Google client libraries are slow to import, so load them on first use
+    from google.oauth2.credentials import Credentials
+
     # Scopes must match the ones used during authorization
     scopes = ['https://www.googleapis.com/auth/calendar.readonly']
 
@@ -22,7 +32,7 @@ def _get_credentials(user_id: int) -> Credentials | None:
         # Note: A more robust implementation would cache this file.
         import json
         with open(CLIENT_SECRETS_FILE, 'r') as f:
-            secrets = json.load()['installed']
+            secrets = json.load(f)['installed']
 
         credentials = Credentials(
             token=None,  # No access token, it will be refreshed
@@ -34,27 +44,36 @@ def _get_credentials(user_id: int) -> Credentials | None:
         )
         return credentials
     except Exception as e:
-        print(f"Error building credentials: {e}")
+        logger.error("Error building credentials: %s", e)
         return None
 
 
-async def get_first_event_for_day(user_id: int, target_day: datetime.date) -> dict | None:
+async def get_first_event_for_day(user_id: int, target_day: datetime.date, refresh_token: str | None = None) -> dict | None:
     """
     Fetches the first Google Calendar event for a user on a specific day.
 
     Args:
         user_id: The ID of the user.
         target_day: The date to check for events.
+        refresh_token: The user's refresh token, if already loaded (batch jobs);
+            read from the user data otherwise.
 
     Returns:
         A dictionary with event details {'summary': str, 'start': str} or None.
     """
-    credentials = _get_credentials(user_id)
+    credentials = _get_credentials(user_id, refresh_token)
     if not credentials:
-        print(f"No credentials found for user {user_id}")
+        logger.info("No credentials found", extra={"user_id": user_id})
         # This could also return a specific error message string
         return None
 
+    # The Google client is blocking, so it runs in a thread and calendars of several users can be read at once
+    return await asyncio.to_thread(_first_event_for_day, credentials, target_day)
+
+
+def _first_event_for_day(credentials: "Credentials", target_day: datetime.date) -> dict | None:
+    from googleapiclient.discovery import build
+
     try:
         service = build('calendar', 'v3', credentials=credentials)
 
@@ -84,5 +103,5 @@ async def get_first_event_for_day(user_id: int, target_day: datetime.date) -> di
         }
 
     except Exception as e:
-        print(f"An error occurred with Google Calendar API: {e}")
+        logger.error("An error occurred with Google Calendar API: %s", e)
         return None
@@ -0,0 +1,260 @@
+import bisect
+import csv
+import io
+import logging
+import os
+import zipfile
+from array import array
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_gtfs_time(value: str) -> int:
+    """Converts a GTFS 'HH:MM:SS' time (hours may exceed 24) to seconds after midnight."""
+    hours, minutes, seconds = (int(part) for part in value.strip().split(":"))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+GTFS_TABLES = ["stops.txt", "trips.txt", "stop_times.txt", "calendar.txt", "calendar_dates.txt"]
+
+
+def open_gtfs_tables(path: str, names: list = GTFS_TABLES) -> dict:
+    """Reads GTFS text files from a .zip archive or a directory into lists of rows."""
+    tables = {}
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            available = set(archive.namelist())
+            for name in names:
+                if name in available:
+                    with archive.open(name) as f:
+                        tables[name] = list(csv.DictReader(io.TextIOWrapper(f, encoding="utf-8-sig")))
+    else:
+        for name in names:
+            file_path = os.path.join(path, name)
+            if os.path.exists(file_path):
+                with open(file_path, encoding="utf-8-sig", newline="") as f:
+                    tables[name] = list(csv.DictReader(f))
+    return tables
+
+
+class Timetable:
+    """
+    A GTFS timetable flattened into elementary connections (one vehicle
+    moving from one stop to the next), stored column-wise in arrays and
+    sorted by departure time.
+    """
+
+    def __init__(self, stop_ids: list, stop_names: list, connections: list, trip_services: list, services: dict):
+        """
+        Args:
+            stop_ids: GTFS stop_id for every stop index.
+            stop_names: Stop name for every stop index.
+            connections: (dep_time, arr_time, dep_stop, arr_stop, trip) tuples.
+            trip_services: Service index for every trip index.
+            services: GTFS service_id -> (weekday flags, start date, end date, added dates, removed dates).
+        """
+        self.stop_ids = stop_ids
+        self.stop_names = stop_names
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+        self._stops_by_name: dict = {}
+        for i, name in enumerate(stop_names):
+            self._stops_by_name.setdefault(name.casefold(), []).append(i)
+
+        connections.sort()
+        self.dep_time = array("i", (c[0] for c in connections))
+        self.arr_time = array("i", (c[1] for c in connections))
+        self.dep_stop = array("i", (c[2] for c in connections))
+        self.arr_stop = array("i", (c[3] for c in connections))
+        self.trip = array("i", (c[4] for c in connections))
+        self.trip_service = array("i", trip_services)
+        self.services = services
+        self.service_ids = list(services.keys())
+        self._active_cache: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.dep_time)
+
+    def stops_named(self, name: str) -> list[int]:
+        """Returns the indexes of all stops (e.g. platforms) with the given name."""
+        return self._stops_by_name.get(name.strip().casefold(), [])
+
+    def stops_for(self, stop: str) -> list[int]:
+        """
+        Returns the stop indexes for a GTFS stop_id or a stop name. A stop_id
+        expands to every platform that shares its name.
+        """
+        index = self.stop_index.get(stop)
+        if index is not None:
+            return self.stops_named(self.stop_names[index])
+        return self.stops_named(stop)
+
+    def _active_services(self, day: date) -> bytearray:
+        """Returns a flag per service index telling whether it runs on `day`."""
+        active = self._active_cache.get(day)
+        if active is None:
+            active = bytearray(len(self.service_ids))
+            for i, service_id in enumerate(self.service_ids):
+                weekdays, start, end, added, removed = self.services[service_id]
+                runs = start <= day <= end and weekdays[day.weekday()]
+                active[i] = (runs or day in added) and day not in removed
+            if len(self._active_cache) > 14:
+                self._active_cache.clear()
+            self._active_cache[day] = active
+        return active
+
+    def latest_departure(self, origins: list[int], destinations: list[int], arrive_by: datetime) -> datetime | None:
+        """
+        Finds the latest departure from any origin stop that reaches any
+        destination stop no later than `arrive_by`, using a reverse Connection
+        Scan: connections are scanned by decreasing departure time while keeping,
+        for every stop, the latest time one may be there and still arrive in time.
+
+        Args:
+            origins: Stop indexes to depart from.
+            destinations: Stop indexes to arrive at.
+            arrive_by: The latest acceptable arrival (naive local time).
+
+        Returns:
+            The departure datetime, or None if there is no such journey that day.
+        """
+        if not origins or not destinations:
+            return None
+
+        day = arrive_by.date()
+        deadline = arrive_by.hour * 3600 + arrive_by.minute * 60 + arrive_by.second
+        active = self._active_services(day)
+
+        unreachable = -1
+        latest_at = [unreachable] * len(self.stop_ids)
+        for stop in destinations:
+            latest_at[stop] = deadline
+        origin_set = set(origins)
+        if origin_set & set(destinations):
+            return arrive_by
+
+        trip_usable = bytearray(len(self.trip_service))
+        dep_time, arr_time = self.dep_time, self.arr_time
+        dep_stop, arr_stop = self.dep_stop, self.arr_stop
+        trip, trip_service = self.trip, self.trip_service
+
+        # Connections departing after the deadline cannot help.
+        for i in range(bisect.bisect_right(dep_time, deadline) - 1, -1, -1):
+            t = trip[i]
+            if not active[trip_service[t]]:
+                continue
+            if trip_usable[t] or arr_time[i] <= latest_at[arr_stop[i]]:
+                trip_usable[t] = 1
+                stop = dep_stop[i]
+                if dep_time[i] > latest_at[stop]:
+                    latest_at[stop] = dep_time[i]
+                    if stop in origin_set:
+                        # Scanning backwards in time, the first origin hit is the latest one.
+                        return datetime.combine(day, datetime.min.time()) + timedelta(seconds=dep_time[i])
+        return None
+
+
+def load_timetable(path: str) -> Timetable:
+    """
+    Loads a GTFS feed (a .zip file or a directory of .txt files).
+
+    Args:
+        path: Location of the feed.
+
+    Returns:
+        The timetable built from stops, trips, stop_times and calendar data.
+    """
+    tables = open_gtfs_tables(path)
+
+    stop_ids, stop_names = [], []
+    for row in tables.get("stops.txt", []):
+        stop_ids.append(row["stop_id"])
+        stop_names.append(row.get("stop_name", row["stop_id"]))
+    stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+
+    services: dict = {}
+    for row in tables.get("calendar.txt", []):
+        weekdays = [row[day] == "1" for day in
+                    ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")]
+        start = datetime.strptime(row["start_date"], "%Y%m%d").date()
+        end = datetime.strptime(row["end_date"], "%Y%m%d").date()
+        services[row["service_id"]] = (weekdays, start, end, set(), set())
+    for row in tables.get("calendar_dates.txt", []):
+        service = services.setdefault(row["service_id"], ([False] * 7, date.max, date.min, set(), set()))
+        day = datetime.strptime(row["date"], "%Y%m%d").date()
+        (service[3] if row["exception_type"] == "1" else service[4]).add(day)
+    service_index = {service_id: i for i, service_id in enumerate(services)}
+
+    trip_index, trip_services = {}, []
+    for row in tables.get("trips.txt", []):
+        if row["service_id"] not in service_index:
+            continue
+        trip_index[row["trip_id"]] = len(trip_services)
+        trip_services.append(service_index[row["service_id"]])
+
+    stop_times: dict = {}
+    for row in tables.get("stop_times.txt", []):
+        trip = trip_index.get(row["trip_id"])
+        stop = stop_index.get(row["stop_id"])
+        if trip is None or stop is None:
+            continue
+        stop_times.setdefault(trip, []).append((
+            int(row["stop_sequence"]),
+            _parse_gtfs_time(row["arrival_time"] or row["departure_time"]),
+            _parse_gtfs_time(row["departure_time"] or row["arrival_time"]),
+            stop,
+        ))
+
+    connections = []
+    for trip, calls in stop_times.items():
+        calls.sort()
+        for (_, _, departure, from_stop), (_, arrival, _, to_stop) in zip(calls, calls[1:]):
+            connections.append((departure, arrival, from_stop, to_stop, trip))
+
+    return Timetable(stop_ids, stop_names, connections, trip_services, services)
+
+
+_timetable: Timetable | None = None
+_timetable_loaded = False
+
+
+def get_timetable() -> Timetable | None:
+    """
+    Returns the timetable from the GTFS feed at GTFS_PATH, loading it on first
+    use, or None if no feed is configured or it cannot be read.
+    """
+    global _timetable, _timetable_loaded
+    if not _timetable_loaded:
+        _timetable_loaded = True
+        path = os.getenv("GTFS_PATH")
+        if path:
+            try:
+                _timetable = load_timetable(path)
+                logger.info("Loaded GTFS timetable with %d connections from %s", len(_timetable), path)
+            except (OSError, KeyError, ValueError) as e:
+                logger.error("Error loading GTFS feed from %s: %s", path, e)
+    return _timetable
+
+
+def find_latest_departure_offline(origin_stop: str, dest_stop: str, arrival_time: datetime) -> str | None:
+    """
+    Finds the latest departure time using the local GTFS timetable.
+
+    Args:
+        origin_stop: The stop_id or name of the starting stop.
+        dest_stop: The stop_id or name of the destination stop.
+        arrival_time: The desired arrival time.
+
+    Returns:
+        The latest departure time as "HH:MM", or None if no timetable is
+        loaded, a stop is unknown, or there is no connection.
+    """
+    timetable = get_timetable()
+    if timetable is None:
+        return None
+    departure = timetable.latest_departure(
+        timetable.stops_for(origin_stop),
+        timetable.stops_for(dest_stop),
+        arrival_time.replace(tzinfo=None),
+    )
+    return departure.strftime("%H:%M") if departure else None
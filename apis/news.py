@@ -1,6 +1,49 @@
+import logging
 import os
 import aiohttp
 
+from core.config import config
+from core.resilience import ServiceUnavailableError, get_service
+
+logger = logging.getLogger(__name__)
+
+NEWS_URL = "https://newsapi.org/v2/top-headlines"
+news_service = get_service("newsapi", timeout=config.settings.api_timeout_seconds)
+config.subscribe(lambda settings: setattr(news_service, "timeout", settings.api_timeout_seconds))
+
+# Map user-friendly categories to API categories
+CATEGORY_MAP = {
+    "world": "general",
+    "technology": "technology",
+}
+
+
+async def fetch_headlines(session: aiohttp.ClientSession, category: str, api_key: str, page_size: int | None = None) -> list[dict]:
+    """
+    Fetches the top articles of a category (through the resilient service),
+    news_page_size (a setting) of them unless `page_size` is given.
+
+    Raises:
+        ServiceUnavailableError, aiohttp.ClientError: The request failed.
+    """
+    params = {
+        "category": CATEGORY_MAP.get(category.lower(), "general"),
+        "country": "us",  # Fetching top headlines from a major region
+        "pageSize": page_size or config.settings.news_page_size,
+        "apiKey": api_key
+    }
+
+    async def fetch():
+        async with session.get(NEWS_URL, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    data = await news_service.call(fetch)
+    if data.get("status") != "ok":
+        return []
+    return data.get("articles") or []
+
+
 async def get_news(category: str) -> str:
     """
     Fetches top news headlines for a given category from NewsAPI.org.
@@ -9,46 +52,30 @@ async def get_news(category: str) -> str:
     if not api_key:
         return "Ошибка: Ключ для API новостей не найден."
 
-    # Map user-friendly categories to API categories
-    category_map = {
-        "world": "general",
-        "technology": "technology",
-    }
-    api_category = category_map.get(category.lower(), "general")
-
-    base_url = "https://newsapi.org/v2/top-headlines"
-    params = {
-        "category": api_category,
-        "country": "us",  # Fetching top headlines from a major region
-        "pageSize": 5,    # Get top 5 articles
-        "apiKey": api_key
-    }
-
     async with aiohttp.ClientSession() as session:
         try:
-            async with session.get(base_url, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-
-                if data.get("status") != "ok" or not data.get("articles"):
-                    return f"Не удалось получить новости в категории '{category}'. Попробуйте позже."
+            articles = await fetch_headlines(session, category, api_key)
 
-                articles = data["articles"]
+            if not articles:
+                return f"Не удалось получить новости в категории '{category}'. Попробуйте позже."
 
-                # Format the response
-                response_lines = [f"Вот 5 главных новостей в категории '{category}':\n"]
-                for article in articles:
-                    title = article.get('title', 'Без заголовка')
-                    url = article.get('url', '')
-                    response_lines.append(f"- {title}")
-                    if url:
-                        response_lines.append(f"  {url}")
+            # Format the response
+            response_lines = [f"Вот {len(articles)} главных новостей в категории '{category}':\n"]
+            for article in articles:
+                title = article.get('title', 'Без заголовка')
+                url = article.get('url', '')
+                response_lines.append(f"- {title}")
+                if url:
+                    response_lines.append(f"  {url}")
 
-                return "\n".join(response_lines)
+            return "\n".join(response_lines)
 
+        except ServiceUnavailableError as e:
+            logger.warning("News API unavailable: %s", e)
+            return "Сервис новостей сейчас не отвечает. Пожалуйста, попробуйте позже."
         except aiohttp.ClientError as e:
-            print(f"Error fetching news data: {e}")
+            logger.error("Error fetching news data: %s", e)
             return "Произошла ошибка при запросе новостей. Пожалуйста, попробуйте еще раз."
         except Exception as e:
-            print(f"An unexpected error occurred in get_news: {e}")
+            logger.exception("An unexpected error occurred in get_news")
             return "Произошла непредвиденная ошибка при получении новостей."
@@ -0,0 +1,229 @@
+import csv
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from itertools import chain
+
+from apis.gtfs import open_gtfs_tables
+
+logger = logging.getLogger(__name__)
+
+
+def fold(text: str) -> str:
+    """
+    Normalizes a stop name for matching: strips diacritics (so "Kamenné
+    námestie" and "kamenne namestie" are equal), casefolds and collapses
+    punctuation and whitespace.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r"[\W_]+", " ", stripped.casefold()).strip()
+
+
+def trigrams(folded: str) -> set:
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def levenshtein(a: str, b: str, max_distance: int | None = None) -> int:
+    """
+    Returns the edit distance between two strings. With `max_distance`, only
+    a diagonal band of the table is computed and max_distance + 1 is returned
+    as soon as the distance is known to exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is None:
+        max_distance = len(a)
+    if len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    too_far = max_distance + 1
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= max_distance else too_far
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return too_far
+        previous = current
+    return min(previous[-1], too_far)
+
+
+@dataclass
+class Stop:
+    """A stop as users refer to it: one name, possibly several platforms (stop IDs)."""
+    name: str
+    stop_ids: list
+    folded: str
+
+    @property
+    def stop_id(self) -> str:
+        """The canonical stop ID that is stored for the user."""
+        return self.stop_ids[0]
+
+
+class StopIndex:
+    """
+    In-memory index for resolving user-typed stop names.
+
+    A trie over every word-start of the folded names answers prefix queries
+    ("mlyn" -> "Mlynské nivy", "Mlynská dolina"), and a trigram inverted index
+    finds candidates for misspelled names, which are ranked by edit distance.
+    """
+
+    def __init__(self, stops: list[tuple[str, str]]):
+        """
+        Args:
+            stops: (stop_id, stop_name) pairs. Stops that share a name are merged.
+        """
+        by_folded: dict = {}
+        for stop_id, name in stops:
+            folded = fold(name)
+            if not folded:
+                continue
+            if folded in by_folded:
+                by_folded[folded].stop_ids.append(stop_id)
+            else:
+                by_folded[folded] = Stop(name=name, stop_ids=[stop_id], folded=folded)
+        self.stops = list(by_folded.values())
+        self._by_folded = {stop.folded: i for i, stop in enumerate(self.stops)}
+        self._by_id = {stop_id: i for i, stop in enumerate(self.stops) for stop_id in stop.stop_ids}
+
+        self._trie: dict = {}
+        self._trigrams: dict = {}
+        for i, stop in enumerate(self.stops):
+            words = stop.folded.split(" ")
+            for start in range(len(words)):
+                node = self._trie
+                for ch in " ".join(words[start:]):
+                    node = node.setdefault(ch, {})
+                    node.setdefault("$", set()).add(i)
+            for gram in trigrams(stop.folded):
+                self._trigrams.setdefault(gram, set()).add(i)
+
+    def __len__(self) -> int:
+        return len(self.stops)
+
+    def get(self, stop_id: str) -> Stop | None:
+        index = self._by_id.get(stop_id)
+        return self.stops[index] if index is not None else None
+
+    def prefix_matches(self, query: str) -> list[Stop]:
+        """Returns the stops that have a word sequence starting with the query."""
+        return [self.stops[i] for i in self._prefix_indexes(fold(query))]
+
+    def _prefix_indexes(self, folded: str) -> list[int]:
+        node = self._trie
+        for ch in folded:
+            node = node.get(ch)
+            if node is None:
+                return []
+        return sorted(node.get("$", ()), key=lambda i: self.stops[i].folded)
+
+    def suggest(self, query: str, limit: int = 3) -> list[Stop]:
+        """
+        Returns up to `limit` stops that best match the query, exact and
+        prefix matches first, then by edit distance among trigram candidates.
+        """
+        folded = fold(query)
+        if not folded:
+            return []
+        ranked: list = []
+        if folded in self._by_folded:
+            ranked.append(self._by_folded[folded])
+        ranked.extend(i for i in self._prefix_indexes(folded) if i not in ranked)
+        seen = set(ranked)
+        if len(ranked) < limit:
+            ranked.extend(i for i, _ in self._fuzzy_candidates(folded) if i not in seen)
+        return [self.stops[i] for i in ranked[:limit]]
+
+    def resolve(self, query: str) -> Stop | None:
+        """
+        Resolves a user-typed name to a single stop, or returns None if it is
+        unknown or ambiguous. Accepts exact names (ignoring case and
+        diacritics), a prefix that matches only one stop, and small typos.
+        """
+        folded = fold(query)
+        if not folded:
+            return None
+        if folded in self._by_folded:
+            return self.stops[self._by_folded[folded]]
+        prefixed = self._prefix_indexes(folded)
+        if len(prefixed) == 1:
+            return self.stops[prefixed[0]]
+        if prefixed:
+            return None
+
+        # Accept a typo only if it is close and clearly closer than the runner-up.
+        max_typos = max(1, len(folded) // 6)
+        candidates = self._fuzzy_candidates(folded, max_typos)
+        if candidates and candidates[0][1] <= max_typos and (len(candidates) == 1 or candidates[1][1] > candidates[0][1]):
+            return self.stops[candidates[0][0]]
+        return None
+
+    def _fuzzy_candidates(self, folded: str, max_distance: int | None = None, pool: int = 20) -> list:
+        """Returns (stop index, edit distance) pairs sorted by distance."""
+        query_grams = trigrams(folded)
+        shared = Counter(chain.from_iterable(self._trigrams.get(gram, ()) for gram in query_grams))
+        best = shared.most_common(pool)
+        if max_distance is not None:
+            # Every edit destroys at most three trigrams, so closer names share at least this many.
+            min_shared = len(query_grams) - 3 * max_distance
+            best = [(i, count) for i, count in best if count >= min_shared]
+        scored = []
+        for i, _ in best:
+            distance = levenshtein(folded, self.stops[i].folded, max_distance)
+            if max_distance is None or distance <= max_distance:
+                scored.append((i, distance))
+        scored.sort(key=lambda item: (item[1], self.stops[item[0]].folded))
+        return scored
+
+
+def load_stop_index(path: str) -> StopIndex:
+    """
+    Builds a stop index from a GTFS stops.txt file, or from a GTFS feed
+    (.zip or directory) containing one.
+    """
+    if path.endswith(".txt"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = open_gtfs_tables(path, ["stops.txt"]).get("stops.txt", [])
+    return StopIndex([(row["stop_id"], row["stop_name"]) for row in rows])
+
+
+_stop_index: StopIndex | None = None
+_stop_index_loaded = False
+
+
+def get_stop_index() -> StopIndex | None:
+    """
+    Returns the stop index from STOPS_PATH (or the GTFS feed at GTFS_PATH),
+    loading it on first use, or None if no stop list is configured.
+    """
+    global _stop_index, _stop_index_loaded
+    if not _stop_index_loaded:
+        _stop_index_loaded = True
+        path = os.getenv("STOPS_PATH") or os.getenv("GTFS_PATH")
+        if path:
+            try:
+                _stop_index = load_stop_index(path)
+            except (OSError, KeyError) as e:
+                logger.error("Error loading stop list from %s: %s", path, e)
+    return _stop_index
@@ -0,0 +1,187 @@
+import csv
+import logging
+import math
+import os
+
+import numpy as np
+
+from apis.gtfs import open_gtfs_tables
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE_LAT = 110_574.0
+METERS_PER_DEGREE_LON_AT_EQUATOR = 111_320.0
+
+
+class StopLocator:
+    """
+    Nearest-stop search over stop coordinates.
+
+    Coordinates are projected to local meters (equirectangular around the
+    stops' mean latitude, accurate enough within a country) and bucketed into
+    a uniform grid stored as NumPy arrays sorted by cell key. Single queries
+    search grid rings outwards; batches are computed with vectorized
+    distance matrices.
+    """
+
+    def __init__(self, stop_ids: list, names: list, lats, lons, cell_size: float = 500.0):
+        """
+        Args:
+            stop_ids: GTFS stop_id of every stop.
+            names: Name of every stop.
+            lats: Latitudes in degrees.
+            lons: Longitudes in degrees.
+            cell_size: Grid cell size in meters.
+        """
+        self.stop_ids = list(stop_ids)
+        self.names = list(names)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        self.cell_size = cell_size
+        self._ref_lat = float(lats.mean()) if len(lats) else 0.0
+        self._meters_per_lon = METERS_PER_DEGREE_LON_AT_EQUATOR * math.cos(math.radians(self._ref_lat))
+
+        self.xy = self._project(lats, lons)
+        self._origin = self.xy.min(axis=0) if len(self.xy) else np.zeros(2)
+        cells = self._cells(self.xy)
+        self._grid_width = int(cells[:, 1].max()) + 1 if len(cells) else 1
+        keys = cells[:, 0] * self._grid_width + cells[:, 1]
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+        self._max_cell = cells.max(axis=0) if len(cells) else np.zeros(2, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.stop_ids)
+
+    def _project(self, lats, lons) -> np.ndarray:
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        return np.column_stack((lons * self._meters_per_lon, lats * METERS_PER_DEGREE_LAT))
+
+    def _cells(self, xy: np.ndarray) -> np.ndarray:
+        return np.floor((xy - self._origin) / self.cell_size).astype(np.int64)
+
+    def _cell_members(self, cx: int, cy: int) -> np.ndarray:
+        if not (0 <= cx <= self._max_cell[0] and 0 <= cy < self._grid_width):
+            return self._order[:0]
+        key = cx * self._grid_width + cy
+        start = np.searchsorted(self._keys, key, side="left")
+        end = np.searchsorted(self._keys, key, side="right")
+        return self._order[start:end]
+
+    def nearest(self, lat: float, lon: float, k: int = 3) -> list[tuple[int, float]]:
+        """
+        Returns up to k (stop index, distance in meters) pairs, nearest first.
+        """
+        if not len(self):
+            return []
+        k = min(k, len(self))
+        point = self._project([lat], [lon])[0]
+        cx, cy = (int(c) for c in np.floor((point - self._origin) / self.cell_size))
+        max_x, max_y = (int(c) for c in self._max_cell)
+        max_ring = max(abs(cx), abs(cy), abs(max_x - cx), abs(max_y - cy))
+
+        found = []
+        for ring in range(max_ring + 1):
+            for dx in range(-ring, ring + 1):
+                for dy in range(-ring, ring + 1):
+                    if max(abs(dx), abs(dy)) == ring:
+                        found.append(self._cell_members(cx + dx, cy + dy))
+            candidates = np.concatenate(found)
+            # Stops in cells not visited yet are at least `ring` cells away.
+            if len(candidates) >= k:
+                distances = np.hypot(*(self.xy[candidates] - point).T)
+                nearest = np.argsort(distances, kind="stable")[:k]
+                if distances[nearest[-1]] <= ring * self.cell_size or ring == max_ring:
+                    return [(int(candidates[i]), float(distances[i])) for i in nearest]
+        return []
+
+    def nearest_many(self, lats, lons, k: int = 3, chunk_size: int = 1024) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest stops for many points at once.
+
+        Returns:
+            (indexes, distances) arrays of shape (points, k), nearest first.
+        """
+        points = self._project(lats, lons) - self._origin
+        stops = self.xy - self._origin
+        stop_norms = (stops * stops).sum(axis=1)
+        k = min(k, len(self))
+        indexes = np.empty((len(points), k), dtype=np.int64)
+        distances = np.empty((len(points), k), dtype=np.float64)
+        for start in range(0, len(points), chunk_size):
+            block = points[start:start + chunk_size]
+            # |p - s|^2 = |p|^2 + |s|^2 - 2 p.s, the (block, stops) matrix as one matrix product
+            squared = (block * block).sum(axis=1)[:, None] + stop_norms[None, :] - 2 * block @ stops.T
+            top = np.argpartition(squared, k - 1, axis=1)[:, :k] if k < len(self) else np.argsort(squared, axis=1)
+            # Exact distances for the few candidates, free of the expansion's rounding
+            top_distances = np.hypot(*(stops[top] - block[:, None, :]).transpose(2, 0, 1))
+            order = np.argsort(top_distances, axis=1, kind="stable")
+            indexes[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+            distances[start:start + len(block)] = np.take_along_axis(top_distances, order, axis=1)
+        return indexes, distances
+
+    def nearest_stops(self, lat: float, lon: float, k: int = 3) -> list[dict]:
+        """
+        Returns the k nearest distinct stops (platforms sharing a name count
+        once) as dicts with 'stop_id', 'name' and 'distance_m'.
+        """
+        return self._distinct(self.nearest(lat, lon, k * 4), k)
+
+    def _distinct(self, pairs, k: int) -> list[dict]:
+        result, seen = [], set()
+        for index, distance in pairs:
+            name = self.names[index]
+            if name in seen:
+                continue
+            seen.add(name)
+            result.append({"stop_id": self.stop_ids[index], "name": name, "distance_m": round(float(distance))})
+            if len(result) == k:
+                break
+        return result
+
+    def nearest_stops_many(self, points: list[tuple[float, float]], k: int = 3) -> list[list[dict]]:
+        """Batch version of nearest_stops() for (lat, lon) points."""
+        if not points or not len(self):
+            return [[] for _ in points]
+        lats, lons = zip(*points)
+        indexes, distances = self.nearest_many(lats, lons, k * 4)
+        return [self._distinct(zip(row_indexes, row_distances), k) for row_indexes, row_distances in zip(indexes, distances)]
+
+
+def load_stop_locator(path: str) -> StopLocator:
+    """Builds a locator from the coordinates in a GTFS stops.txt (or a feed containing one)."""
+    if path.endswith(".txt"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = open_gtfs_tables(path, ["stops.txt"]).get("stops.txt", [])
+    rows = [row for row in rows if row.get("stop_lat") and row.get("stop_lon")]
+    return StopLocator(
+        [row["stop_id"] for row in rows],
+        [row["stop_name"] for row in rows],
+        [float(row["stop_lat"]) for row in rows],
+        [float(row["stop_lon"]) for row in rows],
+    )
+
+
+_stop_locator: StopLocator | None = None
+_stop_locator_loaded = False
+
+
+def get_stop_locator(reload: bool = False) -> StopLocator | None:
+    """
+    Returns the locator for the stop list at STOPS_PATH (or GTFS_PATH),
+    loading it on first use (or again with `reload`, after the stop list
+    was updated), or None if no stop list is configured.
+    """
+    global _stop_locator, _stop_locator_loaded
+    if reload or not _stop_locator_loaded:
+        _stop_locator_loaded = True
+        path = os.getenv("STOPS_PATH") or os.getenv("GTFS_PATH")
+        if path:
+            try:
+                _stop_locator = load_stop_locator(path)
+            except (OSError, KeyError, ValueError) as e:
+                logger.error("Error loading stop coordinates from %s: %s", path, e)
+    return _stop_locator
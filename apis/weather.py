@@ -1,6 +1,26 @@
+import asyncio
+import logging
 import os
 import aiohttp
 
+from apis.forecast_cache import CityForecast, city_key, forecast_cache
+from core.config import config
+from core.resilience import ServiceUnavailableError, get_service
+
+logger = logging.getLogger(__name__)
+
+WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+FORECAST_URL = "http://api.openweathermap.org/data/2.5/forecast"
+# Current conditions of up to GROUP_SIZE cities (by ID) in one request
+GROUP_URL = "http://api.openweathermap.org/data/2.5/group"
+GROUP_SIZE = 20
+weather_service = get_service("openweathermap", timeout=config.settings.api_timeout_seconds)
+config.subscribe(lambda settings: setattr(weather_service, "timeout", settings.api_timeout_seconds))
+
+
+def format_weather(location: str, description: str, temp) -> str:
+    return f"Погода в городе {location}: {description.capitalize()}. Температура: {temp}°C."
+
 async def get_weather(location: str) -> str:
     """
     Fetches the current weather for a given location from OpenWeatherMap.
@@ -9,7 +29,11 @@ async def get_weather(location: str) -> str:
     if not api_key:
         return "Error: OpenWeather API key not found."
 
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
+    # Saved cities are refreshed in batch by the prefetch job
+    cached = forecast_cache.get_current(location)
+    if cached:
+        return format_weather(location, *cached)
+
     params = {
         "q": location,
         "appid": api_key,
@@ -18,22 +42,120 @@ async def get_weather(location: str) -> str:
     }
 
     async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(base_url, params=params) as response:
+        async def fetch():
+            async with session.get(WEATHER_URL, params=params) as response:
                 response.raise_for_status()  # Raise an exception for bad status codes
+                return await response.json()
 
-                data = await response.json()
-
-                description = data.get("weather", [{}])[0].get("description", "нет данных")
-                temp = data.get("main", {}).get("temp", "??")
+        try:
+            # Slow requests are hedged, and a failing API is skipped for a while
+            forecast_cache.record_call("current")
+            data = await weather_service.call(fetch)
 
-                # Capitalize the first letter of the description
-                description = description.capitalize()
+            description = data.get("weather", [{}])[0].get("description", "нет данных")
+            temp = data.get("main", {}).get("temp", "??")
 
-                return f"Погода в городе {location}: {description}. Температура: {temp}°C."
+            return format_weather(location, description, temp)
 
+        except ServiceUnavailableError as e:
+            logger.warning("Weather API unavailable: %s", e)
+            return "Сервис погоды сейчас не отвечает. Пожалуйста, попробуйте позже."
         except aiohttp.ClientError as e:
             # Provide error messages in Russian
             return f"Ошибка при запросе погоды: {e}"
         except Exception as e:
             return f"An unexpected error occurred: {e}"
+
+
+async def _get_json(session: aiohttp.ClientSession, url: str, params: dict):
+    async def fetch():
+        async with session.get(url, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    return await weather_service.call(fetch)
+
+
+async def fetch_forecast(session: aiohttp.ClientSession, city: str, api_key: str) -> CityForecast:
+    """Fetches a city's 5-day forecast in 3-hour slots."""
+    forecast_cache.record_call("forecast")
+    data = await _get_json(session, FORECAST_URL, {"q": city, "appid": api_key, "units": "metric", "lang": "ru"})
+    return CityForecast.from_owm(data, forecast_cache.clock())
+
+
+async def fetch_current_group(session: aiohttp.ClientSession, city_ids: list[int], api_key: str) -> dict[int, dict]:
+    """Fetches the current conditions of up to GROUP_SIZE cities by ID in one request."""
+    forecast_cache.record_call("group")
+    params = {"id": ",".join(map(str, city_ids)), "appid": api_key, "units": "metric", "lang": "ru"}
+    data = await _get_json(session, GROUP_URL, params)
+    return {entry["id"]: entry for entry in data.get("list", [])}
+
+
+async def prefetch_forecasts(cities: list[str]) -> int:
+    """
+    Fetches the forecasts and current conditions of the given cities into the
+    forecast cache, and saves it.
+
+    Forecasts have no batch endpoint, so they are requested once per distinct
+    city, forecast_concurrency (a setting) at a time; current conditions are requested for
+    GROUP_SIZE cities at a time with the IDs the forecasts return.
+
+    Returns:
+        The number of upstream requests made.
+    """
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        logger.warning("OPENWEATHER_API_KEY is not set; forecasts are not prefetched")
+        return 0
+    unique = list({city_key(city): city for city in cities}.values())
+    calls_before = forecast_cache.upstream_calls()
+    semaphore = asyncio.Semaphore(config.settings.forecast_concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def load(city: str) -> CityForecast | None:
+            async with semaphore:
+                try:
+                    forecast = await fetch_forecast(session, city, api_key)
+                except (aiohttp.ClientError, ServiceUnavailableError, asyncio.TimeoutError) as e:
+                    logger.warning("Could not fetch the forecast for %s: %s", city, e)
+                    return None
+            forecast_cache.put_forecast(city, forecast)
+            return forecast
+
+        forecasts = await asyncio.gather(*(load(city) for city in unique))
+        by_id = {forecast.city_id: city for city, forecast in zip(unique, forecasts) if forecast and forecast.city_id}
+        ids = list(by_id)
+        for start in range(0, len(ids), GROUP_SIZE):
+            try:
+                current = await fetch_current_group(session, ids[start:start + GROUP_SIZE], api_key)
+            except (aiohttp.ClientError, ServiceUnavailableError, asyncio.TimeoutError) as e:
+                logger.warning("Could not fetch current conditions: %s", e)
+                continue
+            for city_id, entry in current.items():
+                if city_id in by_id:
+                    description = (entry.get("weather") or [{}])[0].get("description", "нет данных")
+                    forecast_cache.put_current(by_id[city_id], description, entry.get("main", {}).get("temp", "??"))
+
+    forecast_cache.save()
+    return forecast_cache.upstream_calls() - calls_before
+
+
+async def get_forecast(city: str) -> CityForecast | None:
+    """
+    Returns a city's forecast from the cache, fetching (and caching) it when
+    the city was not prefetched. Returns None if it cannot be fetched.
+    """
+    forecast = forecast_cache.get_forecast(city)
+    if forecast is not None:
+        return forecast
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        return None
+    async with aiohttp.ClientSession() as session:
+        try:
+            forecast = await fetch_forecast(session, city, api_key)
+        except (aiohttp.ClientError, ServiceUnavailableError, asyncio.TimeoutError) as e:
+            logger.warning("Could not fetch the forecast for %s: %s", city, e)
+            return None
+    forecast_cache.put_forecast(city, forecast)
+    return forecast
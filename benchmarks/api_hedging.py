@@ -0,0 +1,76 @@
+"""
+Benchmark of hedged requests against a stub API with a long latency tail.
+
+Starts a local HTTP server that answers most requests after --fast-ms and
+a --slow-share of them after --slow-ms, then sends N sequential GETs
+through ResilientService with hedging off and on, and reports p50/p95/p99
+latency and the share of duplicate requests sent.
+
+Usage:
+    python -m benchmarks.api_hedging [--requests 300] [--fast-ms 40] [--slow-ms 1500] [--slow-share 0.05]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from core.resilience import ResilientService
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(args) -> None:
+    rng = random.Random(42)
+
+    async def handle(request: web.Request) -> web.Response:
+        slow = rng.random() < args.slow_share
+        await asyncio.sleep((args.slow_ms if slow else args.fast_ms * rng.uniform(0.8, 1.2)) / 1000)
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    server = TestServer(app)
+    await server.start_server()
+    url = str(server.make_url("/"))
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            async def fetch():
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    return await response.json()
+
+            for label, hedges in (("No hedging", 0), ("Hedged", 1)):
+                service = ResilientService("stub", timeout=10, max_hedges=hedges)
+                latencies = []
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    await service.call(fetch)
+                    latencies.append(time.perf_counter() - started)
+                print(f"{label:<11} p50 {statistics.median(latencies) * 1000:6.0f} ms, "
+                      f"p95 {percentile(latencies, 0.95) * 1000:6.0f} ms, "
+                      f"p99 {percentile(latencies, 0.99) * 1000:6.0f} ms, "
+                      f"extra requests {service.counters['hedges'] / args.requests:.1%}")
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--fast-ms", type=float, default=40)
+    parser.add_argument("--slow-ms", type=float, default=1500)
+    parser.add_argument("--slow-share", type=float, default=0.05)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark of batched forecast prefetching.
+
+Starts a local OpenWeatherMap stub (forecast, group and current-conditions
+endpoints, each answering after --latency-ms) and simulates a day of
+weather questions from --users users whose saved cities follow a skewed
+distribution over --cities cities:
+
+- on demand: every question makes one current-conditions request;
+- prefetch: prefetch_forecasts runs every --refresh-minutes for the
+  distinct saved cities, and questions are answered from the cache.
+
+Reports upstream requests per user per day and the answer latency of each.
+
+Usage:
+    python -m benchmarks.forecast_prefetch [--users 2000] [--cities 50] [--questions 3] [--refresh-minutes 60] [--latency-ms 80]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from apis import weather
+from apis.forecast_cache import ForecastCache
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def start_stub(latency: float) -> TestServer:
+    def city_id(name: str) -> int:
+        return int(name.removeprefix("City"))
+
+    async def current(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        return web.json_response({"weather": [{"description": "ясно"}], "main": {"temp": 12.0}})
+
+    async def forecast(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        start = int(time.time()) // 10800 * 10800
+        return web.json_response({
+            "city": {"id": city_id(request.query["q"]), "name": request.query["q"], "timezone": 0},
+            "list": [{"dt": start + i * 10800, "main": {"temp": 10.0}, "weather": [{"id": 800, "description": "ясно"}],
+                      "pop": 0.0} for i in range(40)],
+        })
+
+    async def group(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        return web.json_response({"list": [
+            {"id": int(city), "weather": [{"description": "ясно"}], "main": {"temp": 12.0}}
+            for city in request.query["id"].split(",")
+        ]})
+
+    app = web.Application()
+    app.router.add_get("/weather", current)
+    app.router.add_get("/forecast", forecast)
+    app.router.add_get("/group", group)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+async def ask_all(cities: list[str], questions: int) -> list[float]:
+    latencies = []
+    for _ in range(questions):
+        for city in cities:
+            started = time.perf_counter()
+            await weather.get_weather(city)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run(args) -> None:
+    rng = random.Random(42)
+    # A few large cities hold most users, as with real saved cities
+    weights = [1 / (rank + 1) for rank in range(args.cities)]
+    cities = [f"City{rng.choices(range(1, args.cities + 1), weights)[0]}" for _ in range(args.users)]
+    runs_per_day = 24 * 60 / args.refresh_minutes
+    server = await start_stub(args.latency_ms / 1000)
+
+    try:
+        with tempfile.TemporaryDirectory() as directory, \
+             patch.dict(os.environ, {"OPENWEATHER_API_KEY": "bench"}), \
+             patch("apis.weather.WEATHER_URL", str(server.make_url("/weather"))), \
+             patch("apis.weather.FORECAST_URL", str(server.make_url("/forecast"))), \
+             patch("apis.weather.GROUP_URL", str(server.make_url("/group"))):
+            cache = ForecastCache(None)
+            with patch("apis.weather.forecast_cache", cache):
+                on_demand = await ask_all(cities, args.questions)
+            on_demand_calls = cache.upstream_calls()
+
+            cache = ForecastCache(os.path.join(directory, "forecast_cache.json"))
+            with patch("apis.weather.forecast_cache", cache):
+                started = time.perf_counter()
+                calls = await weather.prefetch_forecasts(cities)
+                prefetch_time = time.perf_counter() - started
+                cached = await ask_all(cities, args.questions)
+
+        print(f"{args.users} users, {len(set(cities))} distinct cities, {args.questions} questions per user per day")
+        for label, calls_per_day, latencies in (
+            ("On demand", on_demand_calls, on_demand),
+            ("Prefetch", calls * runs_per_day + cache.counters["calls_current"], cached),
+        ):
+            print(f"{label:<10} {calls_per_day / args.users:7.3f} calls per user per day, "
+                  f"answer p50 {statistics.median(latencies) * 1000:7.2f} ms, "
+                  f"p95 {percentile(latencies, 0.95) * 1000:7.2f} ms")
+        print(f"One prefetch run: {calls} calls in {prefetch_time * 1000:.0f} ms")
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=3, help="Weather questions per user per day")
+    parser.add_argument("--refresh-minutes", type=int, default=60)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
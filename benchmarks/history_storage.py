@@ -0,0 +1,83 @@
+"""
+Benchmark of conversation history storage.
+
+Builds N users with long histories and compares, for the previous format
+(lists of Gemini messages in an indent=4 JSON file) and the encoded History
+records (compact JSON, uncompressed and zlib-compressed):
+
+- size of user_data.json;
+- time to parse the file;
+- memory held by the parsed histories (tracemalloc).
+
+Usage:
+    python -m benchmarks.history_storage [--users 2000] [--turns 100] [--words 40]
+"""
+import argparse
+import base64
+import json
+import random
+import time
+import tracemalloc
+
+from bot.history import History
+
+WORDS = ("погода", "завтра", "автобус", "остановка", "Bratislava", "пара", "университет", "новости",
+         "календарь", "встреча", "дождь", "зонт", "Zochova", "расписание", "когда", "сколько", "minút")
+
+
+def make_histories(users: int, turns: int, words: int) -> dict[str, History]:
+    rng = random.Random(3)
+    histories = {}
+    for user_id in range(users):
+        history = History()
+        for i in range(turns):
+            history.append("user" if i % 2 == 0 else "model", " ".join(rng.choices(WORDS, k=words)))
+        histories[str(user_id)] = history
+    return histories
+
+
+def measure(text: str, decode) -> tuple[float, int]:
+    """Returns the seconds to parse `text` and the memory the parsed histories take."""
+    started = time.perf_counter()
+    decode(json.loads(text))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    parsed = decode(json.loads(text))
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del parsed
+    return elapsed, held
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--words", type=int, default=40, help="Words per message")
+    args = parser.parse_args()
+    histories = make_histories(args.users, args.turns, args.words)
+
+    def encoded(compression: str) -> str:
+        return json.dumps({user: {"history": base64.b64encode(h.encode(compression=compression)).decode("ascii")}
+                           for user, h in histories.items()}, separators=(",", ":"))
+
+    def load_histories(data: dict) -> dict:
+        return {user: History.loads(value["history"]) for user, value in data.items()}
+
+    formats = {
+        "Gemini dicts, indent=4": (
+            json.dumps({user: {"history": h.to_gemini()} for user, h in histories.items()}, ensure_ascii=False, indent=4),
+            lambda data: {user: value["history"] for user, value in data.items()},
+        ),
+        "History, uncompressed": (encoded("none"), load_histories),
+        "History, zlib": (encoded("zlib"), load_histories),
+    }
+    print(f"{args.users} users x {args.turns} turns of {args.words} words")
+    for label, (text, decode) in formats.items():
+        elapsed, held = measure(text, decode)
+        print(f"  {label:<24} file {len(text.encode('utf-8')) / 2**20:7.1f} MiB, "
+              f"parse {elapsed:6.2f} s, in memory {held / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
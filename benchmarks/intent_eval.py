@@ -0,0 +1,111 @@
+"""
+Evaluation of dynamic few-shot example selection for intent detection.
+
+Compares the static intent prompt with prompts built from the k examples
+most similar to each message, on the labeled messages in
+benchmarks/intent_eval.json (which do not occur in the example bank):
+
+- prompt size in estimated tokens, including a static prompt holding the
+  whole example bank;
+- offline retrieval quality: how often the retrieved examples cover every
+  intent of the message, and how often the nearest example has its intents;
+- with --llm (needs GEMINI_API_KEY), intent accuracy of Gemini with each prompt.
+
+Usage:
+    python -m benchmarks.intent_eval [--k 4] [--llm]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from core.example_retriever import get_retriever, load_examples
+from core.intent_detector import (
+    INTENT_INSTRUCTIONS,
+    INTENT_PROMPT,
+    build_intent_prompt,
+    format_example,
+    intents_of,
+)
+from core.llm_gateway import estimate_tokens
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "intent_eval.json")
+
+
+def intent_names(intents: list[dict]) -> list[str]:
+    return sorted(item["intent"] for item in intents)
+
+
+def with_message(prompt: str, text: str) -> str:
+    # The same framing detect_intent() uses
+    return f"{prompt}\nUser: \"{text}\"\n"
+
+
+async def llm_accuracy(cases: list[dict], make_prompt) -> tuple[float, float]:
+    """Returns (accuracy, mean seconds per call) of Gemini with the given prompt builder."""
+    from core.intent_detector import get_model
+
+    model = get_model()
+    correct, durations = 0, []
+    for case in cases:
+        started = time.perf_counter()
+        try:
+            response = await model.generate_content_async(with_message(make_prompt(case["text"]), case["text"]))
+            text = response.text.strip().replace('```json', '').replace('```', '').strip()
+            predicted = intents_of(json.loads(text))
+        except Exception as e:
+            print(f"  {case['text']!r}: {e}")
+            predicted = []
+        durations.append(time.perf_counter() - started)
+        correct += intent_names(predicted) == intent_names(case["intents"])
+    return correct / len(cases), statistics.fmean(durations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--llm", action="store_true", help="Also measure Gemini's accuracy (uses the API)")
+    args = parser.parse_args()
+
+    with open(EVAL_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+    bank = load_examples()
+    retriever = get_retriever()
+
+    full_bank_prompt = INTENT_INSTRUCTIONS + "\nHere are some examples:\n" + "\n\n".join(map(format_example, bank)) + "\n"
+    sizes = {
+        "static prompt": [estimate_tokens(with_message(INTENT_PROMPT, c["text"])) for c in cases],
+        "whole bank": [estimate_tokens(with_message(full_bank_prompt, c["text"])) for c in cases],
+        f"top-{args.k}": [estimate_tokens(with_message(build_intent_prompt(c["text"], args.k), c["text"])) for c in cases],
+    }
+    print(f"{len(cases)} labeled messages, example bank of {len(bank)}")
+    for label, tokens in sizes.items():
+        print(f"  {label:<14} ~{statistics.fmean(tokens):5.0f} prompt tokens")
+
+    covered = nearest_correct = 0
+    started = time.perf_counter()
+    for case in cases:
+        examples = retriever.top_k(case["text"], args.k)
+        retrieved = {item["intent"] for example in examples for item in example["intents"]}
+        covered += set(intent_names(case["intents"])) <= retrieved
+        nearest_correct += intent_names(examples[0]["intents"]) == intent_names(case["intents"])
+    per_query = (time.perf_counter() - started) / len(cases)
+    print(f"Retrieval: {per_query * 1e6:.0f} µs/message, intents covered by the examples {covered / len(cases):.0%}, "
+          f"nearest example has the right intents {nearest_correct / len(cases):.0%}")
+
+    static_intents = {item["intent"] for line in INTENT_PROMPT.splitlines() if line.startswith('{"intents"')
+                      for item in json.loads(line)["intents"]}
+    static_covered = sum(set(intent_names(case["intents"])) <= static_intents for case in cases)
+    print(f"Static prompt: intents covered by its examples {static_covered / len(cases):.0%}")
+
+    if args.llm:
+        for label, make_prompt in (("static prompt", lambda text: INTENT_PROMPT),
+                                   (f"top-{args.k}", lambda text: build_intent_prompt(text, args.k))):
+            accuracy, seconds = asyncio.run(llm_accuracy(cases, make_prompt))
+            print(f"Gemini with {label}: accuracy {accuracy:.0%}, {seconds * 1000:.0f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
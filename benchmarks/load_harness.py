@@ -0,0 +1,89 @@
+"""
+Load harness for the multi-worker mode.
+
+Pushes synthetic updates from many users through a WorkerPool and reports
+throughput for different worker counts. Each update runs a handler that
+simulates the bot's per-update cost: a short blocking section (the
+synchronous user store access) followed by an awaited network call.
+
+Usage:
+    python -m benchmarks.load_harness --updates 2000 --users 200 --workers 1,2,4
+
+Worker processes add throughput only up to the number of CPU cores for the
+CPU-bound part of dispatching; blocking I/O scales beyond that.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from aiogram import Router
+from aiogram.types import Message
+
+from bot.workers import WorkerPool
+
+BLOCKING_SECONDS = float(os.getenv("HARNESS_BLOCKING_MS", "2")) / 1000
+AWAIT_SECONDS = float(os.getenv("HARNESS_AWAIT_MS", "20")) / 1000
+
+router = Router()
+
+
+@router.message()
+async def simulated_handler(message: Message) -> None:
+    time.sleep(BLOCKING_SECONDS)
+    await asyncio.sleep(AWAIT_SECONDS)
+
+
+def make_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": f"message {update_id}",
+        },
+    }
+
+
+def run(num_workers: int, num_updates: int, num_users: int) -> float:
+    """Returns the throughput in updates per second."""
+    pool = WorkerPool(
+        num_workers,
+        bot_token="123456:LOAD-harness",
+        router_path="benchmarks.load_harness:router",
+        run_scheduler=False,
+    )
+    pool.start()
+    pool.wait_ready(timeout=60)
+
+    updates = [make_update(i, 1000 + i % num_users) for i in range(num_updates)]
+    start = time.perf_counter()
+    for update in updates:
+        pool.submit(update)
+    pool.stop(timeout=None)
+    elapsed = time.perf_counter() - start
+    return num_updates / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--blocking-ms", type=float, default=BLOCKING_SECONDS * 1000)
+    args = parser.parse_args()
+    # Worker processes read the setting from the environment they inherit.
+    os.environ["HARNESS_BLOCKING_MS"] = str(args.blocking_ms)
+
+    baseline = None
+    print(f"{'workers':>8} {'updates/s':>10} {'speedup':>8}")
+    for num_workers in (int(n) for n in args.workers.split(",")):
+        throughput = run(num_workers, args.updates, args.users)
+        baseline = baseline or throughput
+        print(f"{num_workers:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the event-loop cost of a log call.
+
+Times N log calls made from a coroutine, the way handlers log, for:
+
+- print() of an f-string, as the handlers used to do;
+- logging with a StreamHandler and the JSON formatter on the calling thread;
+- the queue pipeline of core.logging_setup (formatting and I/O on a
+  listener thread).
+
+Output goes to a sink that takes --sink-us microseconds per write, to
+stand in for a slow terminal, pipe or log collector.
+
+Usage:
+    python -m benchmarks.logging_overhead [--calls 20000] [--sink-us 20]
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import time
+
+from core.logging_setup import JsonFormatter, log_context, setup_logging
+
+
+class SlowSink:
+    """A text stream whose writes block for a fixed time, like I/O to a slow reader."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        time.sleep(self.delay)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+async def timed(calls: int, log) -> float:
+    """Returns the mean microseconds a log call blocks the event loop."""
+    started = time.perf_counter()
+    with log_context(update_id=1, user_id=123, stage="intent"):
+        for i in range(calls):
+            log(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--sink-us", type=float, default=20)
+    args = parser.parse_args()
+    delay = args.sink_us / 1e6
+    logger = logging.getLogger("benchmark")
+    root = logging.getLogger()
+    results = {}
+
+    sink = SlowSink(delay)
+    with contextlib.redirect_stdout(sink):
+        results["print()"] = asyncio.run(timed(args.calls, lambda i: print(f"Error during intent detection: {i}")))
+
+    root.handlers[:] = []
+    handler = logging.StreamHandler(SlowSink(delay))
+    handler.setFormatter(JsonFormatter())
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    results["logging, on the loop"] = asyncio.run(
+        timed(args.calls, lambda i: logger.warning("Error during intent detection: %s", i))
+    )
+
+    sink = SlowSink(delay)
+    listener = setup_logging(level="INFO", levels={}, sampling={}, json_lines=True, stream=sink)
+    results["queue pipeline"] = asyncio.run(
+        timed(args.calls, lambda i: logger.warning("Error during intent detection: %s", i))
+    )
+    drain_started = time.perf_counter()
+    listener.stop()
+    drained = time.perf_counter() - drain_started
+
+    listener = setup_logging(level="INFO", levels={}, sampling={"message_handled": 0.1}, json_lines=True,
+                             stream=SlowSink(delay))
+    results["queue, sampled 10%"] = asyncio.run(
+        timed(args.calls, lambda i: logger.info("Message handled", extra={"event": "message_handled"}))
+    )
+    listener.stop()
+
+    print(f"{args.calls} log calls, sink write {args.sink_us:g} µs")
+    for label, micros in results.items():
+        print(f"  {label:<22} {micros:6.1f} µs per call on the event loop")
+    print(f"  (listener thread wrote {sink.writes} records, {drained:.2f} s after the loop was done)")
+
+
+if __name__ == "__main__":
+    main()
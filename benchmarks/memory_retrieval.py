@@ -0,0 +1,86 @@
+"""
+Benchmark of long-term memory retrieval.
+
+Fills a VectorIndex with N random unit vectors (the Gemini embedding size
+by default) and times top-k searches, with the vectors in memory and
+memory-mapped from disk. The first search of a reopened file index is
+reported separately: it reads the pages from the file (or the page cache).
+The local hashing embedder is timed as well, as it adds to every recall.
+
+Usage:
+    python -m benchmarks.memory_retrieval [--sizes 10000,100000,1000000] [--dimensions 768] [--k 3]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from core.embeddings import HashingEmbedder, normalize
+from core.vector_index import VectorIndex
+
+CHUNK = 50_000
+
+
+def fill(index: VectorIndex, size: int, rng) -> None:
+    for start in range(0, size, CHUNK):
+        count = min(CHUNK, size - start)
+        vectors = normalize(rng.standard_normal((count, index.dimensions), dtype=np.float32))
+        index.add(vectors, [f"memory {start + i}" for i in range(count)])
+
+
+def time_searches(index: VectorIndex, queries: np.ndarray, k: int) -> list[float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, k)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(0.95 * (len(timings) - 1))]
+    print(f"  {label:<18} p50 {statistics.median(timings) * 1000:8.2f} ms, p95 {p95 * 1000:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated numbers of vectors")
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    rng = np.random.default_rng(5)
+    queries = normalize(rng.standard_normal((args.queries, args.dimensions), dtype=np.float32))
+
+    embedder = HashingEmbedder()
+    texts = [f"Какой у меня завтра экзамен? #{i}" for i in range(args.queries)]
+    timings = []
+    for text in texts:
+        started = time.perf_counter()
+        asyncio.run(embedder.embed([text], query=True))
+        timings.append(time.perf_counter() - started)
+    report("hashing embedder", timings)
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(f"{size} vectors x {args.dimensions} ({size * args.dimensions * 4 / 2**20:.0f} MiB)")
+        index = VectorIndex(args.dimensions)
+        fill(index, size, rng)
+        report("in memory", time_searches(index, queries, args.k))
+        del index
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "user")
+            fill(VectorIndex(args.dimensions, path), size, rng)
+            index = VectorIndex(args.dimensions, path)
+            report("memmap, first", time_searches(index, queries[:1], args.k))
+            report("memmap", time_searches(index, queries, args.k))
+            del index
+
+
+if __name__ == "__main__":
+    main()
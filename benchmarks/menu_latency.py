@@ -0,0 +1,93 @@
+"""
+Benchmark of the menu button path against the typed message path.
+
+Asks for the weather of the saved city N times by pressing the menu
+button (process_callback_query) and by typing "Какая погода?"
+(message_handler), with simulated Gemini and weather API latencies, and
+reports the response time of each path.
+
+Usage:
+    python -m benchmarks.menu_latency [--requests 50] [--llm-ms 700] [--api-ms 250]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+USER = User(id=1, is_bot=False, first_name="Bench")
+
+
+def make_message(text: str) -> MagicMock:
+    message = MagicMock(spec=Message)
+    message.from_user = USER
+    message.chat = Chat(id=1, type="private")
+    message.text = text
+    message.answer = AsyncMock()
+    message.edit_text = AsyncMock()
+    return message
+
+
+def make_callback(data: str) -> MagicMock:
+    callback_query = MagicMock(spec=CallbackQuery)
+    callback_query.data = data
+    callback_query.from_user = USER
+    callback_query.message = make_message("")
+    callback_query.answer = AsyncMock()
+    return callback_query
+
+
+async def timed(count: int, request) -> list[float]:
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await request()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run(args) -> None:
+    from bot.handlers import message_handler, process_callback_query
+
+    llm_calls = []
+
+    async def detect_intent(text):
+        llm_calls.append(text)
+        await asyncio.sleep(args.llm_ms / 1000)
+        return {"intent": "weather", "entities": {}}
+
+    async def get_weather(city):
+        await asyncio.sleep(args.api_ms / 1000)
+        return f"Погода в городе {city}: ясно."
+
+    def get_user_data(user_id, key):
+        return "Bratislava" if key == "city" else None
+
+    with patch("bot.handlers.detect_intent", side_effect=detect_intent), \
+         patch("features.weather_feature.get_weather", side_effect=get_weather), \
+         patch("bot.menu.get_weather", side_effect=get_weather), \
+         patch("features.weather_feature.get_user_data", side_effect=get_user_data), \
+         patch("bot.menu.get_user_data", side_effect=get_user_data), \
+         patch("core.speculation.speculator.budget", 0):
+        button = await timed(args.requests, lambda: process_callback_query(make_callback("weather_saved")))
+        button_llm_calls = len(llm_calls)
+        typed = await timed(args.requests, lambda: message_handler(make_message("Какая погода?")))
+        typed_llm_calls = len(llm_calls) - button_llm_calls
+
+    for label, latencies, calls in (("Menu button", button, button_llm_calls), ("Typed message", typed, typed_llm_calls)):
+        print(f"{label:<14} p50 {statistics.median(latencies) * 1000:6.0f} ms, "
+              f"max {max(latencies) * 1000:6.0f} ms, LLM calls {calls}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--llm-ms", type=float, default=700)
+    parser.add_argument("--api-ms", type=float, default=250)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
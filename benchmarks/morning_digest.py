@@ -0,0 +1,125 @@
+"""
+Benchmark of morning digest assembly.
+
+Simulates --users due reminders whose users' cities and news categories
+follow a skewed distribution, with every upstream call (calendar, route,
+forecast, headlines) answering after --latency-ms, and compares:
+
+- serial: each user's parts fetched one after another, nothing shared;
+- digest: MorningDigest, with the parts of each user gathered concurrently
+  and forecasts, headlines and routes shared between users.
+
+Reports per-user assembly latency, the time for the whole batch, upstream
+calls and the requests served per fetch.
+
+Usage:
+    python -m benchmarks.morning_digest [--users 200] [--cities 20] [--latency-ms 100] [--batch 50]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from bot.storage import create_storage
+from scheduler.digest import MorningDigest, weather_line
+
+EVENT_START = datetime(2026, 10, 20, 9, 0, tzinfo=timezone.utc)
+CATEGORIES = ["world", "technology"]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(args) -> None:
+    rng = random.Random(42)
+    latency = args.latency_ms / 1000
+    calls = Counter()
+
+    def upstream(kind: str, value):
+        async def fetch(*_):
+            calls[kind] += 1
+            await asyncio.sleep(latency)
+            return value
+        return fetch
+
+    first_event = upstream("calendar", {"summary": "Algebra", "start": EVENT_START.isoformat()})
+    plan_departure = upstream("route", ("08:12", None))
+    get_forecast = upstream("weather", None)
+    fetch_headlines = upstream("news", [{"title": "Headline"}])
+
+    weights = [1 / (rank + 1) for rank in range(args.cities)]
+    users = {}
+    for user_id in range(1, args.users + 1):
+        users[user_id] = {
+            "home_location": {"stop": f"Stop{rng.randrange(30)}"},
+            "university_location": {"stop": "University"},
+            "google_refresh_token": "token",
+            "city": f"City{rng.choices(range(args.cities), weights)[0]}",
+            "news_category": rng.choice(CATEGORIES),
+        }
+    due = [(user_id, "planned") for user_id in users]
+
+    async def serial() -> float:
+        started = time.perf_counter()
+        await first_event()
+        await plan_departure()
+        weather_line(await get_forecast(), EVENT_START)
+        await fetch_headlines()
+        return time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = create_storage("sqlite", f"{directory}/user_data.db")
+        store.set_many([(user_id, key, value) for user_id, user in users.items() for key, value in user.items()])
+
+        started = time.perf_counter()
+        serial_latencies = []
+        for start in range(0, len(due), args.batch):
+            serial_latencies.extend(await asyncio.gather(*(serial() for _ in due[start:start + args.batch])))
+        serial_total = time.perf_counter() - started
+        serial_calls = sum(calls.values())
+        calls.clear()
+
+        digest = MorningDigest(now=lambda: EVENT_START)
+        with patch("scheduler.digest.get_storage", return_value=store), \
+             patch("scheduler.digest.get_first_event_for_day", side_effect=first_event), \
+             patch("scheduler.digest.plan_departure", side_effect=plan_departure), \
+             patch("scheduler.digest.get_forecast", side_effect=get_forecast), \
+             patch("scheduler.digest.fetch_headlines", side_effect=fetch_headlines), \
+             patch.dict("os.environ", {"NEWS_API_KEY": "bench"}):
+            started = time.perf_counter()
+            # The reminder engine hands due reminders over in batches
+            for start in range(0, len(due), args.batch):
+                await digest.render(due[start:start + args.batch])
+            digest_total = time.perf_counter() - started
+        store.close()
+
+    digest_latencies = list(digest.latencies)
+    print(f"{args.users} users, {len({user['city'] for user in users.values()})} cities, {args.latency_ms:.0f} ms per upstream call")
+    for label, latencies, total, upstream_calls in (
+        ("Serial", serial_latencies, serial_total, serial_calls),
+        ("Digest", digest_latencies, digest_total, sum(calls.values())),
+    ):
+        print(f"{label:<7} per user p50 {statistics.median(latencies) * 1000:6.0f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:6.0f} ms; all users {total * 1000:7.0f} ms; "
+              f"{upstream_calls} upstream calls")
+    print("Requests per fetch: " + ", ".join(f"{kind} {ratio:.1f}" for kind, ratio in digest.cache.sharing().items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cities", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--batch", type=int, default=50, help="Reminders handed over at once")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
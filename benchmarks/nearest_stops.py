@@ -0,0 +1,69 @@
+"""
+Benchmark of nearest-stop lookups.
+
+Scatters synthetic stops and user addresses over the Bratislava area, then
+times building the grid index, single-address lookups (as in /set_home) and
+the vectorized batch that refreshes every user's nearest stops, compared
+with a plain Python scan.
+
+Usage:
+    python -m benchmarks.nearest_stops [--stops 3000] [--users 50000]
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from apis.stop_locator import StopLocator
+
+
+def python_scan(locator: StopLocator, lat: float, lon: float) -> int:
+    x, y = locator._project([lat], [lon])[0]
+    best, best_distance = -1, math.inf
+    for i, (sx, sy) in enumerate(locator.xy.tolist()):
+        distance = (sx - x) ** 2 + (sy - y) ** 2
+        if distance < best_distance:
+            best, best_distance = i, distance
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    stop_lats = rng.uniform(48.05, 48.25, args.stops)
+    stop_lons = rng.uniform(16.95, 17.25, args.stops)
+    names = [f"Stop {i // 2}" for i in range(args.stops)]  # Two platforms per stop
+
+    started = time.perf_counter()
+    locator = StopLocator([str(i) for i in range(args.stops)], names, stop_lats, stop_lons)
+    print(f"Index of {len(locator)} stops built in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    user_lats = rng.uniform(48.05, 48.25, args.users)
+    user_lons = rng.uniform(16.95, 17.25, args.users)
+
+    sample = min(2000, args.users)
+    started = time.perf_counter()
+    for lat, lon in zip(user_lats[:sample], user_lons[:sample]):
+        locator.nearest_stops(lat, lon)
+    print(f"Grid lookup:      {(time.perf_counter() - started) / sample * 1e6:8.1f} µs/address")
+
+    scan_sample = min(200, args.users)
+    started = time.perf_counter()
+    for lat, lon in zip(user_lats[:scan_sample], user_lons[:scan_sample]):
+        python_scan(locator, lat, lon)
+    print(f"Python scan:      {(time.perf_counter() - started) / scan_sample * 1e6:8.1f} µs/address")
+
+    started = time.perf_counter()
+    locator.nearest_stops_many(list(zip(user_lats.tolist(), user_lons.tolist())))
+    seconds = time.perf_counter() - started
+    print(f"Batch refresh:    {seconds / args.users * 1e6:8.1f} µs/address ({args.users} addresses in {seconds:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of pantry updates.
+
+For inventories of growing size in the SQLite store, times a command that
+adds three items:
+
+- per-item keys (features/pantry_feature.py): reads and writes only the
+  three items;
+- one "pantry" value holding the whole inventory: reads, updates and
+  rewrites all of it.
+
+The local parser is timed on a multi-item command as well.
+
+Usage:
+    python -m benchmarks.pantry_updates [--sizes 10,1000,100000] [--repeat 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from bot.storage import create_storage
+from features.pantry_feature import PANTRY_PREFIX, add_items
+from features.pantry_parser import parse_items
+
+COMMAND = "добавь молоко, 2 яйца и 500 г муки"
+
+
+def whole_inventory_add(store, user_id: int, text: str) -> None:
+    pantry = store.get(user_id, "pantry") or {}
+    for item in parse_items(text):
+        entry = pantry.setdefault(item.key, {"name": item.name, "amounts": {}})
+        if item.quantity is not None:
+            entry["amounts"][item.unit] = entry["amounts"].get(item.unit, 0) + item.quantity
+    store.set(user_id, "pantry", pantry)
+
+
+def timed(run, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,100000", help="Comma-separated inventory sizes")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    per_parse = timed(lambda: parse_items(COMMAND), 1000)
+    print(f"parse_items({COMMAND!r}): {per_parse * 1e6:.0f} µs")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(size) for size in args.sizes.split(",")):
+            store = create_storage("sqlite", os.path.join(directory, f"pantry-{size}.db"))
+            inventory = {f"item{i}": {"name": f"item{i}", "amounts": {"pcs": 1}} for i in range(size)}
+            store.set_many([(1, PANTRY_PREFIX + key, entry) for key, entry in inventory.items()])
+            store.set(2, "pantry", inventory)
+
+            with patch("features.pantry_feature.get_storage", return_value=store):
+                per_item = timed(lambda: add_items(1, parse_items(COMMAND)), args.repeat)
+            whole = timed(lambda: whole_inventory_add(store, 2, COMMAND), args.repeat)
+            print(f"{size:>7} items: per-item keys {per_item * 1000:8.2f} ms, whole inventory {whole * 1000:8.2f} ms")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of morning reminder scheduling.
+
+Schedules N reminders on the reminder engine and, for comparison, as
+APScheduler 'date' jobs (the previous approach), reporting memory per
+pending reminder (bookkeeping only, the message strings are shared), the
+time to schedule them and, for the engine, the time to fire them all into
+a no-op sender.
+
+Usage:
+    python -m benchmarks.reminders [--reminders 100000] [--apscheduler-jobs 10000]
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from scheduler.reminders import ReminderEngine
+
+MESSAGE = "Доброе утро! Напоминаю, ваша первая пара сегодня в 08:00. Не забудьте выехать в 07:12!"
+
+
+async def noop_send(user_id: int, message: str) -> None:
+    pass
+
+
+def measure(label: str, count: int, schedule) -> object:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = schedule()
+    seconds = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {count:>7} scheduled in {seconds:6.2f} s "
+          f"({seconds / count * 1e6:6.1f} µs each), {memory / count:6.0f} B per reminder")
+    return result
+
+
+async def run(args) -> None:
+    now = time.time()
+    # Messages are built per user in the evening job, so each reminder owns its string.
+    reminders = [(user_id, now + 60 + user_id % 3600, MESSAGE.replace("07", f"{user_id % 24:02}"))
+                 for user_id in range(args.reminders)]
+
+    def schedule_engine():
+        engine = ReminderEngine(noop_send, batch_size=args.batch_size)
+        engine.schedule_many(reminders)
+        return engine
+
+    engine = measure("Reminder engine:", args.reminders, schedule_engine)
+
+    started = time.perf_counter()
+    for user_id, _, _ in reminders[::10]:
+        engine.cancel(user_id)
+    print(f"Cancel 10%:            {time.perf_counter() - started:6.2f} s")
+
+    # Pretend the clock jumped past the last reminder and fire everything.
+    engine.clock = lambda: now + 7200
+    engine.max_lateness = float("inf")
+    started = time.perf_counter()
+    fired = await engine.fire_due()
+    seconds = time.perf_counter() - started
+    print(f"Fired {fired} reminders in {seconds:.2f} s ({fired / seconds:,.0f}/s)")
+
+    aps = AsyncIOScheduler(timezone="Europe/Bratislava")
+    aps.start(paused=True)
+    run_date = datetime.now() + timedelta(hours=1)
+
+    def schedule_apscheduler():
+        for user_id, _, message in reminders[:args.apscheduler_jobs]:
+            aps.add_job(noop_send, "date", run_date=run_date, kwargs={"user_id": user_id, "message": message})
+        return aps
+
+    measure("APScheduler date jobs:", args.apscheduler_jobs, schedule_apscheduler)
+    aps.shutdown(wait=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reminders", type=int, default=100_000)
+    parser.add_argument("--apscheduler-jobs", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark of speculative tool prefetching.
+
+Replays a synthetic mix of messages through the same steps as
+message_handler (speculate, detect the intent, fetch the tool data) with
+simulated intent detection and API latencies, once with speculation and
+once without, and reports response latency, hit and waste ratios.
+
+Usage:
+    python -m benchmarks.speculation [--messages 300] [--detect-ms 600] [--fetch-ms 300]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from core.speculation import Speculator
+
+# (text, detected intent, location the LLM extracts, share of traffic)
+MESSAGES = [
+    ("Какая сегодня погода?", "weather", None, 0.35),
+    ("Нужен ли зонт?", "weather", None, 0.10),
+    ("Погода в Кошице", "weather", "Košice", 0.05),  # Keyword, but not the saved city
+    ("Что нового в мире?", "news", "world", 0.20),
+    ("Расскажи анекдот", "unknown", None, 0.20),
+    ("а на выходных?", "weather", None, 0.10),  # Only recent intents hint at the weather
+]
+SAVED_CITY = "Bratislava"
+
+
+async def run(args, budget: int) -> tuple[list, dict]:
+    from features.news_feature import NEWS_KEYWORDS
+    from features.weather_feature import WEATHER_KEYWORDS
+
+    async def fetch(key):
+        await asyncio.sleep(args.fetch_ms / 1000)
+        return key
+
+    def predict(user_id, text, recent):
+        folded = text.casefold()
+        if any(k in folded for k in WEATHER_KEYWORDS) or (len(recent) >= 2 and recent.count("weather") * 2 > len(recent)):
+            return ("weather", SAVED_CITY.casefold()), lambda: fetch(SAVED_CITY)
+        if any(k in folded for k in NEWS_KEYWORDS):
+            return ("news", "world"), lambda: fetch("world")
+        return None
+
+    speculator = Speculator(budget=budget)
+    speculator.register(predict)
+    rng = random.Random(args.seed)
+    texts = rng.choices(MESSAGES, weights=[m[3] for m in MESSAGES], k=args.messages)
+
+    async def handle(user_id, text, intent, entity):
+        started = time.perf_counter()
+        speculator.start(user_id, text)
+        try:
+            await asyncio.sleep(args.detect_ms / 1000)  # detect_intent
+            if intent == "weather":
+                location = entity or SAVED_CITY
+                await speculator.result(user_id, ("weather", location.casefold()), fetch, location)
+            elif intent == "news":
+                await speculator.result(user_id, ("news", entity), fetch, entity)
+            else:
+                await asyncio.sleep(args.detect_ms / 1000)  # conversational reply
+        finally:
+            speculator.finish(user_id)
+        speculator.record_intent(user_id, intent)
+        return intent, time.perf_counter() - started
+
+    async def user_session(user_id, messages):
+        return [await handle(user_id, text, intent, entity) for text, intent, entity, _ in messages]
+
+    users = args.users
+    sessions = await asyncio.gather(*(user_session(u, texts[u::users]) for u in range(users)))
+    return [result for session in sessions for result in session], speculator.metrics()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--detect-ms", type=float, default=600)
+    parser.add_argument("--fetch-ms", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for label, budget in (("Without speculation", 0), ("With speculation", 5)):
+        results, metrics = asyncio.run(run(args, budget))
+        tool_latencies = [latency for intent, latency in results if intent != "unknown"]
+        print(f"{label}: tool replies p50 {statistics.median(tool_latencies) * 1000:.0f} ms, "
+              f"mean {statistics.fmean(tool_latencies) * 1000:.0f} ms")
+        if budget:
+            print(f"  started {metrics['started']}, hit ratio {metrics['hit_ratio']:.0%}, "
+                  f"waste ratio {metrics['waste_ratio']:.0%}, over budget {metrics['over_budget']}, "
+                  f"latency saved {metrics['latency_saved']:.1f} s in total")
+
+
+if __name__ == "__main__":
+    main()
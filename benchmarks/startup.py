@@ -0,0 +1,108 @@
+"""
+Startup benchmark.
+
+Reports the import time of the bot's entry modules (from `python -X importtime`)
+and the time from interpreter start until the first update has been handled.
+
+Usage:
+    python -m benchmarks.startup [--runs 5]
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_MODULES = ["bot.handlers", "scheduler.scheduler"]
+
+# Modules that should not be loaded before they are first needed
+LAZY_MODULES = ["google.generativeai", "google_auth_oauthlib", "googleapiclient", "bs4"]
+
+
+def measure_import_time() -> tuple[float, dict]:
+    """
+    Returns the cumulative import time of the entry modules in seconds, and
+    the cumulative time of each lazy module that was imported anyway.
+    """
+    code = "import " + ", ".join(ENTRY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line.split("|"))
+        if cumulative_us.isdigit():
+            cumulative[name] = int(cumulative_us) / 1e6
+    total = sum(cumulative.get(name, 0.0) for name in ENTRY_MODULES)
+    eager = {name: cumulative[name] for name in LAZY_MODULES if name in cumulative}
+    return total, eager
+
+
+def measure_time_to_first_update() -> float:
+    """Starts a fresh interpreter that handles one /start update and returns the elapsed seconds."""
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", str(started)],
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+async def _handle_first_update(started: float) -> None:
+    from unittest.mock import AsyncMock, patch
+
+    from aiogram import Bot, Dispatcher
+    from aiogram.types import Message
+    from bot.handlers import router
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="123456:STARTUP-benchmark")
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Bench"},
+            "text": "/start",
+        },
+    }
+    # Replies are not sent anywhere; only local processing is timed.
+    with patch.object(Message, "answer", new=AsyncMock()):
+        await dp.feed_raw_update(bot, update)
+    print(time.time() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        asyncio.run(_handle_first_update(args.child))
+        return
+
+    import_times = []
+    eager = {}
+    for _ in range(args.runs):
+        total, eager = measure_import_time()
+        import_times.append(total)
+    first_update_times = [measure_time_to_first_update() for _ in range(args.runs)]
+
+    print(f"Import time of {', '.join(ENTRY_MODULES)}: median {statistics.median(import_times):.3f}s")
+    print(f"Time to first update: median {statistics.median(first_update_times):.3f}s")
+    if eager:
+        for name, seconds in eager.items():
+            print(f"  eagerly imported: {name} ({seconds:.3f}s)")
+    else:
+        print("  none of the lazy modules were imported at startup")
+
+
+if __name__ == "__main__":
+    main()
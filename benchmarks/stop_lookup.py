@@ -0,0 +1,67 @@
+"""
+Benchmark of stop name resolution.
+
+Builds a stop index from a synthetic list of Slovak-looking stop names and
+times resolve() for exact, unaccented, prefix and misspelled queries.
+
+Usage:
+    python -m benchmarks.stop_lookup [--stops 5000] [--queries 20000]
+"""
+import argparse
+import random
+import time
+
+from apis.stop_index import StopIndex
+
+SYLLABLES = ["bra", "ti", "sla", "va", "ko", "ši", "ce", "ži", "li", "na", "nit", "ra", "tr", "na", "va",
+             "pre", "šov", "mar", "tin", "dúb", "rav", "ka", "pe", "trž", "al", "ka", "ľu", "bo", "čo", "ná"]
+SUFFIXES = ["", " námestie", " stanica", " ulica", " cintorín", " sídlisko", " nemocnica"]
+
+
+def make_names(count: int, rng: random.Random) -> list[str]:
+    names = set()
+    while len(names) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        names.add(word.capitalize() + rng.choice(SUFFIXES))
+    return sorted(names)
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    position = rng.randrange(len(name))
+    return name[:position] + name[position + 1:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = make_names(args.stops, rng)
+
+    started = time.perf_counter()
+    index = StopIndex([(str(i), name) for i, name in enumerate(names)])
+    build_seconds = time.perf_counter() - started
+    print(f"Index of {len(index)} stops built in {build_seconds * 1000:.0f} ms")
+
+    kinds = {
+        "exact": lambda name: name,
+        "unaccented": lambda name: name.lower().replace("á", "a").replace("í", "i").replace("š", "s"),
+        "prefix": lambda name: name[: max(4, len(name) // 2)],
+        "typo": lambda name: misspell(name, rng),
+    }
+    for kind, make_query in kinds.items():
+        queries = [make_query(rng.choice(names)) for _ in range(args.queries // len(kinds))]
+        resolved = 0
+        started = time.perf_counter()
+        for query in queries:
+            if index.resolve(query):
+                resolved += 1
+        per_query = (time.perf_counter() - started) / len(queries)
+        print(f"{kind:>10}: {per_query * 1e6:8.1f} µs/query, {resolved / len(queries):6.1%} resolved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the user store's retention pass.
+
+Fills a JSON and a SQLite store with --users synthetic users, each with
+setup data and a chat history, of whom --idle-share have not written for
+two months and --gone-share for a year, then runs one maintenance pass
+(bot/retention.py) in slices of --slice users. Reports the store size and
+the time of a batch-job scan before and after, and the longest step.
+
+Usage:
+    python -m benchmarks.store_retention [--users 5000] [--idle-share 0.4] [--gone-share 0.3] [--slice 200]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bot.history import History
+from bot.retention import DAY, LAST_ACTIVE_KEY, ColdArchive, StoreMaintenance
+from bot.storage import create_storage
+
+
+def make_users(args) -> list[tuple[int, str, object]]:
+    rng = random.Random(42)
+    now = time.time()
+    items = []
+    for user_id in range(1, args.users + 1):
+        roll = rng.random()
+        idle_days = 365 if roll < args.gone_share else 60 if roll < args.gone_share + args.idle_share else 1
+        history = History()
+        for turn in range(5):
+            history.append("user", f"Вопрос {turn} пользователя {user_id}: какая погода завтра утром?")
+            history.append("model", "Завтра утром ясно, около 12°C, к обеду возможен небольшой дождь. " * 3)
+        items += [
+            (user_id, LAST_ACTIVE_KEY, now - idle_days * DAY),
+            (user_id, "home_location", {"stop": "Zochova", "stop_id": "zochova"}),
+            (user_id, "university_location", {"stop": "Mlynské nivy", "stop_id": "mlynske_nivy"}),
+            (user_id, "google_refresh_token", f"1//0{user_id:08d}" + "x" * 90),
+            (user_id, "city", "Bratislava"),
+            (user_id, "history", history.dumps()),
+        ]
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--idle-share", type=float, default=0.4, help="Share of users idle for 60 days")
+    parser.add_argument("--gone-share", type=float, default=0.3, help="Share of users idle for a year")
+    parser.add_argument("--slice", type=int, default=200, help="Users per maintenance step")
+    args = parser.parse_args()
+
+    items = make_users(args)
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ("json", "sqlite"):
+            store = create_storage(backend, os.path.join(directory, f"user_data.{backend}"))
+            store.set_many(items)
+            archive = ColdArchive(os.path.join(directory, f"archive-{backend}.jsonl"))
+            maintenance = StoreMaintenance(store, archive, history_days=30, archive_days=180, slice_users=args.slice)
+            started = time.perf_counter()
+            report = maintenance.run_pass()
+            elapsed = time.perf_counter() - started
+            print(
+                f"{backend:<6} {report['users']} users: {report['histories_dropped']} histories dropped, "
+                f"{report['archived']} archived; size {report['size_before'] / 2**20:.1f} -> {report['size_after'] / 2**20:.1f} MiB, "
+                f"scan {report['scan_before'] * 1000:.0f} -> {report['scan_after'] * 1000:.0f} ms; "
+                f"pass {elapsed:.1f} s, longest step {report['longest_step'] * 1000:.0f} ms"
+            )
+            if backend == "sqlite":
+                store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the offline journey planner.
+
+Answers one "latest departure to arrive by T" query per simulated user
+against a GTFS feed (by default the test fixture) and reports latencies.
+
+Usage:
+    python -m benchmarks.transit_planner [--users 5000] [--gtfs PATH]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from apis.gtfs import load_timetable
+
+DEFAULT_GTFS = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "gtfs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--gtfs", default=DEFAULT_GTFS)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    timetable = load_timetable(args.gtfs)
+    load_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    names = sorted(set(timetable.stop_names))
+    day = datetime(2026, 10, 20)  # A Tuesday
+    queries = []
+    for _ in range(args.users):
+        origin, destination = rng.sample(names, 2)
+        arrive_by = day + timedelta(minutes=rng.randint(7 * 60, 10 * 60))
+        queries.append((timetable.stops_named(origin), timetable.stops_named(destination), arrive_by))
+
+    latencies = []
+    found = 0
+    started = time.perf_counter()
+    for origins, destinations, arrive_by in queries:
+        query_started = time.perf_counter()
+        if timetable.latest_departure(origins, destinations, arrive_by):
+            found += 1
+        latencies.append(time.perf_counter() - query_started)
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Timetable: {len(timetable.stop_ids)} stops, {len(timetable)} connections, loaded in {load_seconds * 1000:.1f} ms")
+    print(f"Queries: {len(queries)} ({found} with a journey) in {total:.3f}s")
+    print(f"Latency: mean {statistics.mean(latencies) * 1000:.3f} ms, "
+          f"p95 {latencies[int(0.95 * len(latencies))] * 1000:.3f} ms, max {latencies[-1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
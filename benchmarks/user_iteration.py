@@ -0,0 +1,113 @@
+"""
+Benchmark of the evening job's pass over all users.
+
+Builds a synthetic store of N users (each with a chat history, a city and,
+for a share of them, home, university and a Google token), then compares:
+
+- the old access pattern: get_all_user_ids() and three get_user_data()
+  calls per user; on the JSON store every call parses the whole file, so it
+  is timed on --old-users users and extrapolated;
+- iter_users(SETUP_KEYS, where=has_completed_setup).
+
+Reports runtime, and peak memory traced with tracemalloc in a separate
+run (tracing slows allocation-heavy code down), for both backends.
+
+Usage:
+    python -m benchmarks.user_iteration [--users 100000] [--old-users 5] [--setup-share 0.3]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from bot.storage import create_storage
+from bot.user_data import SETUP_KEYS, has_completed_setup, iter_users
+
+
+def build_store(backend: str, path: str, users: int, setup_share: float):
+    rng = random.Random(7)
+    store = create_storage(backend, path)
+    items = []
+    for user_id in range(1, users + 1):
+        items.append((user_id, "city", "Bratislava"))
+        items.append((user_id, "history", [
+            {"role": role, "parts": [f"Сообщение номер {turn} о погоде и новостях"]}
+            for turn in range(5) for role in ("user", "model")
+        ]))
+        if rng.random() < setup_share:
+            items.append((user_id, "home_location", {"address": "Hlavná 1", "stop": "Zochova", "lat": 48.14, "lon": 17.1}))
+            items.append((user_id, "university_location", {"address": "Mlynská dolina", "stop": "Botanická záhrada"}))
+            items.append((user_id, "google_refresh_token", f"token-{user_id}"))
+    store.set_many(items)
+    return store
+
+
+def measure(run, traced_run):
+    """Returns (result, seconds) of run() and the peak traced memory of traced_run()."""
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    traced_run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def old_pattern(store, limit: int | None):
+    from bot.user_data import get_all_user_ids, get_user_data
+
+    with patch("bot.user_data.get_storage", return_value=store):
+        ready = 0
+        for user_id in get_all_user_ids()[:limit]:
+            home = get_user_data(user_id, "home_location")
+            university = get_user_data(user_id, "university_location")
+            token = get_user_data(user_id, "google_refresh_token")
+            ready += bool(home and university and token)
+        return ready
+
+
+def new_pattern(store):
+    async def run():
+        ready = 0
+        async for users in iter_users(SETUP_KEYS, where=has_completed_setup):
+            ready += len(users)
+        return ready
+
+    with patch("bot.user_data.get_storage", return_value=store):
+        return asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--old-users", type=int, default=5, help="Users the old pattern is timed on (JSON)")
+    parser.add_argument("--setup-share", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ("json", "sqlite"):
+            path = os.path.join(directory, f"user_data.{backend}")
+            started = time.perf_counter()
+            store = build_store(backend, path, args.users, args.setup_share)
+            print(f"{backend}: {args.users} users, {os.path.getsize(path) / 2**20:.0f} MiB, "
+                  f"built in {time.perf_counter() - started:.1f} s")
+
+            limit = args.old_users if backend == "json" else None
+            # Every call of the old pattern peaks alike, so one user is traced
+            ready, elapsed, peak = measure(lambda: old_pattern(store, limit), lambda: old_pattern(store, 1))
+            timed_users = limit or args.users
+            total = elapsed / timed_users * args.users
+            note = f" (timed on {timed_users} users)" if limit else ""
+            print(f"  get_user_data per user: {total:8.1f} s{note}, peak {peak / 2**20:6.1f} MiB")
+
+            ready, elapsed, peak = measure(lambda: new_pattern(store), lambda: new_pattern(store))
+            print(f"  iter_users:             {elapsed:8.1f} s, peak {peak / 2**20:6.1f} MiB, {ready} users ready")
+
+
+if __name__ == "__main__":
+    main()
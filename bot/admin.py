@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, Message
+
+from core.config import ConfigError, config
+from core.diagnostics import SamplingProfiler, loop_monitor, top_allocations
+
+# Telegram user IDs allowed to use the diagnostics commands
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 300
+
+router = Router(name="admin")
+# Messages of other users fall through to the regular handlers
+router.message.filter(F.from_user.id.in_(ADMIN_USER_IDS))
+
+profiler = SamplingProfiler()
+_profile_done: asyncio.Event | None = None
+
+
+def _seconds_argument(command: CommandObject, default: float, maximum: float) -> float:
+    try:
+        return min(max(float(command.args), 1.0), maximum) if command.args else default
+    except ValueError:
+        return default
+
+
+@router.message(Command("profile"))
+async def command_profile(message: Message, command: CommandObject) -> None:
+    """
+    Profiles this process for N seconds (or until /profile_stop) and sends
+    the collapsed stacks, ready for flamegraph.pl or speedscope.
+    """
+    global _profile_done
+    if profiler.running:
+        await message.answer("Профилирование уже идёт. Остановить: /profile_stop")
+        return
+    seconds = _seconds_argument(command, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS)
+    _profile_done = asyncio.Event()
+    profiler.start()
+    await message.answer(f"Профилирую {seconds:g} с. Остановить раньше: /profile_stop")
+    try:
+        await asyncio.wait_for(_profile_done.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.monotonic() - profiler.started_at
+    collapsed = profiler.stop()
+    await message.answer_document(
+        BufferedInputFile(collapsed.encode("utf-8"), filename=f"profile-{int(time.time())}.collapsed"),
+        caption=f"{profiler.samples} выборок за {elapsed:.1f} с, {len(profiler.stacks)} разных стеков.",
+    )
+
+
+@router.message(Command("profile_stop"))
+async def command_profile_stop(message: Message) -> None:
+    if not profiler.running or _profile_done is None:
+        await message.answer("Профилирование не запущено. Запустить: /profile [секунды]")
+        return
+    _profile_done.set()
+
+
+@router.message(Command("memory"))
+async def command_memory(message: Message, command: CommandObject) -> None:
+    """Lists the source lines holding the most memory (tracemalloc starts on the first call)."""
+    limit = int(command.args) if command.args and command.args.isdigit() else 10
+    lines = await asyncio.to_thread(top_allocations, limit)
+    if lines is None:
+        await message.answer("Отслеживание памяти включено. Повторите /memory позже, чтобы увидеть места выделения.")
+        return
+    await message.answer("\n".join(["Больше всего памяти выделено в:", *lines]) if lines else "Нет данных о памяти.")
+
+
+@router.message(Command("loop_lag"))
+async def command_loop_lag(message: Message) -> None:
+    """Reports the event-loop lag and where the loop was stuck during stalls."""
+    stats = loop_monitor.stats()
+    lines = [
+        f"Задержка цикла событий ({stats['samples']} замеров): "
+        f"p50 {stats['lag_p50'] * 1000:.1f} мс, p95 {stats['lag_p95'] * 1000:.1f} мс, "
+        f"максимум {stats['lag_max'] * 1000:.1f} мс.",
+        f"Зависаний дольше {loop_monitor.stall_threshold * 1000:.0f} мс: {stats['stalls']}.",
+    ]
+    if loop_monitor.slow_callbacks:
+        lines.append("Где цикл стоял:")
+        lines += [f"{count} × {location}" for location, count in loop_monitor.slow_callbacks.most_common(5)]
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("reload_config"))
+async def command_reload_config(message: Message) -> None:
+    """Reloads the settings from the config file and the environment, and lists what changed."""
+    try:
+        changed = config.reload()
+    except ConfigError as e:
+        await message.answer(f"Настройки не изменены, новые значения с ошибками:\n{e}")
+        return
+    if not changed:
+        await message.answer("Настройки не изменились.")
+        return
+    await message.answer("\n".join(["Новые настройки:", *(f"{name} = {getattr(config.settings, name)!r}" for name in changed)]))
@@ -1,11 +1,35 @@
+import asyncio
+import logging
+import os
+import time
+
 from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 
-from bot.keyboards import create_main_menu_keyboard
+from bot.keyboards import create_back_keyboard, create_main_menu_keyboard
+from bot.menu import MENU_ACTIONS
+from bot.middlewares import ActivityMiddleware, LogContextMiddleware, UserSerializationMiddleware
+from bot.retention import activity
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Handle each user's messages one at a time; optionally merge quick bursts into one turn
+user_serialization = UserSerializationMiddleware(
+    max_pending=int(os.getenv("MAX_PENDING_MESSAGES", "3")),
+    debounce_window=float(os.getenv("MESSAGE_DEBOUNCE_SECONDS", "0")),
+)
+router.message.middleware(user_serialization)
+# Log records of a handler carry its update and user IDs
+router.message.outer_middleware(LogContextMiddleware())
+router.callback_query.outer_middleware(LogContextMiddleware())
+# Users' last activity is kept for the store's retention (archived users come back here)
+router.message.outer_middleware(ActivityMiddleware(activity))
+router.callback_query.outer_middleware(ActivityMiddleware(activity))
+
 @router.message(Command("start"))
 async def command_start_handler(message: Message) -> None:
     """
@@ -33,6 +57,8 @@ async def command_help_handler(message: Message) -> None:
 
 from core.google_auth import generate_auth_url, get_refresh_token
 from bot.user_data import update_user_data
+from apis.stop_index import get_stop_index
+from features.nearby_stops import locate_nearby_stops
 
 @router.message(Command("authorize_google"))
 async def command_authorize_google(message: Message) -> None:
@@ -90,6 +116,37 @@ def _parse_location_args(text: str) -> dict | None:
     except IndexError:
         return None
 
+def _resolve_location_stop(location_data: dict) -> str | None:
+    """
+    Replaces the typed stop name with the canonical stop from the stop index
+    and adds its `stop_id`.
+
+    Returns:
+        None on success, or an error message with suggestions if the stop is unknown.
+    """
+    index = get_stop_index()
+    if not location_data.get("stop") or index is None:
+        return None
+
+    stop = index.resolve(location_data["stop"])
+    if stop:
+        location_data["stop"] = stop.name
+        location_data["stop_id"] = stop.stop_id
+        return None
+
+    suggestions = index.suggest(location_data["stop"])
+    response = f"Не удалось найти остановку «{location_data['stop']}»."
+    if suggestions:
+        response += " Возможно, вы имели в виду: " + ", ".join(s.name for s in suggestions) + "?"
+    return response + "\nПовторите команду с точным названием остановки."
+
+def _nearest_stop_note(location_data: dict) -> str:
+    """Describes the stop that was picked automatically for an address, if any."""
+    if location_data.get("stop_source") != "nearest":
+        return ""
+    nearest = location_data["nearby_stops"][0]
+    return f"\nБлижайшая остановка: {nearest['name']} (≈ {nearest['distance_m']} м)"
+
 @router.message(Command("set_home"))
 async def command_set_home(message: Message) -> None:
     """Saves the user's home address and nearest bus stop."""
@@ -101,8 +158,14 @@ async def command_set_home(message: Message) -> None:
         )
         return
 
+    error = _resolve_location_stop(location_data)
+    if error:
+        await message.answer(error)
+        return
+
+    await locate_nearby_stops(location_data)
     update_user_data(message.from_user.id, 'home_location', location_data)
-    await message.answer(f"Ваш домашний адрес сохранен: {location_data['address']}")
+    await message.answer(f"Ваш домашний адрес сохранен: {location_data['address']}" + _nearest_stop_note(location_data))
 
 @router.message(Command("set_university"))
 async def command_set_university(message: Message) -> None:
@@ -115,35 +178,78 @@ async def command_set_university(message: Message) -> None:
         )
         return
 
+    error = _resolve_location_stop(location_data)
+    if error:
+        await message.answer(error)
+        return
+
+    await locate_nearby_stops(location_data)
     update_user_data(message.from_user.id, 'university_location', location_data)
-    await message.answer(f"Адрес университета сохранен: {location_data['address']}")
+    await message.answer(f"Адрес университета сохранен: {location_data['address']}" + _nearest_stop_note(location_data))
 
 
-from core.intent_detector import detect_intent, model
-from features.weather_feature import handle_weather_intent, handle_set_city_intent
-from features.news_feature import handle_news_intent
+from core.intent_detector import detect_intent, get_model, intents_of
+from core.llm_gateway import gateway, LLMUnavailableError
+from core.load_policy import load_policy
+from core.logging_setup import log_context
+from core.speculation import speculator
+from features.weather_feature import handle_weather_intent, handle_set_city_intent, predict_weather_fetch
+from features.news_feature import handle_news_intent, predict_news_fetch
+from features.pantry_feature import handle_pantry_intent
+from bot.history import History, as_gemini
+from bot.memory import MEMORY_TOP_K, long_term_memory, with_memories
 from bot.user_data import get_user_history, add_to_user_history
+from core.config import config
 
+# Likely tool fetches start while the intent is still being detected
+speculator.register(predict_weather_fetch)
+speculator.register(predict_news_fetch)
 
-async def get_conversational_response(user_text: str, history: list) -> str:
+PANTRY_INTENTS = ("pantry_add", "pantry_remove", "pantry_list")
+TOOL_INTENTS = ("weather", "set_city", "news", *PANTRY_INTENTS)
+# Intents that change user data run before the others, which may read it
+STATEFUL_INTENTS = ("set_city", "pantry_add", "pantry_remove")
+
+
+async def get_conversational_response(user_text: str, history: History | list, user_id: int | None = None) -> str:
     """
-    Generates a conversational response using the Gemini model, including history.
+    Generates a conversational response using the Gemini model, including history
+    and, given the user, the most relevant exchanges from their long-term memory.
+
+    Under load the fast model, a shorter history and no memories are used; when
+    the bot is shedding load, small talk is declined so tool requests keep working.
     """
+    if load_policy.shed_conversation():
+        return "Извините, сейчас я перегружен запросами. Могу подсказать погоду или новости, а поболтать — чуть позже."
+
+    model = get_model(load_policy.model_tier())
     if not model:
         return "Извините, у меня сейчас технические неполадки. Я не могу ответить."
 
     try:
-        # Start a chat session with the existing history
-        chat = model.start_chat(history=history)
+        limit = load_policy.history_limit(len(history))
+        # Start a chat session with the (possibly shortened) existing history
+        # Turned into Gemini messages only here, and only the turns that are sent
+        chat = model.start_chat(history=as_gemini(history[-limit:]) if limit else [])
+        memories = []
+        if user_id is not None:
+            # Exchanges still in the recent history are not recalled twice
+            memories = await long_term_memory.recall(
+                user_id, user_text, load_policy.memories_limit(MEMORY_TOP_K),
+                exclude_latest=config.settings.max_history_length // 2,
+            )
         # The system prompt is now part of the model's configuration,
         # but we prepend our assistant prompt for persona.
         # For this implementation, we will rely on the history and the initial prompt.
         # A more advanced implementation might use a system prompt.
 
-        response = await chat.send_message_async(user_text)
+        response = await gateway.send_message(chat, with_memories(user_text, memories))
         return response.text.strip()
+    except LLMUnavailableError as e:
+        logger.warning("Gemini is unavailable: %s", e)
+        return "Извините, сейчас я перегружен запросами. Пожалуйста, попробуйте через минуту."
     except Exception as e:
-        print(f"Error during conversational response generation: {e}")
+        logger.exception("Error during conversational response generation")
         return "Произошла ошибка при обработке вашего запроса."
 
 
@@ -151,44 +257,127 @@ async def get_conversational_response(user_text: str, history: list) -> str:
 async def process_callback_query(callback_query: CallbackQuery):
     """
     This handler processes all callback queries from inline keyboards.
+    Every menu button maps directly to a feature, so menu interactions
+    never go through intent detection.
     """
     await callback_query.answer()  # Acknowledge the button press
-    await callback_query.message.edit_text(
-        f"Вы выбрали: {callback_query.data}. Эта функция скоро появится!"
+    action = MENU_ACTIONS.get(callback_query.data)
+    if action is None:
+        await callback_query.message.edit_text(
+            f"Вы выбрали: {callback_query.data}. Эта функция скоро появится!",
+            reply_markup=create_back_keyboard()
+        )
+        return
+
+    text, keyboard = await action(callback_query.from_user.id)
+    try:
+        await callback_query.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Pressing a button again may produce the very same message
+        if "message is not modified" not in str(e):
+            raise
+
+
+async def run_tool_intent(message: Message, intent: str, entities: dict) -> str:
+    """Runs the feature handler of a single tool-using intent."""
+    if intent == "weather":
+        return await handle_weather_intent(message, entities)
+    if intent == "set_city":
+        return await handle_set_city_intent(message, entities)
+    if intent == "news":
+        return await handle_news_intent(message, entities)
+    if intent in PANTRY_INTENTS:
+        return await handle_pantry_intent(message, intent, entities)
+    raise ValueError(f"Not a tool intent: {intent}")
+
+
+async def _run_with_timeout(message: Message, intent: str, entities: dict) -> str:
+    # Seconds a tool may take before the reply goes out without its part
+    timeout = config.settings.tool_timeout_seconds
+    try:
+        return await asyncio.wait_for(run_tool_intent(message, intent, entities), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Tool for intent '%s' timed out after %s s", intent, timeout)
+        return "⏳ Часть запроса не успела выполниться, попробуйте спросить об этом ещё раз чуть позже."
+
+
+async def run_tool_intents(message: Message, requests: list[dict]) -> str:
+    """
+    Runs the tool-using requests of a message and merges their replies in
+    the order they were asked. Independent requests run concurrently, each
+    under the tool timeout, so one slow API does not hold back the others.
+    """
+    unique, seen = [], []
+    for request in requests:
+        # Pantry handlers read their items from the message (those under their
+        # own verbs), so Gemini listing one request per item must not apply them several times
+        key = request["intent"] if request["intent"] in PANTRY_INTENTS else request
+        if key not in seen:
+            seen.append(key)
+            unique.append(request)
+
+    replies = {}
+    for i, request in enumerate(unique):
+        if request["intent"] in STATEFUL_INTENTS:
+            replies[i] = await _run_with_timeout(message, request["intent"], request["entities"])
+    independent = [i for i, request in enumerate(unique) if i not in replies]
+    results = await asyncio.gather(
+        *(_run_with_timeout(message, unique[i]["intent"], unique[i]["entities"]) for i in independent)
     )
+    replies.update(zip(independent, results))
+    return "\n\n".join(replies[i] for i in range(len(unique)))
 
 
 @router.message()
 async def message_handler(message: Message) -> None:
     """
     This handler processes all text messages.
-    It first tries to detect a specific 'tool-using' intent.
+    It first tries to detect 'tool-using' intents (possibly several in one
+    message) and answers them together.
     If no specific intent is found, it uses a conversational AI model to respond.
     """
     # Do not process empty messages
     if not message.text:
         return
 
-    intent_data = await detect_intent(message.text)
-    intent = intent_data.get("intent")
-    entities = intent_data.get("entities", {})
-
     response_message = ""
     user_id = message.from_user.id
     user_text = message.text
 
-    # Route to tool-using intents first
-    if intent == "weather":
-        response_message = await handle_weather_intent(message, entities)
-    elif intent == "set_city":
-        response_message = await handle_set_city_intent(message, entities)
-    elif intent == "news":
-        response_message = await handle_news_intent(message, entities)
-    else:
-        # If no specific tool intent, treat as a general conversation with memory
-        history = get_user_history(user_id)
-        response_message = await get_conversational_response(user_text, history)
-        # Save the interaction to history
-        add_to_user_history(user_id, user_text, response_message)
+    started = time.perf_counter()
+    speculator.start(user_id, user_text)
+    try:
+        with log_context(stage="intent"):
+            intent_data = await detect_intent(message.text)
+        requests = intents_of(intent_data)
+        tool_requests = [request for request in requests if request["intent"] in TOOL_INTENTS]
+
+        # Route to tool-using intents first
+        if tool_requests:
+            with log_context(stage="tools"):
+                response_message = await run_tool_intents(message, tool_requests)
+        else:
+            # If no specific tool intent, treat as a general conversation with memory
+            with log_context(stage="conversation"):
+                history = get_user_history(user_id)
+                response_message = await get_conversational_response(user_text, history, user_id=user_id)
+                # Save the interaction to history
+                add_to_user_history(user_id, user_text, response_message)
+    finally:
+        speculator.finish(user_id)
+    for request in tool_requests or requests:
+        speculator.record_intent(user_id, request["intent"])
 
     await message.answer(response_message)
+    if not tool_requests and not load_policy.shed_conversation():
+        # Embedding the exchange does not delay the reply; the user's next message waits for it
+        await long_term_memory.remember(user_id, user_text, response_message)
+    # One record per message: sample it with LOG_SAMPLING=message_handled=<share>
+    logger.info(
+        "Message handled",
+        extra={
+            "event": "message_handled",
+            "intents": [request["intent"] for request in requests],
+            "duration_ms": round((time.perf_counter() - started) * 1000),
+        },
+    )
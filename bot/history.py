@@ -0,0 +1,165 @@
+import base64
+import os
+import sys
+import zlib
+
+# Roles are stored as one byte; their strings are interned, so all turns share them
+ROLES = ("user", "model")
+_ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+FORMAT_VERSION = 1
+CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD = 0, 1, 2
+_CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# Encoded histories larger than this many bytes are compressed with HISTORY_COMPRESSION
+COMPRESS_THRESHOLD = int(os.getenv("HISTORY_COMPRESS_THRESHOLD", "512"))
+HISTORY_COMPRESSION = os.getenv("HISTORY_COMPRESSION", "zlib").lower()
+
+
+def _compress(payload: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.compress(payload, 6)
+    # zstandard is optional; zstd-compressed histories need it installed to be read
+    import zstandard
+    return zstandard.ZstdCompressor().compress(payload)
+
+
+def _decompress(payload: bytes, codec: int) -> bytes:
+    if codec == CODEC_NONE:
+        return payload
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    import zstandard
+    return zstandard.ZstdDecompressor().decompress(payload)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Turn:
+    """One message of a conversation."""
+
+    __slots__ = ("role", "text")
+
+    def __init__(self, role: str, text: str):
+        self.role = sys.intern(role)
+        self.text = text
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Turn) and (self.role, self.text) == (other.role, other.text)
+
+    def __repr__(self) -> str:
+        return f"Turn({self.role!r}, {self.text!r})"
+
+    def to_gemini(self) -> dict:
+        return {"role": self.role, "parts": [self.text]}
+
+
+class History:
+    """
+    A user's recent conversation, kept as compact Turn records.
+
+    It is stored as a length-prefixed binary record (compressed when large,
+    base64 text in the user data store) and only turned into Gemini's
+    {"role": ..., "parts": [...]} messages when a chat is started.
+    """
+
+    __slots__ = ("turns",)
+
+    def __init__(self, turns=()):
+        self.turns = list(turns)
+
+    @classmethod
+    def from_gemini(cls, messages: list[dict]) -> "History":
+        """Builds a history from Gemini-format messages (the format stored before)."""
+        return cls(Turn(message["role"], "\n".join(message.get("parts") or [])) for message in messages)
+
+    def to_gemini(self) -> list[dict]:
+        return [turn.to_gemini() for turn in self.turns]
+
+    def append(self, role: str, text: str) -> None:
+        self.turns.append(Turn(role, text))
+
+    def trim(self, max_length: int) -> None:
+        """Keeps only the last `max_length` turns."""
+        if len(self.turns) > max_length:
+            del self.turns[:len(self.turns) - max_length]
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def __iter__(self):
+        return iter(self.turns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return History(self.turns[index])
+        return self.turns[index]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, History) and self.turns == other.turns
+
+    def encode(self, compression: str | None = None, threshold: int | None = None) -> bytes:
+        """
+        Serializes the history: a header byte (format version and codec),
+        then per turn a role byte, the varint length of the text and its UTF-8 bytes.
+        """
+        payload = bytearray()
+        for turn in self.turns:
+            text = turn.text.encode("utf-8")
+            payload.append(_ROLE_CODES[turn.role])
+            _write_varint(payload, len(text))
+            payload += text
+        codec = _CODECS[compression or HISTORY_COMPRESSION]
+        if codec == CODEC_NONE or len(payload) <= (COMPRESS_THRESHOLD if threshold is None else threshold):
+            return bytes([FORMAT_VERSION << 4 | CODEC_NONE]) + payload
+        return bytes([FORMAT_VERSION << 4 | codec]) + _compress(bytes(payload), codec)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "History":
+        if not data:
+            return cls()
+        version, codec = data[0] >> 4, data[0] & 0x0F
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unknown history format version: {version}")
+        payload = _decompress(data[1:], codec)
+        turns, pos = [], 0
+        while pos < len(payload):
+            role = ROLES[payload[pos]]
+            length, pos = _read_varint(payload, pos + 1)
+            turns.append(Turn(role, payload[pos:pos + length].decode("utf-8")))
+            pos += length
+        return cls(turns)
+
+    def dumps(self) -> str:
+        """Returns the encoded history as text for the JSON-based user data store."""
+        return base64.b64encode(self.encode()).decode("ascii")
+
+    @classmethod
+    def loads(cls, value) -> "History":
+        """Reads a stored history: encoded text, a legacy list of Gemini messages, or None."""
+        if not value:
+            return cls()
+        if isinstance(value, list):
+            return cls.from_gemini(value)
+        return cls.decode(base64.b64decode(value))
+
+
+def as_gemini(history) -> list[dict]:
+    """Returns Gemini messages for a History or an already converted list."""
+    return history.to_gemini() if isinstance(history, History) else list(history)
@@ -18,3 +18,40 @@ def create_main_menu_keyboard() -> InlineKeyboardMarkup:
         InlineKeyboardButton(text="📅 Calendar", callback_data="feature_calendar")
     )
     return builder.as_markup()
+
+
+# News categories offered in the news menu (category -> button label)
+NEWS_CATEGORIES = {
+    "world": "🌍 World",
+    "technology": "💻 Technology",
+}
+
+def create_back_keyboard() -> InlineKeyboardMarkup:
+    """
+    Creates a keyboard with a single button back to the main menu.
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="⬅️ Menu", callback_data="menu_main"))
+    return builder.as_markup()
+
+def create_weather_menu_keyboard(city: str | None) -> InlineKeyboardMarkup:
+    """
+    Creates the weather menu: the user's saved city, if any, and a way back.
+    """
+    builder = InlineKeyboardBuilder()
+    if city:
+        builder.row(InlineKeyboardButton(text=f"🏙️ {city}", callback_data="weather_saved"))
+    builder.row(InlineKeyboardButton(text="⬅️ Menu", callback_data="menu_main"))
+    return builder.as_markup()
+
+def create_news_menu_keyboard() -> InlineKeyboardMarkup:
+    """
+    Creates the news menu with one button per category.
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(*(
+        InlineKeyboardButton(text=label, callback_data=f"news_{category}")
+        for category, label in NEWS_CATEGORIES.items()
+    ))
+    builder.row(InlineKeyboardButton(text="⬅️ Menu", callback_data="menu_main"))
+    return builder.as_markup()
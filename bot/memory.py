@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+# Embeddings backend for long-term memory: 'gemini' or 'hashing' (local, no API calls)
+MEMORY_EMBEDDER = os.getenv("MEMORY_EMBEDDER", "gemini")
+# Directory of the per-user memory files; empty keeps memories in memory only
+MEMORY_PATH = os.getenv("MEMORY_PATH", "memory")
+# Memories put into a conversational prompt, and the similarity they need to get
+# there (empty: the embedder's own default, as scores differ between embedders)
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "3"))
+MEMORY_MIN_SCORE = os.getenv("MEMORY_MIN_SCORE")
+# Indexes larger than this are searched in a thread (about 2 ms of event-loop time)
+THREAD_SEARCH_ROWS = 20_000
+
+
+def format_exchange(user_message: str, model_message: str) -> str:
+    return f"Пользователь: {user_message}\nАссистент: {model_message}"
+
+
+class LongTermMemory:
+    """
+    Remembers every conversational exchange of a user and recalls the ones
+    most relevant to a new message, so the prompt can carry what was said
+    long before the recent history.
+
+    Each user has a VectorIndex of their own, stored under the embedder's
+    name (switching embedders starts a new memory rather than mixing vector
+    spaces). A user's messages are handled by one worker at a time, so the
+    append-only files need no locking. NumPy and the embedder are loaded on
+    first use.
+    """
+
+    def __init__(self, embedder=None, path: str | None = MEMORY_PATH, max_open: int | None = None):
+        """
+        Args:
+            embedder: An embedder from core.embeddings; created from MEMORY_EMBEDDER if omitted.
+            path: Directory for the memory files, or None to keep memories in memory only.
+            max_open: Number of per-user indexes kept open (least recently used are
+                closed); the memory_open_indexes setting if omitted.
+        """
+        self._embedder = embedder
+        self.path = path or None
+        self.max_open = max_open
+        self._indexes: OrderedDict = OrderedDict()
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from core.embeddings import create_embedder
+            self._embedder = create_embedder(MEMORY_EMBEDDER)
+        return self._embedder
+
+    def _file(self, user_id: int) -> str | None:
+        if not self.path:
+            return None
+        return os.path.join(self.path, self.embedder.name, str(user_id))
+
+    def _index(self, user_id: int, create: bool = True):
+        """Returns the user's index, or None if they have no memories and `create` is False."""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            return index
+        path = self._file(user_id)
+        if not create and (path is None or not os.path.exists(path + ".vec")):
+            return None
+        from core.vector_index import VectorIndex
+
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        index = VectorIndex(self.embedder.dimensions, path)
+        self._indexes[user_id] = index
+        # In-memory indexes are the only copy of their memories, so only files are closed
+        if path and len(self._indexes) > (self.max_open or config.settings.memory_open_indexes):
+            self._indexes.popitem(last=False)
+        return index
+
+    async def remember(self, user_id: int, user_message: str, model_message: str) -> None:
+        """Stores one exchange. Failures are logged: losing a memory must not fail a reply."""
+        text = format_exchange(user_message, model_message)
+        try:
+            vectors = await self.embedder.embed([text])
+            self._index(user_id).add(vectors, [text])
+        except Exception as e:
+            logger.warning("Could not store a memory for user %s: %s", user_id, e)
+
+    async def recall(self, user_id: int, text: str, k: int = MEMORY_TOP_K,
+                     min_score: float | None = None, exclude_latest: int = 0) -> list[str]:
+        """
+        Returns up to k remembered exchanges relevant to the text, most relevant first.
+
+        Args:
+            min_score: Lowest cosine similarity recalled; MEMORY_MIN_SCORE or
+                the embedder's `min_score` if omitted.
+            exclude_latest: Number of newest exchanges to skip, e.g. those
+                still in the recent history sent with the prompt.
+        """
+        index = self._index(user_id, create=False) if k > 0 else None
+        if index is None or len(index) <= exclude_latest:
+            return []
+        try:
+            [query] = await self.embedder.embed([text], query=True)
+        except Exception as e:
+            logger.warning("Could not recall memories for user %s: %s", user_id, e)
+            return []
+        if min_score is None:
+            min_score = float(MEMORY_MIN_SCORE) if MEMORY_MIN_SCORE else self.embedder.min_score
+        if len(index) > THREAD_SEARCH_ROWS:
+            results = await asyncio.to_thread(index.search, query, k, exclude_latest)
+        else:
+            results = index.search(query, k, exclude_latest)
+        return [memory for score, memory in results if score >= min_score]
+
+
+long_term_memory = LongTermMemory()
+
+
+def with_memories(user_text: str, memories: list[str]) -> str:
+    """Prepends recalled exchanges to a message sent to the model."""
+    if not memories:
+        return user_text
+    remembered = "\n\n".join(memories)
+    return (
+        "Из прошлых разговоров с пользователем (используй, только если это относится к делу):\n"
+        f"{remembered}\n\n"
+        f"Сообщение пользователя: {user_text}"
+    )
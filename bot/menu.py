@@ -0,0 +1,83 @@
+from aiogram.types import InlineKeyboardMarkup
+
+from apis.news import get_news
+from apis.weather import get_weather
+from bot.keyboards import (
+    NEWS_CATEGORIES,
+    create_back_keyboard,
+    create_main_menu_keyboard,
+    create_news_menu_keyboard,
+    create_weather_menu_keyboard,
+)
+from bot.user_data import get_user_data
+from features.pantry_feature import format_pantry, list_items
+
+# Menu actions get the user's ID and return the text and keyboard to show.
+# They use saved user data and the APIs directly, never the LLM.
+
+
+async def show_main_menu(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+    return "Чем я могу вам помочь?", create_main_menu_keyboard()
+
+
+async def show_weather_menu(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+    city = get_user_data(user_id, "city")
+    if not city:
+        return (
+            "Я не знаю вашего города. Чтобы я его запомнил, напишите, например: 'мой город Москва'.",
+            create_weather_menu_keyboard(None),
+        )
+    return "Погода для какого города?", create_weather_menu_keyboard(city)
+
+
+async def show_saved_city_weather(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+    city = get_user_data(user_id, "city")
+    if not city:
+        return await show_weather_menu(user_id)
+    return await get_weather(city), create_weather_menu_keyboard(city)
+
+
+async def show_news_menu(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+    return "Какие новости показать?", create_news_menu_keyboard()
+
+
+def _news_action(category: str):
+    async def show_news(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+        return await get_news(category), create_news_menu_keyboard()
+    return show_news
+
+
+async def show_transport(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+    lines = []
+    for key, label in (("home_location", "🏠 Дом"), ("university_location", "🎓 Университет")):
+        location = get_user_data(user_id, key)
+        if not location:
+            continue
+        line = f"{label}: {location['address']}"
+        if location.get("stop"):
+            line += f", остановка {location['stop']}"
+        nearby = [stop["name"] for stop in location.get("nearby_stops", []) if stop["name"] != location.get("stop")]
+        if nearby:
+            line += f" (рядом также: {', '.join(nearby)})"
+        lines.append(line)
+    if not lines:
+        return (
+            "Адреса не заданы. Сохраните их командами /set_home и /set_university.",
+            create_back_keyboard(),
+        )
+    return "\n".join(["Ваши маршруты:", *lines]), create_back_keyboard()
+
+
+async def show_pantry(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+    return format_pantry(list_items(user_id)), create_back_keyboard()
+
+
+MENU_ACTIONS = {
+    "menu_main": show_main_menu,
+    "feature_weather": show_weather_menu,
+    "weather_saved": show_saved_city_weather,
+    "feature_news": show_news_menu,
+    "feature_transport": show_transport,
+    "feature_pantry": show_pantry,
+    **{f"news_{category}": _news_action(category) for category in NEWS_CATEGORIES},
+}
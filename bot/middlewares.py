@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from core.logging_setup import log_context
+
+logger = logging.getLogger(__name__)
+
+BACKPRESSURE_REPLY = "Пожалуйста, подождите: я ещё обрабатываю ваши предыдущие сообщения."
+
+
+@dataclass
+class _Burst:
+    texts: list
+    started: float
+    last_arrival: float
+
+
+@dataclass
+class _UserState:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Messages waiting for or holding the lock
+    pending: int = 0
+    # The burst that is still accepting messages, if any
+    burst: _Burst | None = None
+
+
+class UserSerializationMiddleware(BaseMiddleware):
+    """
+    Message middleware that handles one message per user at a time, in
+    arrival order.
+
+    With a positive `debounce_window`, plain text messages a user sends in
+    quick succession are merged into a single message, so the burst costs
+    one handler run (and one LLM turn) instead of one per message.
+    """
+
+    def __init__(self, max_pending: int = 3, debounce_window: float = 0.0, max_debounce: float = 2.0):
+        """
+        Args:
+            max_pending: How many messages per user may wait; further ones get a backpressure reply.
+            debounce_window: Seconds of silence that end a burst. 0 disables coalescing.
+            max_debounce: Upper bound on how long a burst is collected.
+        """
+        self.max_pending = max_pending
+        self.debounce_window = debounce_window
+        self.max_debounce = max_debounce
+        self._users: Dict[int, _UserState] = {}
+        self.stats = {"coalesced": 0, "llm_calls_saved": 0, "rejected": 0}
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not event.from_user:
+            return await handler(event, data)
+
+        user_id = event.from_user.id
+        state = self._users.setdefault(user_id, _UserState())
+        now = asyncio.get_running_loop().time()
+        can_coalesce = self._can_coalesce(event)
+
+        if can_coalesce and state.burst is not None:
+            # The first message of the burst will handle this text as well.
+            state.burst.texts.append(event.text)
+            state.burst.last_arrival = now
+            self.stats["coalesced"] += 1
+            self.stats["llm_calls_saved"] += 1
+            return None
+
+        if state.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            await event.answer(BACKPRESSURE_REPLY)
+            return None
+
+        burst = None
+        if can_coalesce:
+            burst = state.burst = _Burst(texts=[event.text], started=now, last_arrival=now)
+        else:
+            # Texts sent after this message must not be merged into an earlier burst.
+            state.burst = None
+
+        state.pending += 1
+        try:
+            async with state.lock:
+                if burst is not None:
+                    event = await self._finish_burst(state, burst, event)
+                return await handler(event, data)
+        finally:
+            state.pending -= 1
+            if state.pending == 0:
+                self._users.pop(user_id, None)
+
+    def _can_coalesce(self, event: Message) -> bool:
+        return self.debounce_window > 0 and bool(event.text) and not event.text.startswith("/")
+
+    async def _finish_burst(self, state: _UserState, burst: _Burst, event: Message) -> Message:
+        """Waits until the user stops typing and returns the merged message."""
+        loop = asyncio.get_running_loop()
+        while state.burst is burst:
+            deadline = min(burst.last_arrival + self.debounce_window, burst.started + self.max_debounce)
+            delay = deadline - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if state.burst is burst:
+            state.burst = None
+
+        if len(burst.texts) == 1:
+            return event
+        return event.model_copy(update={"text": "\n".join(burst.texts)})
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Outer middleware that tags every log record written while handling an
+    event with the update ID and the user ID.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update = data.get("event_update")
+        user = data.get("event_from_user")
+        with log_context(
+            update_id=update.update_id if update is not None else None,
+            user_id=user.id if user is not None else None,
+        ):
+            return await handler(event, data)
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """
+    Outer middleware that notes every user's activity on an ActivityTracker
+    (bot/retention.py). The store is updated, and an archived user restored,
+    in a thread before the handler runs, at most once per user and day.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None and self.tracker.seen(user.id):
+            try:
+                await asyncio.to_thread(self.tracker.record, user.id)
+            except Exception:
+                logger.exception("Failed to record user activity", extra={"user_id": user.id})
+        return await handler(event, data)
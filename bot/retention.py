@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from bot.user_data import SETUP_KEYS, get_storage
+
+logger = logging.getLogger(__name__)
+
+# When the user last wrote to the bot (UNIX time), kept at a resolution of a day
+LAST_ACTIVE_KEY = "last_active"
+DAY = 86400
+
+# Days without messages after which a user's chat history is deleted (0 = never)
+RETENTION_HISTORY_DAYS = float(os.getenv("RETENTION_HISTORY_DAYS", "30"))
+# Days without messages after which a user is moved to the archive file (0 = never)
+RETENTION_ARCHIVE_DAYS = float(os.getenv("RETENTION_ARCHIVE_DAYS", "180"))
+RETENTION_ARCHIVE_PATH = os.getenv("RETENTION_ARCHIVE_PATH", "user_archive.jsonl")
+# Seconds between two maintenance steps, users checked per step, and free database pages handed back per step
+RETENTION_STEP_SECONDS = float(os.getenv("RETENTION_STEP_SECONDS", "30"))
+RETENTION_SLICE_USERS = int(os.getenv("RETENTION_SLICE_USERS", "200"))
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "256"))
+# Hours from the start of one maintenance pass over all users to the next
+RETENTION_PASS_HOURS = float(os.getenv("RETENTION_PASS_HOURS", "24"))
+
+
+class ColdArchive:
+    """
+    Users moved out of the store, as JSON lines appended to a file:
+    {"user_id", "archived_at", "data"} when archived and {"user_id",
+    "restored_at"} when brought back.
+
+    The offset of each archived user's record is kept in memory and read
+    from the new end of the file when it grows (e.g. written by another
+    process), so looking a user up does not scan the archive.
+    """
+
+    def __init__(self, path: str = RETENTION_ARCHIVE_PATH):
+        self.path = path
+        self._offsets: dict[int, int] = {}
+        self._read_size = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size <= self._read_size:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._read_size)
+            offset = self._read_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.error("Skipping a damaged line of the user archive at offset %d", offset)
+                else:
+                    if "restored_at" in record:
+                        self._offsets.pop(record["user_id"], None)
+                    else:
+                        self._offsets[record["user_id"]] = offset
+                offset += len(line)
+        self._read_size = offset
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            self._refresh()
+            return user_id in self._offsets
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
+
+    def _append(self, records: list[dict]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records))
+
+    def archive(self, users: list[tuple[int, dict]], archived_at: float) -> None:
+        """Appends the data of several users."""
+        with self._lock:
+            self._append([{"user_id": user_id, "archived_at": archived_at, "data": data} for user_id, data in users])
+            self._refresh()
+
+    def restore(self, user_id: int, restored_at: float) -> dict | None:
+        """Returns an archived user's data and marks them as restored, or None if not archived."""
+        with self._lock:
+            self._refresh()
+            offset = self._offsets.get(user_id)
+            if offset is None:
+                return None
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = json.loads(f.readline())["data"]
+            self._append([{"user_id": user_id, "restored_at": restored_at}])
+            self._refresh()
+            return data
+
+    def discard(self, user_ids: list[int], discarded_at: float) -> None:
+        """Drops the archived records of users who stayed in the store, so they are never restored."""
+        with self._lock:
+            self._append([{"user_id": user_id, "restored_at": discarded_at} for user_id in user_ids])
+            self._refresh()
+
+
+class ActivityTracker:
+    """
+    Remembers when users last wrote to the bot.
+
+    Every message updates an in-memory time; the store's LAST_ACTIVE_KEY is
+    written at most once per user and day. The first message of an archived
+    user brings their data back from the archive.
+    """
+
+    def __init__(self, store=None, archive: ColdArchive | None = None, clock: Callable[[], float] = time.time):
+        self.store = store
+        self.archive = archive if archive is not None else ColdArchive()
+        self.clock = clock
+        self._last_seen: dict[int, float] = {}
+        self._recorded_day: dict[int, int] = {}
+
+    def seen(self, user_id: int) -> bool:
+        """Notes a message of the user. Returns True if the store should be updated (see record())."""
+        now = self.clock()
+        self._last_seen[user_id] = now
+        return self._recorded_day.get(user_id) != int(now // DAY)
+
+    def last_seen(self, user_id: int) -> float | None:
+        return self._last_seen.get(user_id)
+
+    def recorded_today(self, user_id: int) -> bool:
+        return self._recorded_day.get(user_id) == int(self.clock() // DAY)
+
+    def record(self, user_id: int) -> None:
+        """Writes the user's activity to the store, restoring them from the archive first."""
+        store = self.store or get_storage()
+        now = self.clock()
+        data = self.archive.restore(user_id, now) if user_id in self.archive else None
+        if data:
+            logger.info("Restored an archived user", extra={"user_id": user_id})
+        items = [(user_id, key, value) for key, value in (data or {}).items()]
+        store.set_many(items + [(user_id, LAST_ACTIVE_KEY, now)])
+        self._recorded_day[user_id] = int(now // DAY)
+
+
+class StoreMaintenance:
+    """
+    Ages out the data of inactive users, a slice of users at a time.
+
+    A pass visits every user: chat histories of users inactive for
+    `history_days` are deleted, users inactive for `archive_days` are moved
+    to the archive, and users never seen active start being counted from
+    now. Each step handles `slice_users` users and hands back at most
+    `vacuum_pages` free database pages, so the work is spread out instead
+    of stalling the store. Passes start `pass_hours` apart; the store size
+    and the time of a batch-job scan are measured before and after each.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        archive: ColdArchive | None = None,
+        tracker: ActivityTracker | None = None,
+        history_days: float = RETENTION_HISTORY_DAYS,
+        archive_days: float = RETENTION_ARCHIVE_DAYS,
+        slice_users: int = RETENTION_SLICE_USERS,
+        vacuum_pages: int = RETENTION_VACUUM_PAGES,
+        pass_hours: float = RETENTION_PASS_HOURS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.store = store
+        self.archive = archive if archive is not None else ColdArchive()
+        self.tracker = tracker
+        self.history_days = history_days
+        self.archive_days = archive_days
+        self.slice_users = slice_users
+        self.vacuum_pages = vacuum_pages
+        self.pass_hours = pass_hours
+        self.clock = clock
+        self._chunks = None
+        self._next_pass_at = 0.0
+        self._free_pages = 0
+        self._report: dict[str, Any] = {}
+
+    def _store(self):
+        return self.store or get_storage()
+
+    def _timed_scan(self) -> float:
+        """Times a scan of the keys batch jobs load (see iter_users)."""
+        started = time.perf_counter()
+        for _ in self._store().iter_users(list(SETUP_KEYS)):
+            pass
+        return time.perf_counter() - started
+
+    def _last_active(self, user_id: int, data: dict) -> float | None:
+        times = [data.get(LAST_ACTIVE_KEY), self.tracker.last_seen(user_id) if self.tracker else None]
+        times = [value for value in times if value]
+        return max(times) if times else None
+
+    def _active_since(self, user_id: int, cutoff: float) -> bool:
+        """Checks the in-memory activity, which may be newer than the chunk read at the start of a step."""
+        if self.tracker is None:
+            return False
+        last_seen = self.tracker.last_seen(user_id)
+        return bool(last_seen and last_seen > cutoff) or self.tracker.recorded_today(user_id)
+
+    def step(self) -> dict | None:
+        """
+        Handles the next slice of users. Blocking; run it in a thread.
+
+        Returns:
+            The report of the pass once it is complete, None otherwise.
+        """
+        now = self.clock()
+        store = self._store()
+        if self._chunks is None:
+            if now < self._next_pass_at:
+                if self._free_pages:
+                    self._free_pages = store.compact(self.vacuum_pages)
+                return None
+            self._next_pass_at = now + self.pass_hours * 3600
+            self._report = {
+                "users": 0, "histories_dropped": 0, "archived": 0, "longest_step": 0.0,
+                "size_before": store.size_bytes(), "scan_before": self._timed_scan(),
+            }
+            self._chunks = store.iter_users(None, self.slice_users)
+
+        started = time.perf_counter()
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._chunks = None
+            self._free_pages = store.compact(self.vacuum_pages) if self._free_pages else 0
+            self._report.update(size_after=store.size_bytes(), scan_after=self._timed_scan())
+            return self._report
+
+        first_seen, stale_histories, inactive = [], [], []
+        for user_id, data in chunk:
+            last_active = self._last_active(user_id, data)
+            if last_active is None:
+                first_seen.append((user_id, LAST_ACTIVE_KEY, now))
+            elif self.archive_days and now - last_active > self.archive_days * DAY:
+                inactive.append((user_id, data))
+            elif self.history_days and now - last_active > self.history_days * DAY and data.get("history"):
+                stale_histories.append((user_id, "history"))
+        archive_cutoff = now - self.archive_days * DAY
+        inactive = [(user_id, data) for user_id, data in inactive if not self._active_since(user_id, archive_cutoff)]
+        if inactive:
+            # Written to the archive before being deleted, so a crash in between loses nothing.
+            # Users who wrote since the chunk was read are kept, and their archived copy dropped.
+            self.archive.archive(inactive, now)
+            deleted = set(store.delete_inactive_users([user_id for user_id, _ in inactive], LAST_ACTIVE_KEY, archive_cutoff))
+            kept = [user_id for user_id, _ in inactive if user_id not in deleted]
+            if kept:
+                self.archive.discard(kept, now)
+            inactive = [(user_id, data) for user_id, data in inactive if user_id in deleted]
+        history_cutoff = now - self.history_days * DAY
+        stale_histories = [(user_id, key) for user_id, key in stale_histories if not self._active_since(user_id, history_cutoff)]
+        if stale_histories:
+            store.delete_many(stale_histories)
+        if first_seen:
+            store.set_many(first_seen)
+        if inactive or stale_histories or self._free_pages:
+            self._free_pages = store.compact(self.vacuum_pages)
+
+        self._report["users"] += len(chunk)
+        self._report["histories_dropped"] += len(stale_histories)
+        self._report["archived"] += len(inactive)
+        self._report["longest_step"] = max(self._report["longest_step"], time.perf_counter() - started)
+        return None
+
+    def run_pass(self) -> dict:
+        """Runs a whole pass at once (tests and benchmarks)."""
+        self._next_pass_at = 0.0
+        while True:
+            report = self.step()
+            if report is not None:
+                return report
+
+
+archive = ColdArchive()
+activity = ActivityTracker(archive=archive)
+store_maintenance = StoreMaintenance(archive=archive, tracker=activity)
@@ -0,0 +1,422 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+def _iter_json_object(f, read_size: int = 1 << 16) -> Iterator[tuple[str, Any]]:
+    """
+    Yields the (key, value) pairs of the JSON object in a text file one at a
+    time, reading the file in blocks, so only one value is in memory at once.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, eof
+        block = f.read(read_size)
+        eof = not block
+        buffer, pos = buffer[pos:] + block, 0
+        return not eof
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not read_more():
+                return buffer[pos:pos + 1]
+
+    def decode() -> Any:
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A value ending at the end of the buffer may continue in the next block
+                if end < len(buffer) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+
+    def expect(chars: str) -> str:
+        nonlocal pos
+        char = peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", buffer, pos)
+        pos += 1
+        return char
+
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        peek()
+        key = decode()
+        expect(":")
+        peek()
+        yield key, decode()
+        if expect(",}") == "}":
+            return
+
+
+def _project(data: Dict[str, Any], keys: list[str] | None) -> Dict[str, Any]:
+    return dict(data) if keys is None else {key: data.get(key) for key in keys}
+
+
+class JsonFileStorage:
+    """
+    Stores all users in a single JSON file. Suitable for a single process only,
+    because every write rewrites the whole file.
+
+    Writes load, change and save the file under a lock, so writers in
+    threads (e.g. the retention job) do not overwrite each other's changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+
+    def load_all(self) -> Dict[str, Any]:
+        """Loads user data from the JSON file."""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return {}
+
+    def save_all(self, data: Dict[str, Any]) -> None:
+        """
+        Saves user data to the JSON file. The file is replaced atomically, so
+        a reader streaming the old file (see iter_users) is not disturbed.
+        """
+        temp_path = None
+        try:
+            with self._lock:
+                fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp",
+                                                 dir=os.path.dirname(os.path.abspath(self.path)))
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(temp_path, self.path)
+        except IOError as e:
+            logger.error("Error saving user data: %s", e)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get(self, user_id: int, key: str) -> Any:
+        return self.load_all().get(str(user_id), {}).get(key)
+
+    def set(self, user_id: int, key: str, value: Any) -> None:
+        with self._lock:
+            data = self.load_all()
+            data.setdefault(str(user_id), {})[key] = value
+            self.save_all(data)
+
+    def set_many(self, items: list[tuple[int, str, Any]]) -> None:
+        """Sets several (user_id, key, value) items with a single rewrite of the file."""
+        with self._lock:
+            data = self.load_all()
+            for user_id, key, value in items:
+                data.setdefault(str(user_id), {})[key] = value
+            self.save_all(data)
+
+    def get_many(self, user_id: int, keys: list[str]) -> Dict[str, Any]:
+        """Returns the given keys of a user that are set."""
+        data = self.load_all().get(str(user_id), {})
+        return {key: data[key] for key in keys if key in data}
+
+    def get_prefix(self, user_id: int, prefix: str) -> Dict[str, Any]:
+        """Returns a user's keys that start with `prefix`."""
+        data = self.load_all().get(str(user_id), {})
+        return {key: value for key, value in data.items() if key.startswith(prefix)}
+
+    def delete_many(self, items: list[tuple[int, str]]) -> None:
+        """Deletes several (user_id, key) items with a single rewrite of the file."""
+        with self._lock:
+            data = self.load_all()
+            for user_id, key in items:
+                data.get(str(user_id), {}).pop(key, None)
+            self.save_all(data)
+
+    def delete_users(self, user_ids: list[int]) -> None:
+        """Deletes all data of several users with a single rewrite of the file."""
+        with self._lock:
+            data = self.load_all()
+            for user_id in user_ids:
+                data.pop(str(user_id), None)
+            self.save_all(data)
+
+    def delete_inactive_users(self, user_ids: list[int], active_key: str, cutoff: float) -> list[int]:
+        """
+        Deletes the users whose `active_key` is missing or not later than
+        `cutoff`, checked and deleted under the write lock.
+
+        Returns:
+            The IDs of the deleted users.
+        """
+        with self._lock:
+            data = self.load_all()
+            deleted = [user_id for user_id in user_ids
+                       if str(user_id) in data and (data[str(user_id)].get(active_key) or 0) <= cutoff]
+            for user_id in deleted:
+                del data[str(user_id)]
+            if deleted:
+                self.save_all(data)
+            return deleted
+
+    def compact(self, max_pages: int) -> int:
+        """Nothing to do: every write rewrites the file without the deleted data. Returns 0."""
+        return 0
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def user_ids(self) -> list[int]:
+        return [int(user_id) for user_id in self.load_all().keys()]
+
+    def iter_users(self, keys: list[str] | None = None, chunk_size: int = 500) -> Iterator[list[tuple[int, Dict[str, Any]]]]:
+        """
+        Yields lists of up to `chunk_size` (user_id, data) pairs, with only the
+        given keys in `data` (None for missing ones; all keys if `keys` is None).
+
+        The file is parsed incrementally, so memory use does not grow with the
+        number of users.
+        """
+        if not os.path.exists(self.path):
+            return
+        chunk = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for user_id, data in _iter_json_object(f):
+                    chunk.append((int(user_id), _project(data, keys)))
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error("Error reading user data: %s", e)
+            return
+        if chunk:
+            yield chunk
+
+
+class SQLiteStorage:
+    """
+    Stores one row per (user, key) in SQLite. The database runs in WAL mode,
+    so several bot processes on the same host can share it safely.
+
+    Writes go through one connection under a lock, so writers in threads
+    (e.g. the retention job) never start a transaction inside another one.
+    Reads use a connection of the reading thread, so a read in a worker
+    thread never runs inside a write transaction of the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        # Lets compact() hand the pages of deleted rows back in small steps. Takes
+        # effect for new databases only (so it comes first); older ones reuse free pages instead.
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_data ("
+            " user_id INTEGER NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " PRIMARY KEY (user_id, key))"
+        )
+
+    def _reader(self) -> sqlite3.Connection:
+        """Returns the calling thread's read connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def load_all(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for user_id, key, value in self._reader().execute("SELECT user_id, key, value FROM user_data"):
+            data.setdefault(str(user_id), {})[key] = json.loads(value)
+        return data
+
+    def get(self, user_id: int, key: str) -> Any:
+        row = self._reader().execute(
+            "SELECT value FROM user_data WHERE user_id = ? AND key = ?", (int(user_id), key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, user_id: int, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO user_data (user_id, key, value) VALUES (?, ?, ?)"
+                " ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value",
+                (int(user_id), key, json.dumps(value, ensure_ascii=False)),
+            )
+
+    def set_many(self, items: list[tuple[int, str, Any]]) -> None:
+        """Sets several (user_id, key, value) items in one transaction."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO user_data (user_id, key, value) VALUES (?, ?, ?)"
+                " ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value",
+                [(int(user_id), key, json.dumps(value, ensure_ascii=False)) for user_id, key, value in items],
+            )
+
+    def get_many(self, user_id: int, keys: list[str]) -> Dict[str, Any]:
+        """Returns the given keys of a user that are set."""
+        if not keys:
+            return {}
+        rows = self._reader().execute(
+            f"SELECT key, value FROM user_data WHERE user_id = ? AND key IN ({', '.join('?' * len(keys))})",
+            [int(user_id), *keys],
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_prefix(self, user_id: int, prefix: str) -> Dict[str, Any]:
+        """Returns a user's keys that start with `prefix`, read as a range of the primary key."""
+        if not prefix:
+            rows = self._reader().execute("SELECT key, value FROM user_data WHERE user_id = ?", (int(user_id),))
+            return {key: json.loads(value) for key, value in rows}
+        # A range rather than LIKE, which cannot use the index
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self._reader().execute(
+            "SELECT key, value FROM user_data WHERE user_id = ? AND key >= ? AND key < ?",
+            (int(user_id), prefix, upper),
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def delete_many(self, items: list[tuple[int, str]]) -> None:
+        """Deletes several (user_id, key) items in one transaction."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "DELETE FROM user_data WHERE user_id = ? AND key = ?",
+                [(int(user_id), key) for user_id, key in items],
+            )
+
+    def delete_users(self, user_ids: list[int]) -> None:
+        """Deletes all data of several users in one transaction."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM user_data WHERE user_id = ?", [(int(user_id),) for user_id in user_ids])
+
+    def delete_inactive_users(self, user_ids: list[int], active_key: str, cutoff: float) -> list[int]:
+        """
+        Deletes the users whose `active_key` is missing or not later than
+        `cutoff`. The check and the deletion run in one write transaction, so
+        a user who becomes active in between (in any process) is kept.
+
+        Returns:
+            The IDs of the deleted users.
+        """
+        if not user_ids:
+            return []
+        placeholders = ", ".join("?" * len(user_ids))
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            active = {row[0] for row in self._conn.execute(
+                f"SELECT user_id FROM user_data WHERE key = ? AND user_id IN ({placeholders}) AND CAST(value AS REAL) > ?",
+                [active_key, *map(int, user_ids), cutoff],
+            )}
+            present = {row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT user_id FROM user_data WHERE user_id IN ({placeholders})", [*map(int, user_ids)],
+            )}
+            deleted = [int(user_id) for user_id in user_ids if int(user_id) in present - active]
+            self._conn.executemany("DELETE FROM user_data WHERE user_id = ?", [(user_id,) for user_id in deleted])
+        return deleted
+
+    def compact(self, max_pages: int) -> int:
+        """
+        Returns up to `max_pages` free pages to the file system, so a large
+        deletion is compacted in short steps rather than by one VACUUM.
+
+        Returns:
+            The number of free pages left.
+        """
+        with self._lock:
+            # execute() would run only the first step of the pragma, freeing one page
+            self._conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+            left = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not left:
+                # The log keeps its largest size until truncated
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            return left
+
+    def size_bytes(self) -> int:
+        """Returns the size of the database file and its write-ahead log."""
+        return sum(os.path.getsize(path) for path in (self.path, f"{self.path}-wal") if os.path.exists(path))
+
+    def user_ids(self) -> list[int]:
+        return [row[0] for row in self._reader().execute("SELECT DISTINCT user_id FROM user_data")]
+
+    def iter_users(self, keys: list[str] | None = None, chunk_size: int = 500) -> Iterator[list[tuple[int, Dict[str, Any]]]]:
+        """
+        Yields lists of up to `chunk_size` (user_id, data) pairs, with only the
+        given keys in `data` (None for missing ones; all keys if `keys` is None).
+
+        Users are paged through by ID, so only one chunk is read at a time and
+        other processes can write in between.
+        """
+        key_filter, key_params = "", []
+        if keys is not None:
+            key_filter = f" AND key IN ({', '.join('?' * len(keys))})"
+            key_params = list(keys)
+        last_id = -(2 ** 63)
+        while True:
+            user_ids = [row[0] for row in self._reader().execute(
+                "SELECT DISTINCT user_id FROM user_data WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                (last_id, chunk_size),
+            )]
+            if not user_ids:
+                return
+            users = {user_id: {} for user_id in user_ids}
+            for user_id, key, value in self._reader().execute(
+                "SELECT user_id, key, value FROM user_data WHERE user_id BETWEEN ? AND ?" + key_filter,
+                [user_ids[0], user_ids[-1], *key_params],
+            ):
+                users[user_id][key] = json.loads(value)
+            yield [(user_id, _project(data, keys)) for user_id, data in users.items()]
+            last_id = user_ids[-1]
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._conn.close()
+
+
+def create_storage(backend: str, path: str):
+    """
+    Creates a storage backend by name.
+
+    Args:
+        backend: 'json' for the single-file store, 'sqlite' for the shared store.
+        path: The file the backend keeps its data in.
+
+    Returns:
+        The storage instance.
+    """
+    if backend == "json":
+        return JsonFileStorage(path)
+    if backend == "sqlite":
+        return SQLiteStorage(path)
+    raise ValueError(f"Unknown user data backend: {backend}")
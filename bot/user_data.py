@@ -1,26 +1,35 @@
-import json
+import asyncio
 import os
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Callable, Iterable
+
+from bot.history import History
+from bot.storage import create_storage
+from core.config import config
 
 DATA_FILE = "user_data.json"
+DATA_DB = "user_data.db"
+
+# Users per chunk when iterating over all users
+USER_CHUNK_SIZE = 500
+
+# Keys a user needs for the evening plan and morning reminder
+SETUP_KEYS = ("home_location", "university_location", "google_refresh_token")
+
+_storage = None
 
-def _load_data() -> Dict[str, Any]:
-    """Loads user data from the JSON file."""
-    if not os.path.exists(DATA_FILE):
-        return {}
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
-
-def _save_data(data: Dict[str, Any]) -> None:
-    """Saves user data to the JSON file."""
-    try:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-    except IOError as e:
-        print(f"Error saving user data: {e}")
+def get_storage():
+    """
+    Returns the storage backend, creating it on first use.
+
+    The backend is chosen with USER_DATA_BACKEND: 'json' (default) keeps
+    everything in DATA_FILE, 'sqlite' uses a database shared by all workers.
+    """
+    global _storage
+    if _storage is None:
+        backend = os.getenv("USER_DATA_BACKEND", "json").lower()
+        default_path = DATA_DB if backend == "sqlite" else DATA_FILE
+        _storage = create_storage(backend, os.getenv("USER_DATA_PATH", default_path))
+    return _storage
 
 def get_user_data(user_id: int, key: str) -> Any:
     """
@@ -33,30 +42,22 @@ def get_user_data(user_id: int, key: str) -> Any:
     Returns:
         The value associated with the key, or None if not found.
     """
-    data = _load_data()
-    return data.get(str(user_id), {}).get(key)
+    return get_storage().get(user_id, key)
 
 def update_user_data(user_id: int, key: str, value: Any) -> None:
     """
     Updates or adds a specific piece of data for a given user.
     """
-    data = _load_data()
-    user_id_str = str(user_id)
-    if user_id_str not in data:
-        data[user_id_str] = {}
-    data[user_id_str][key] = value
-    _save_data(data)
+    get_storage().set(user_id, key, value)
 
 
 # --- Conversation History Functions ---
 
-MAX_HISTORY_LENGTH = 10 # Store last 5 turns (user + model)
-
-def get_user_history(user_id: int) -> list:
+def get_user_history(user_id: int) -> History:
     """
     Retrieves the conversation history for a given user.
     """
-    return get_user_data(user_id, 'history') or []
+    return History.loads(get_user_data(user_id, 'history'))
 
 def add_to_user_history(user_id: int, user_message: str, model_message: str):
     """
@@ -64,20 +65,49 @@ def add_to_user_history(user_id: int, user_message: str, model_message: str):
     and keeps the history trimmed to a maximum length.
     """
     history = get_user_history(user_id)
+    history.append("user", user_message)
+    history.append("model", model_message)
 
-    # Add the new messages in the format expected by Gemini
-    history.append({"role": "user", "parts": [user_message]})
-    history.append({"role": "model", "parts": [model_message]})
+    # Keep the history trimmed to the last max_history_length messages (5 turns of user + model by default)
+    history.trim(config.settings.max_history_length)
 
-    # Keep the history list trimmed to the last MAX_HISTORY_LENGTH messages
-    if len(history) > MAX_HISTORY_LENGTH:
-        history = history[-MAX_HISTORY_LENGTH:]
-
-    update_user_data(user_id, 'history', history)
+    # Stored encoded; histories saved as lists of messages are converted on their next update
+    update_user_data(user_id, 'history', history.dumps())
 
 def get_all_user_ids() -> list[int]:
     """
     Returns a list of all user IDs that have data stored.
     """
-    data = _load_data()
-    return [int(user_id) for user_id in data.keys()]
+    return get_storage().user_ids()
+
+def has_completed_setup(user: dict) -> bool:
+    """Tells whether a user (with at least SETUP_KEYS loaded) has set up home, university and Google Calendar."""
+    return all(user.get(key) for key in SETUP_KEYS)
+
+async def iter_users(
+    keys: Iterable[str] | None = None,
+    chunk_size: int = USER_CHUNK_SIZE,
+    where: Callable[[dict], bool] | None = None,
+) -> AsyncIterator[list[tuple[int, dict]]]:
+    """
+    Iterates over all users in chunks, for batch jobs.
+
+    Args:
+        keys: The keys to load for each user (missing ones are None); all keys if None.
+        chunk_size: Users read from the store at a time.
+        where: Optional predicate on a user's loaded data; other users are skipped.
+
+    Yields:
+        Non-empty lists of (user_id, data) pairs. The store is read in a
+        thread, one chunk at a time, so the event loop is not blocked and
+        memory use does not grow with the number of users.
+    """
+    chunks = get_storage().iter_users(list(keys) if keys is not None else None, chunk_size)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        if where is not None:
+            chunk = [(user_id, data) for user_id, data in chunk if where(data)]
+        if chunk:
+            yield chunk
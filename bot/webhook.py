@@ -0,0 +1,138 @@
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+WEBHOOK_PATH = "/webhook"
+HEALTH_PATH = "/healthz"
+
+# How long shutdown waits for updates that are still being processed.
+DRAIN_TIMEOUT = 25.0
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler that stops accepting updates on shutdown and waits for
+    the ones already being processed before closing the bot session.
+    """
+
+    def __init__(self, *args, drain_timeout: float = DRAIN_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.drain_timeout = drain_timeout
+        self.draining = False
+
+    @property
+    def in_flight(self) -> int:
+        """Number of updates currently being processed in the background."""
+        return len(self._background_feed_update_tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.draining:
+            # Telegram retries non-2xx responses, so the update is not lost.
+            return web.Response(text="Shutting down", status=503)
+        return await super().handle(request)
+
+    __call__ = handle
+
+    async def drain(self) -> None:
+        """Waits for in-flight updates, up to `drain_timeout` seconds."""
+        self.draining = True
+        pending = set(self._background_feed_update_tasks)
+        if not pending:
+            return
+        logging.info("Draining %d in-flight update(s)...", len(pending))
+        _, still_pending = await asyncio.wait(pending, timeout=self.drain_timeout)
+        if still_pending:
+            logging.warning("%d update(s) did not finish before shutdown.", len(still_pending))
+
+    async def close(self) -> None:
+        await self.drain()
+        await super().close()
+
+
+WEBHOOK_HANDLER_KEY = web.AppKey("webhook_handler", DrainingRequestHandler)
+
+
+def create_webhook_app(
+    bot: Bot,
+    dp: Dispatcher,
+    secret_token: str | None = None,
+    path: str = WEBHOOK_PATH,
+    drain_timeout: float = DRAIN_TIMEOUT,
+) -> web.Application:
+    """
+    Builds the aiohttp application that receives Telegram updates.
+
+    Args:
+        bot: The bot instance updates are dispatched to.
+        dp: The dispatcher with all routers included.
+        secret_token: Expected value of the `X-Telegram-Bot-Api-Secret-Token` header.
+        path: The URL path Telegram posts updates to.
+        drain_timeout: Seconds to wait for in-flight updates on shutdown.
+
+    Returns:
+        The configured aiohttp application.
+    """
+    app = web.Application()
+    handler = DrainingRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        drain_timeout=drain_timeout,
+    )
+    handler.register(app, path=path)
+    app[WEBHOOK_HANDLER_KEY] = handler
+
+    async def health(request: web.Request) -> web.Response:
+        status = "draining" if handler.draining else "ok"
+        return web.json_response(
+            {"status": status, "in_flight": handler.in_flight},
+            status=503 if handler.draining else 200,
+        )
+
+    app.router.add_get(HEALTH_PATH, health)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(
+    bot: Bot,
+    dp: Dispatcher,
+    base_url: str,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    secret_token: str | None = None,
+    path: str = WEBHOOK_PATH,
+) -> None:
+    """
+    Registers the webhook with Telegram and serves updates until cancelled.
+
+    Args:
+        bot: The bot instance.
+        dp: The dispatcher with all routers included.
+        base_url: Public HTTPS URL that Telegram can reach, without the path.
+        host: The address to listen on.
+        port: The port to listen on.
+        secret_token: Secret Telegram sends back with every update.
+        path: The URL path for updates.
+    """
+    app = create_webhook_app(bot, dp, secret_token=secret_token, path=path)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    logging.info("Webhook server listening on %s:%d%s", host, port, path)
+
+    await bot.set_webhook(
+        f"{base_url.rstrip('/')}{path}",
+        secret_token=secret_token,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # Runs the app's shutdown hooks, which drain in-flight updates.
+        await runner.cleanup()
@@ -0,0 +1,215 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Update fields that carry the user who triggered the update.
+_USER_UPDATE_FIELDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+)
+
+
+def extract_user_id(update: dict) -> int | None:
+    """
+    Returns the ID of the user (or chat) an update belongs to, or None if the
+    update has no user, e.g. a channel post.
+    """
+    for field in _USER_UPDATE_FIELDS:
+        event = update.get(field)
+        if not event:
+            continue
+        user = event.get("from") or {}
+        if "id" in user:
+            return user["id"]
+        chat = event.get("chat") or {}
+        if "id" in chat:
+            return chat["id"]
+    return None
+
+
+def route_update(update: dict, num_workers: int) -> int:
+    """
+    Picks the worker for an update. All updates of one user go to the same
+    worker, independent of which process does the routing, so their order is kept.
+    """
+    user_id = extract_user_id(update)
+    key = user_id if user_id is not None else update.get("update_id", 0)
+    return key % num_workers
+
+
+async def consume_updates(queue, dp: Dispatcher, bot: Bot) -> None:
+    """
+    Feeds raw updates from `queue` to the dispatcher until a None sentinel arrives.
+
+    Updates of different users are processed concurrently, while updates of
+    the same user are processed one after another in arrival order.
+    """
+    loop = asyncio.get_running_loop()
+    tails: Dict[Any, asyncio.Task] = {}
+
+    async def feed_after(previous: asyncio.Task | None, update: dict) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logger.exception("Worker failed to process update", extra={"update_id": update.get("update_id")})
+
+    def forget(user_id, task: asyncio.Task) -> None:
+        if tails.get(user_id) is task:
+            del tails[user_id]
+
+    while True:
+        update = await loop.run_in_executor(None, queue.get)
+        if update is None:
+            break
+        user_id = extract_user_id(update)
+        task = asyncio.create_task(feed_after(tails.get(user_id), update))
+        tails[user_id] = task
+        task.add_done_callback(lambda t, uid=user_id: forget(uid, t))
+
+    # The last task of every user finishes only after all earlier ones.
+    if tails:
+        await asyncio.wait(list(tails.values()))
+
+
+def load_router(router_path: str):
+    """Imports a router given as 'package.module:attribute'."""
+    module_name, attribute = router_path.split(":", 1)
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def load_routers(router_paths: str) -> list:
+    """Imports the comma-separated routers, in order."""
+    return [load_router(path.strip()) for path in router_paths.split(",") if path.strip()]
+
+
+async def _run_worker(queue, ready, bot_token: str, router_path: str, run_scheduler: bool) -> None:
+    bot = Bot(token=bot_token)
+    dp = Dispatcher()
+    dp.include_routers(*load_routers(router_path))
+
+    election = None
+    if run_scheduler:
+        # Every worker competes for the lease; only the winner runs scheduled jobs.
+        from bot.user_data import get_storage
+        from scheduler.leader import LeaderLease
+        from scheduler.scheduler import setup_scheduler_with_leader_election
+        election = setup_scheduler_with_leader_election(bot, LeaderLease(get_storage().path))
+
+    ready.set()
+    from core.warmup import warm_up
+    warm_up_task = asyncio.create_task(warm_up())
+    from core.diagnostics import loop_monitor
+    loop_monitor.start()
+    # Every worker watches the config file itself
+    from core.config import config
+    config.start()
+    try:
+        await consume_updates(queue, dp, bot)
+    finally:
+        warm_up_task.cancel()
+        loop_monitor.stop()
+        config.stop()
+        if election:
+            election.cancel()
+        await bot.session.close()
+
+
+def _worker_main(queue, ready, bot_token: str, router_path: str, run_scheduler: bool) -> None:
+    # Spawned processes start without the parent's logging setup
+    from core.logging_setup import setup_logging
+    log_listener = setup_logging()
+    try:
+        asyncio.run(_run_worker(queue, ready, bot_token, router_path, run_scheduler))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_listener.stop()
+
+
+class WorkerPool:
+    """
+    A set of worker processes, each running its own dispatcher. Updates are
+    routed to workers by user ID.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        bot_token: str,
+        router_path: str = "bot.admin:router,bot.handlers:router",
+        run_scheduler: bool = True,
+    ):
+        self.num_workers = num_workers
+        self.bot_token = bot_token
+        self.router_path = router_path
+        self.run_scheduler = run_scheduler
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = [self._context.Queue() for _ in range(num_workers)]
+        self.ready_events = [self._context.Event() for _ in range(num_workers)]
+        self.processes: list = []
+
+    def start(self) -> None:
+        for index, (queue, ready) in enumerate(zip(self.queues, self.ready_events)):
+            process = self._context.Process(
+                target=_worker_main,
+                args=(queue, ready, self.bot_token, self.router_path, self.run_scheduler),
+                name=f"bot-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Blocks until every worker has loaded its handlers."""
+        return all(event.wait(timeout) for event in self.ready_events)
+
+    def submit(self, update: dict) -> None:
+        """Sends a raw update (as a JSON-compatible dict) to its worker."""
+        self.queues[route_update(update, self.num_workers)].put(update)
+
+    def stop(self, timeout: float | None = 30.0) -> None:
+        """Lets every worker finish its queued updates, then waits for it to exit."""
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+
+
+class ForwardToWorkersMiddleware(BaseMiddleware):
+    """
+    Outer update middleware for the front process: hands every update to the
+    worker pool instead of processing it locally.
+    """
+
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.pool.submit(event.model_dump(mode="json", exclude_none=True, by_alias=True))
+        return UNHANDLED
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import re
+import tomllib
+from dataclasses import dataclass, field, fields
+from typing import Callable
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# TOML file with the settings below; its values take precedence over the environment
+CONFIG_PATH = os.getenv("CONFIG_PATH", "config.toml")
+# Seconds between two checks of the file for changes
+CONFIG_POLL_SECONDS = float(os.getenv("CONFIG_POLL_SECONDS", "5"))
+
+_CLOCK = re.compile(r"([01]?\d|2[0-3]):([0-5]\d)")
+
+
+class ConfigError(ValueError):
+    """Raised when the settings do not validate; lists every problem found."""
+
+
+def _check_clock(value: str) -> None:
+    if not _CLOCK.fullmatch(value):
+        raise ValueError("expected HH:MM")
+
+
+def _check_timezone(value: str) -> None:
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError("unknown time zone") from None
+
+
+def _setting(default, env: str, minimum: float | None = None, maximum: float | None = None, check=None):
+    return field(default=default, metadata={"env": env, "min": minimum, "max": maximum, "check": check})
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Settings that can be tuned while the bot runs. Each is read from its
+    environment variable, then from the config file.
+    """
+
+    # Messages of chat history kept per user and sent to Gemini
+    max_history_length: int = _setting(10, "MAX_HISTORY_LENGTH", minimum=0)
+    gemini_model: str = _setting("models/gemini-1.5-flash-latest", "GEMINI_MODEL")
+    # Cheaper, faster model used while the load policy degrades service
+    gemini_fast_model: str = _setting("models/gemini-1.5-flash-8b-latest", "GEMINI_FAST_MODEL")
+    # Gemini requests in flight at once
+    llm_max_concurrency: int = _setting(8, "LLM_MAX_CONCURRENCY", minimum=1)
+    # Seconds a weather/news request may take (including a hedged duplicate), and a cp.sk page
+    api_timeout_seconds: float = _setting(5.0, "API_TIMEOUT_SECONDS", minimum=0.1)
+    cp_sk_timeout_seconds: float = _setting(10.0, "CP_SK_TIMEOUT_SECONDS", minimum=0.1)
+    # Seconds a tool request may take before the reply goes out without it
+    tool_timeout_seconds: float = _setting(8.0, "TOOL_TIMEOUT_SECONDS", minimum=0.1)
+    news_page_size: int = _setting(5, "NEWS_PAGE_SIZE", minimum=1, maximum=100)
+    # Forecast requests in flight at once while prefetching
+    forecast_concurrency: int = _setting(4, "FORECAST_CONCURRENCY", minimum=1)
+    # Per-user memory indexes kept open
+    memory_open_indexes: int = _setting(256, "MEMORY_OPEN_INDEXES", minimum=1)
+    # When the evening plan is sent, and the time zone of the scheduler and reminders
+    evening_plan_time: str = _setting("20:00", "EVENING_PLAN_TIME", check=_check_clock)
+    timezone: str = _setting("Europe/Bratislava", "TIMEZONE", check=_check_timezone)
+
+    @property
+    def evening_plan_hour_minute(self) -> tuple[int, int]:
+        hour, minute = self.evening_plan_time.split(":")
+        return int(hour), int(minute)
+
+    @property
+    def tzinfo(self) -> ZoneInfo:
+        return ZoneInfo(self.timezone)
+
+    @classmethod
+    def load(cls, file_values: dict | None = None, environ=None) -> "Settings":
+        """
+        Builds the settings from the defaults, the environment and the values
+        of the config file, in increasing precedence.
+
+        Raises:
+            ConfigError: A value has the wrong type or range, or the file has an unknown setting.
+        """
+        environ = os.environ if environ is None else environ
+        file_values = dict(file_values or {})
+        values, problems = {}, []
+        for setting in fields(cls):
+            kind = type(setting.default)
+            raw = file_values.pop(setting.name, environ.get(setting.metadata["env"]))
+            if raw is None or raw == "":
+                continue
+            try:
+                if kind is str:
+                    value = str(raw)
+                elif isinstance(raw, bool) or (kind is int and isinstance(raw, float)):
+                    raise ValueError(f"expected {kind.__name__}")
+                else:
+                    value = kind(raw)
+                if setting.metadata["min"] is not None and value < setting.metadata["min"]:
+                    raise ValueError(f"must be at least {setting.metadata['min']}")
+                if setting.metadata["max"] is not None and value > setting.metadata["max"]:
+                    raise ValueError(f"must be at most {setting.metadata['max']}")
+                if setting.metadata["check"] is not None:
+                    setting.metadata["check"](value)
+            except (TypeError, ValueError) as e:
+                problems.append(f"{setting.name} = {raw!r}: {e}")
+                continue
+            values[setting.name] = value
+        problems.extend(f"{name}: unknown setting" for name in file_values)
+        if problems:
+            raise ConfigError("; ".join(problems))
+        return cls(**values)
+
+
+class Config:
+    """
+    Holds the current Settings and reloads them when the config file
+    changes (see watch()) or on request (the /reload_config admin command).
+
+    A file that does not validate is rejected as a whole and the current
+    settings stay. Modules read `config.settings` when they use a value;
+    those holding a value in an object (e.g. a semaphore size) subscribe
+    to be told about new settings.
+    """
+
+    def __init__(self, path: str | None = CONFIG_PATH, environ=None):
+        self.path = path or None
+        self.environ = environ
+        self._listeners: list[Callable[[Settings], None]] = []
+        self._mtime = self._file_mtime()
+        self._task: asyncio.Task | None = None
+        self.settings = Settings.load(self._read_file(), environ)
+
+    def _file_mtime(self) -> float | None:
+        try:
+            return os.stat(self.path).st_mtime if self.path else None
+        except OSError:
+            return None
+
+    def _read_file(self) -> dict:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                return tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            raise ConfigError(f"{self.path}: {e}") from None
+
+    def subscribe(self, listener: Callable[[Settings], None]) -> None:
+        """Calls `listener` with the new settings after every reload that changes them."""
+        self._listeners.append(listener)
+
+    def apply(self, settings: Settings) -> list[str]:
+        """Makes `settings` current and notifies the listeners. Returns the names of the changed settings."""
+        changed = [setting.name for setting in fields(Settings)
+                   if getattr(settings, setting.name) != getattr(self.settings, setting.name)]
+        self.settings = settings
+        if changed:
+            for listener in self._listeners:
+                try:
+                    listener(settings)
+                except Exception:
+                    logger.exception("Failed to apply new settings")
+            logger.info("Settings changed: %s", ", ".join(f"{name}={getattr(settings, name)!r}" for name in changed))
+        return changed
+
+    def reload(self) -> list[str]:
+        """
+        Reads the file and the environment again.
+
+        Returns:
+            The names of the settings that changed.
+
+        Raises:
+            ConfigError: The new settings do not validate; the current ones are kept.
+        """
+        self._mtime = self._file_mtime()
+        return self.apply(Settings.load(self._read_file(), self.environ))
+
+    def reload_if_changed(self) -> list[str]:
+        """Reloads if the file changed since the last load; logs a rejected file instead of raising."""
+        if self._file_mtime() == self._mtime:
+            return []
+        try:
+            return self.reload()
+        except ConfigError as e:
+            logger.error("Rejected the new settings, keeping the current ones: %s", e)
+            return []
+
+    async def watch(self, interval: float = CONFIG_POLL_SECONDS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+
+    def start(self) -> None:
+        """Starts watching the config file in a background task."""
+        if self.path and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.watch())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+config = Config()
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse_stack(frame) -> str:
+    """Returns the stack as 'outer;...;inner' frame names, the collapsed-stack format of flamegraph tools."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a running process.
+
+    A background thread samples the stacks of the other threads every
+    `interval` seconds and counts identical stacks. Unlike cProfile it does
+    not slow down the profiled code, so it is safe to run in production.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: float | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self.started_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stops sampling and returns the collapsed stacks ('stack count' per line)."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                # The thread name is the root frame, so threads stay apart in the flamegraph
+                self.stacks[f"{names.get(thread_id, thread_id)};{collapse_stack(frame)}"] += 1
+            self.samples += 1
+
+
+def top_allocations(limit: int = 10, start_frames: int = 5) -> list[str] | None:
+    """
+    Returns the `limit` source lines holding the most memory allocated since
+    tracing started, or None after starting the tracing (the first call).
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(start_frames)
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    return [
+        f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks"
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs its callbacks.
+
+    A task sleeps for `interval` and records how much later than planned it
+    woke up: that lag is what every other callback waited as well. A
+    watchdog thread notices when the loop has been stuck for longer than
+    `stall_threshold` and records where the loop thread is, so blocking
+    callbacks can be found without turning on asyncio debug mode.
+    """
+
+    def __init__(self, interval: float = 0.25, stall_threshold: float = 0.1, history: int = 2400):
+        """
+        Args:
+            interval: Seconds between lag measurements.
+            stall_threshold: Lag in seconds that counts as a stall.
+            history: Number of lag measurements kept (10 minutes by default).
+        """
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.lags: deque = deque(maxlen=history)
+        self.stalls = 0
+        self.slow_callbacks: Counter = Counter()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog_stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Starts monitoring the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog_stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog_stop.set()
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _measure(self) -> None:
+        while True:
+            planned = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - planned)
+            self.lags.append(lag)
+            if lag >= self.stall_threshold:
+                self.stalls += 1
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._watchdog_stop.wait(self.stall_threshold / 2):
+            beat = self._heartbeat
+            if beat == reported_beat or time.monotonic() - beat < self.interval + self.stall_threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                # Where the loop is stuck; reported once per stall
+                self.slow_callbacks[f"{frame.f_code.co_filename}:{frame.f_lineno} {frame.f_code.co_name}"] += 1
+                reported_beat = beat
+
+    def stats(self) -> dict:
+        lags = sorted(self.lags)
+        if not lags:
+            return {"samples": 0, "lag_p50": 0.0, "lag_p95": 0.0, "lag_max": 0.0, "stalls": self.stalls}
+        return {
+            "samples": len(lags),
+            "lag_p50": lags[len(lags) // 2],
+            "lag_p95": lags[min(len(lags) - 1, int(0.95 * len(lags)))],
+            "lag_max": lags[-1],
+            "stalls": self.stalls,
+        }
+
+
+# The monitor of this process' event loop, started by main.py and each worker
+loop_monitor = LoopLagMonitor(stall_threshold=float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100")) / 1000)
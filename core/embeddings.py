@@ -0,0 +1,93 @@
+import asyncio
+import os
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from core.example_retriever import char_ngrams
+from core.llm_gateway import BACKGROUND, INTERACTIVE, gateway
+
+GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes the rows, so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbedder:
+    """
+    Embeds texts locally as hashed character n-gram vectors.
+
+    Deterministic and free, so it serves offline use and tests; it matches
+    wording rather than meaning. Each n-gram adds ±(1 + log count) to one of
+    `dimensions` buckets, the sign halving the damage of hash collisions.
+    """
+
+    # Similarity from which a stored text is likely about the same thing
+    min_score = 0.2
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for gram, count in Counter(char_ngrams(text)).items():
+            # crc32 rather than hash(), which differs between processes
+            code = zlib.crc32(gram.encode("utf-8"))
+            vector[code % self.dimensions] += (1 + np.log(count)) * (1 if code & 0x80000000 else -1)
+        return vector
+
+    async def embed(self, texts: list[str], query: bool = False) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return normalize(np.vstack([self._embed_one(text) for text in texts]))
+
+
+class GeminiEmbedder:
+    """
+    Embeds texts with the Gemini embeddings API, through the LLM gateway.
+
+    Queries are interactive requests; stored texts are embedded as background
+    work, so they never hold a slot a user is waiting for.
+    """
+
+    # Unrelated texts still score around 0.3-0.5 with Gemini embeddings
+    min_score = 0.55
+
+    def __init__(self, model: str = GEMINI_EMBEDDING_MODEL, dimensions: int = 768):
+        self.model = model
+        self.dimensions = dimensions
+        self.name = model.rsplit("/", 1)[-1]
+        self._configured = False
+
+    async def embed(self, texts: list[str], query: bool = False) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        import google.generativeai as genai
+
+        if not self._configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            self._configured = True
+        task_type = "retrieval_query" if query else "retrieval_document"
+        result = await gateway.call(
+            lambda: asyncio.to_thread(genai.embed_content, model=self.model, content=texts, task_type=task_type),
+            "\n".join(texts),
+            priority=INTERACTIVE if query else BACKGROUND,
+        )
+        vectors = np.asarray(result["embedding"], dtype=np.float32).reshape(len(texts), -1)
+        return normalize(vectors)
+
+
+EMBEDDERS = {"gemini": GeminiEmbedder, "hashing": HashingEmbedder}
+
+
+def create_embedder(name: str):
+    """Creates the embedder named 'gemini' or 'hashing'."""
+    try:
+        return EMBEDDERS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown embedder: {name!r} (expected one of {', '.join(EMBEDDERS)})") from None
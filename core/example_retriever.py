@@ -0,0 +1,84 @@
+import json
+import math
+import os
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "intent_examples.json")
+
+
+def char_ngrams(text: str, sizes: tuple = (2, 3, 4)) -> list[str]:
+    """Returns the character n-grams of the casefolded text, with word boundaries marked by spaces."""
+    padded = " " + re.sub(r"\s+", " ", text.casefold().strip()) + " "
+    return [padded[i:i + n] for n in sizes for i in range(len(padded) - n + 1)]
+
+
+class ExampleRetriever:
+    """
+    Finds the few-shot examples most similar to a message.
+
+    Examples are embedded as TF-IDF weighted character n-gram vectors,
+    hashed into a fixed number of dimensions and L2-normalized, so a query
+    is one matrix-vector product of cosine similarities. Character n-grams
+    cope with inflected Russian and Slovak words and with typos.
+    """
+
+    def __init__(self, examples: list[dict], dimensions: int = 4096):
+        """
+        Args:
+            examples: Dicts with the example 'text' (and whatever else the prompt needs).
+            dimensions: Size of the hashed n-gram space.
+        """
+        self.examples = examples
+        self.dimensions = dimensions
+        counts = [Counter(self._hash(gram) for gram in char_ngrams(example["text"])) for example in examples]
+        document_frequency = Counter(bucket for count in counts for bucket in count)
+        self._idf = np.ones(dimensions, dtype=np.float32)
+        for bucket, frequency in document_frequency.items():
+            self._idf[bucket] = math.log((1 + len(examples)) / (1 + frequency)) + 1
+        self._matrix = np.vstack([self._embed(count) for count in counts]) if examples else np.zeros((0, dimensions))
+
+    def _hash(self, gram: str) -> int:
+        # crc32 rather than hash(), which differs between processes
+        return zlib.crc32(gram.encode("utf-8")) % self.dimensions
+
+    def _embed(self, count: Counter) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for bucket, frequency in count.items():
+            vector[bucket] = 1 + math.log(frequency)
+        vector *= self._idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def similarities(self, text: str) -> np.ndarray:
+        """Returns the cosine similarity of the text to every example."""
+        query = self._embed(Counter(self._hash(gram) for gram in char_ngrams(text)))
+        return self._matrix @ query
+
+    def top_k(self, text: str, k: int = 4) -> list[dict]:
+        """Returns the k most similar examples, most similar first."""
+        if not self.examples or k <= 0:
+            return []
+        scores = self.similarities(text)
+        k = min(k, len(self.examples))
+        best = np.argpartition(-scores, k - 1)[:k]
+        return [self.examples[i] for i in best[np.argsort(-scores[best], kind="stable")]]
+
+
+def load_examples(path: str = EXAMPLES_PATH) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_retriever: ExampleRetriever | None = None
+
+
+def get_retriever() -> ExampleRetriever:
+    """Returns the retriever over the bundled example bank, building it on first use."""
+    global _retriever
+    if _retriever is None:
+        _retriever = ExampleRetriever(load_examples())
+    return _retriever
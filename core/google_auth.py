@@ -1,6 +1,7 @@
+import logging
 import os
-from google_auth_oauthlib.flow import Flow
-from bot.user_data import update_user_data, get_user_data
+
+logger = logging.getLogger(__name__)
 
 # The file path for the client secrets.
 CLIENT_SECRETS_FILE = "client_secrets.json"
@@ -17,9 +18,12 @@ def generate_auth_url():
         A tuple of (authorization_url, state) or (None, None) if setup fails.
     """
     if not os.path.exists(CLIENT_SECRETS_FILE):
-        print(f"Error: {CLIENT_SECRETS_FILE} not found. Please create it from the example.")
+        logger.error("%s not found. Please create it from the example.", CLIENT_SECRETS_FILE)
         return None, None
 
+    # Imported here because the OAuth stack is slow to load and rarely needed
+    from google_auth_oauthlib.flow import Flow
+
     try:
         # Create a Flow instance to manage the OAuth 2.0 Authorization Grant Flow.
         flow = Flow.from_client_secrets_file(
@@ -40,7 +44,7 @@ def generate_auth_url():
         )
         return authorization_url, state
     except Exception as e:
-        print(f"Error creating Google auth flow: {e}")
+        logger.error("Error creating Google auth flow: %s", e)
         return None, None
 
 def get_refresh_token(code: str) -> str | None:
@@ -56,6 +60,8 @@ def get_refresh_token(code: str) -> str | None:
     if not os.path.exists(CLIENT_SECRETS_FILE):
         return None
 
+    from google_auth_oauthlib.flow import Flow
+
     try:
         flow = Flow.from_client_secrets_file(
             CLIENT_SECRETS_FILE,
@@ -69,5 +75,5 @@ def get_refresh_token(code: str) -> str | None:
         credentials = flow.credentials
         return credentials.refresh_token
     except Exception as e:
-        print(f"Error fetching refresh token: {e}")
+        logger.error("Error fetching refresh token: %s", e)
         return None
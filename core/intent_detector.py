@@ -1,26 +1,69 @@
-import os
-import google.generativeai as genai
 import json
+import logging
+import os
+import threading
+
 from core.assistant_prompt import ASSISTANT_PROMPT
+from core.config import config
+from core.llm_gateway import gateway
+from core.load_policy import load_policy
+
+logger = logging.getLogger(__name__)
+
+# Module attribute holding each tier's model once created, and the setting with its name
+MODEL_TIERS = {"primary": ("model", "gemini_model"), "fast": ("fast_model", "gemini_fast_model")}
+
+_model_lock = threading.Lock()
+# Model name each tier's model was created with
+_built_with: dict[str, str] = {}
+
+def _create_model(name: str):
+    """Configures the Gemini client and builds the model. Returns None on failure."""
+    import google.generativeai as genai
+
+    try:
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        # Initialize the generative model with a system instruction for persona
+        return genai.GenerativeModel(
+            name,
+            system_instruction=ASSISTANT_PROMPT
+        )
+    except Exception as e:
+        logger.error("Error configuring Gemini API: %s", e)
+        return None
+
+def get_model(tier: str = "primary"):
+    """
+    Returns the shared Gemini model of the given tier ('primary' or 'fast'),
+    creating it on first use and again when the configured model name changes.
+
+    Importing `google.generativeai` is slow, so it is deferred until the model
+    is needed (or until the warm-up in main.py loads it in the background).
+    """
+    attribute, setting = MODEL_TIERS[tier]
+    name = getattr(config.settings, setting)
+    if attribute not in globals() or _built_with.get(attribute, name) != name:
+        with _model_lock:
+            if attribute not in globals() or _built_with.get(attribute, name) != name:
+                globals()[attribute] = _create_model(name)
+                _built_with[attribute] = name
+    return globals()[attribute]
 
-# It's recommended to load the API key once and reuse the client
-try:
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    # Initialize the generative model with a system instruction for persona
-    model = genai.GenerativeModel(
-        'models/gemini-1.5-flash-latest',
-        system_instruction=ASSISTANT_PROMPT
-    )
-except Exception as e:
-    print(f"Error configuring Gemini API: {e}")
-    model = None
+def __getattr__(name):
+    # Keeps `core.intent_detector.model` working as a lazily created attribute.
+    if name == "model":
+        return get_model()
+    if name == "fast_model":
+        return get_model("fast")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- Intent Detection Prompt ---
 
-INTENT_PROMPT = """
+INTENT_INSTRUCTIONS = """
 You are an expert intent detection model for a personal assistant bot.
-Your task is to analyze the user's message and identify their intent and any relevant entities.
-Provide the output in JSON format with two keys: "intent" and "entities".
+Your task is to analyze the user's message and identify their intents and any relevant entities.
+A message may contain several independent requests; list each of them, in the order they appear.
+Provide the output in JSON format with one key, "intents": a list of objects with two keys, "intent" and "entities".
 The "intent" should be one of the following:
 - 'weather': for checking the weather.
 - 'create_event': for creating a calendar event.
@@ -38,43 +81,101 @@ For 'news', the entity is 'category' (e.g., 'world', 'technology').
 For 'create_event', the entities are 'title' and 'datetime'.
 For 'commute', the entities are 'origin' and 'destination'.
 For 'pantry_add' or 'pantry_remove', the entity is 'item'.
+"""
 
+# The original prompt with a fixed set of examples; used when retrieval is off
+# and as the baseline in benchmarks/intent_eval.py.
+INTENT_PROMPT = INTENT_INSTRUCTIONS + """
 Here are some examples:
 User: "What's the weather like in London?"
-{"intent": "weather", "entities": {"location": "London"}}
+{"intents": [{"intent": "weather", "entities": {"location": "London"}}]}
 
 User: "Какие сейчас новости в мире технологий?"
-{"intent": "news", "entities": {"category": "technology"}}
+{"intents": [{"intent": "news", "entities": {"category": "technology"}}]}
+
+User: "Какая погода и что нового в мире?"
+{"intents": [{"intent": "weather", "entities": {}}, {"intent": "news", "entities": {"category": "world"}}]}
 
 User: "Add milk to my pantry"
-{"intent": "pantry_add", "entities": {"item": "milk"}}
+{"intents": [{"intent": "pantry_add", "entities": {"item": "milk"}}]}
 
 User: "How do I get from home to work?"
-{"intent": "commute", "entities": {"origin": "home", "destination": "work"}}
+{"intents": [{"intent": "commute", "entities": {"origin": "home", "destination": "work"}}]}
 
 User: "Schedule a meeting with John tomorrow at 2pm"
-{"intent": "create_event", "entities": {"title": "meeting with John", "datetime": "tomorrow at 2pm"}}
+{"intents": [{"intent": "create_event", "entities": {"title": "meeting with John", "datetime": "tomorrow at 2pm"}}]}
 
-User: "Запомни мой город - Санкт-Петербург"
-{"intent": "set_city", "entities": {"location": "Санкт-Петербург"}}
+User: "Запомни мой город - Санкт-Петербург и скажи, какая там погода"
+{"intents": [{"intent": "set_city", "entities": {"location": "Санкт-Петербург"}}, {"intent": "weather", "entities": {"location": "Санкт-Петербург"}}]}
 """
 
+# Number of similar examples from core/intent_examples.json put into each prompt (0 = static prompt)
+INTENT_EXAMPLES_K = int(os.getenv("INTENT_EXAMPLES_K", "4"))
+
+def format_example(example: dict) -> str:
+    return f'User: "{example["text"]}"\n' + json.dumps({"intents": example["intents"]}, ensure_ascii=False)
+
+def build_intent_prompt(text: str, k: int | None = None) -> str:
+    """
+    Builds the intent prompt with only the k examples most similar to the
+    message, most similar last (closest to the message), instead of the
+    whole static example list.
+    """
+    k = INTENT_EXAMPLES_K if k is None else k
+    if k <= 0:
+        return INTENT_PROMPT
+    # NumPy is loaded on the first message (or by the warm-up), not at startup
+    from core.example_retriever import get_retriever
+
+    examples = get_retriever().top_k(text, k)
+    return INTENT_INSTRUCTIONS + "\nHere are some examples:\n" + "\n\n".join(
+        format_example(example) for example in reversed(examples)
+    ) + "\n"
+
+def intents_of(intent_data: dict) -> list[dict]:
+    """
+    Returns the list of {"intent", "entities"} requests in a detection
+    result, accepting both the list form and a single top-level intent.
+    """
+    intents = intent_data.get("intents")
+    if isinstance(intents, list) and intents:
+        return [{"intent": item.get("intent"), "entities": item.get("entities") or {}}
+                for item in intents if isinstance(item, dict)]
+    return [{"intent": intent_data.get("intent"), "entities": intent_data.get("entities") or {}}]
+
 async def detect_intent(text: str) -> dict:
     """
-    Detects the intent and entities from the user's text using the Gemini API.
+    Detects the intents and entities from the user's text using the Gemini API.
+
+    Returns:
+        The parsed result; "intent" and "entities" hold the first request,
+        "intents" (when present) all of them.
+
+    Under load the fast model and fewer examples are used, and intents
+    already detected for the same text are reused without a request.
     """
+    model = get_model(load_policy.model_tier())
     if not model:
         return {"intent": "error", "entities": {"message": "Gemini model not initialized"}}
 
     try:
-        full_prompt = f"{INTENT_PROMPT}\nUser: \"{text}\"\n"
-        response = await model.generate_content_async(full_prompt)
+        prompt = build_intent_prompt(text, load_policy.examples_limit(INTENT_EXAMPLES_K))
+        full_prompt = f"{prompt}\nUser: \"{text}\"\n"
+        # Identical messages get identical intents, so a cached answer is a safe fallback
+        response = await gateway.generate_content(
+            model, full_prompt, cache_key=("intent", text), prefer_cache=load_policy.prefer_cache()
+        )
 
         # Clean up the response to extract the JSON part
         json_response_str = response.text.strip().replace('```json', '').replace('```', '').strip()
 
         parsed_response = json.loads(json_response_str)
+        if "intents" in parsed_response:
+            # Callers that handle a single request keep working with the first one
+            first = intents_of(parsed_response)[0]
+            parsed_response.setdefault("intent", first["intent"])
+            parsed_response.setdefault("entities", first["entities"])
         return parsed_response
     except Exception as e:
-        print(f"Error during intent detection: {e}")
+        logger.warning("Error during intent detection: %s", e)
         return {"intent": "error", "entities": {"message": str(e)}}
@@ -0,0 +1,286 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Hashable
+
+from core.config import config
+from core.load_policy import AdaptiveLoadPolicy, load_policy
+from core.resilience import CircuitBreaker, backoff_delay
+
+# Request priorities; lower values are served first.
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# HTTP status codes of Gemini errors that are worth retrying.
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM cannot be reached and no cached answer is available."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Checks whether an error from the Gemini client is transient (rate limit, 5xx, timeout)."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_CODES
+
+
+def estimate_tokens(text: str) -> int:
+    """A cheap token estimate (about 4 characters per token) for budgeting."""
+    return len(text) // 4 + 1
+
+
+class _PrioritySemaphore:
+    """A semaphore that wakes waiters in priority order, FIFO within a priority."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: list = []
+        self._counter = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation.
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.active < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    def resize(self, limit: int) -> None:
+        """Changes the limit; calls over a lower limit finish, and no new ones start until below it."""
+        self.limit = limit
+        self._wake()
+
+
+class LLMGateway:
+    """
+    Single entry point for all Gemini calls.
+
+    Every call waits for a concurrency slot (interactive requests first) and
+    for room in the tokens-per-minute budget. Transient errors are retried with
+    jittered exponential backoff; a rate limit error pauses all callers for the
+    backoff period. After repeated failures a circuit breaker fails calls fast,
+    serving the last good answer for the same cache key when there is one.
+    Queue waits and latencies are reported to the load policy, if any.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        tokens_per_minute: int = 250_000,
+        max_retries: int = 3,
+        timeout: float = 30.0,
+        breaker: CircuitBreaker | None = None,
+        cache_size: int = 512,
+        policy: AdaptiveLoadPolicy | None = None,
+    ):
+        self.policy = policy
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+        self.cache_size = cache_size
+        self._slots = _PrioritySemaphore(max_concurrency)
+        self._token_window: deque = deque()  # (timestamp, tokens)
+        self._tokens_in_window = 0
+        self._cooldown_until = 0.0
+        self._cache: OrderedDict = OrderedDict()
+        self._queue_waits: deque = deque(maxlen=1000)
+        self.counters = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "rate_limited": 0,
+            "circuit_rejections": 0,
+            "fallbacks_served": 0,
+            "cached_answers": 0,
+        }
+
+    async def generate_content(
+        self,
+        model,
+        prompt: str,
+        priority: int = INTERACTIVE,
+        cache_key: Hashable | None = None,
+        prefer_cache: bool = False,
+    ):
+        """Runs `model.generate_content_async(prompt)` through the gateway."""
+        return await self.call(lambda: model.generate_content_async(prompt), prompt, priority, cache_key, prefer_cache)
+
+    async def send_message(self, chat, text: str, priority: int = INTERACTIVE, cache_key: Hashable | None = None):
+        """Runs `chat.send_message_async(text)` through the gateway."""
+        # The history is sent along with the message, so it counts towards the budget.
+        history_text = " ".join(str(part) for entry in getattr(chat, "history", []) or [] for part in _parts(entry))
+        return await self.call(lambda: chat.send_message_async(text), f"{history_text} {text}", priority, cache_key)
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[Any]],
+        prompt_text: str,
+        priority: int = INTERACTIVE,
+        cache_key: Hashable | None = None,
+        prefer_cache: bool = False,
+    ) -> Any:
+        """
+        Executes an LLM request with scheduling, retries and fallbacks.
+
+        Args:
+            request: Creates the awaitable for one attempt; called again on every retry.
+            prompt_text: The text sent to the model, used for the token budget.
+            priority: INTERACTIVE or BACKGROUND.
+            cache_key: If given, successful results are cached under this key and
+                served when the model is unavailable.
+            prefer_cache: Serve a cached result for `cache_key` without calling
+                the model at all (used to shed load).
+
+        Returns:
+            The model's response.
+
+        Raises:
+            LLMUnavailableError: If the circuit is open or retries are exhausted
+                and there is no cached result.
+            Exception: Non-transient errors from the model are raised unchanged.
+        """
+        self.counters["requests"] += 1
+        if prefer_cache and cache_key is not None and cache_key in self._cache:
+            self.counters["cached_answers"] += 1
+            return self._cache[cache_key]
+        if not self.breaker.allow_request():
+            self.counters["circuit_rejections"] += 1
+            return self._fallback(cache_key, "circuit open")
+
+        queued_at = time.monotonic()
+        await self._slots.acquire(priority)
+        try:
+            self._queue_waits.append(time.monotonic() - queued_at)
+            if self.policy is not None:
+                self.policy.record_queue_wait(self._queue_waits[-1])
+            await self._reserve_tokens(estimate_tokens(prompt_text))
+
+            for attempt in range(self.max_retries + 1):
+                await self._wait_for_cooldown()
+                started = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(request(), self.timeout)
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError) and self.policy is not None:
+                        self.policy.record_latency(time.monotonic() - started)
+                    if not is_retryable(e):
+                        raise
+                    self.breaker.record_failure()
+                    if getattr(e, "code", None) == 429:
+                        self.counters["rate_limited"] += 1
+                    if attempt == self.max_retries or not self.breaker.allow_request():
+                        self.counters["failures"] += 1
+                        return self._fallback(cache_key, str(e))
+                    self.counters["retries"] += 1
+                    delay = backoff_delay(attempt)
+                    if getattr(e, "code", None) == 429:
+                        # The quota is shared, so every caller should back off.
+                        self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                    await asyncio.sleep(delay)
+                else:
+                    if self.policy is not None:
+                        self.policy.record_latency(time.monotonic() - started)
+                    self.breaker.record_success()
+                    self._remember(cache_key, result)
+                    return result
+        finally:
+            self._slots.release()
+
+    def set_max_concurrency(self, limit: int) -> None:
+        """Changes the number of calls in flight at once; queued calls start if there is room."""
+        self._slots.resize(limit)
+
+    def metrics(self) -> dict:
+        """Returns a snapshot of counters, queue state and queue wait percentiles (seconds)."""
+        waits = sorted(self._queue_waits)
+        return {
+            **self.counters,
+            "in_flight": self._slots.active,
+            "queued": self._slots.waiting,
+            "queue_wait_p50": _percentile(waits, 0.50),
+            "queue_wait_p95": _percentile(waits, 0.95),
+            "queue_wait_max": waits[-1] if waits else 0.0,
+            "circuit": self.breaker.state,
+            **(self.policy.metrics() if self.policy is not None else {}),
+        }
+
+    async def _reserve_tokens(self, tokens: int) -> None:
+        """Waits until `tokens` fit into the budget of the last 60 seconds."""
+        while True:
+            now = time.monotonic()
+            while self._token_window and now - self._token_window[0][0] >= 60.0:
+                self._tokens_in_window -= self._token_window.popleft()[1]
+            if not self._token_window or self._tokens_in_window + tokens <= self.tokens_per_minute:
+                self._token_window.append((now, tokens))
+                self._tokens_in_window += tokens
+                return
+            await asyncio.sleep(60.0 - (now - self._token_window[0][0]))
+
+    async def _wait_for_cooldown(self) -> None:
+        delay = self._cooldown_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _remember(self, cache_key: Hashable | None, result: Any) -> None:
+        if cache_key is None:
+            return
+        self._cache[cache_key] = result
+        self._cache.move_to_end(cache_key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _fallback(self, cache_key: Hashable | None, reason: str) -> Any:
+        if cache_key is not None and cache_key in self._cache:
+            self.counters["fallbacks_served"] += 1
+            return self._cache[cache_key]
+        raise LLMUnavailableError(reason)
+
+
+def _parts(entry) -> list:
+    if isinstance(entry, dict):
+        return entry.get("parts", [])
+    return getattr(entry, "parts", []) or []
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# The gateway shared by all Gemini callers
+gateway = LLMGateway(
+    max_concurrency=config.settings.llm_max_concurrency,
+    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "250000")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    policy=load_policy,
+)
+config.subscribe(lambda settings: gateway.set_max_concurrency(settings.llm_max_concurrency))
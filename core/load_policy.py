@@ -0,0 +1,153 @@
+import logging
+import os
+import time
+from collections import deque
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Load levels, from normal operation to the most degraded service.
+NORMAL = 0
+DEGRADED = 1
+SHEDDING = 2
+
+LEVEL_NAMES = {NORMAL: "normal", DEGRADED: "degraded", SHEDDING: "shedding"}
+
+
+def _p95(samples: deque) -> float:
+    if not samples:
+        return 0.0
+    values = sorted(value for _, value in samples)
+    return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+
+class AdaptiveLoadPolicy:
+    """
+    Decides how much to degrade LLM usage from recent Gemini queue waits
+    and latencies.
+
+    The policy compares the 95th percentiles over the last `window` seconds
+    with their SLOs. When either is breached it moves to DEGRADED (fast model
+    tier, short history, fewer prompt examples, cached intents), and to
+    SHEDDING at twice the SLO (conversational replies are skipped as well).
+    It escalates immediately but steps down one level at a time, only after
+    the percentiles stayed below `recovery_fraction` of the SLOs for
+    `recover_after` seconds.
+    """
+
+    def __init__(
+        self,
+        queue_wait_slo: float = 1.0,
+        latency_slo: float = 5.0,
+        window: float = 60.0,
+        min_samples: int = 5,
+        recover_after: float = 30.0,
+        recovery_fraction: float = 0.8,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            queue_wait_slo: Target p95 of the wait for a gateway slot, in seconds.
+            latency_slo: Target p95 of the Gemini response time, in seconds.
+            window: Seconds of samples the percentiles are computed over.
+            min_samples: Samples needed before the policy escalates.
+            recover_after: Seconds of healthy percentiles before stepping down a level.
+            recovery_fraction: Share of the SLOs the percentiles must stay under to count as healthy.
+            clock: Monotonic clock in seconds.
+        """
+        self.queue_wait_slo = queue_wait_slo
+        self.latency_slo = latency_slo
+        self.window = window
+        self.min_samples = min_samples
+        self.recover_after = recover_after
+        self.recovery_fraction = recovery_fraction
+        self.clock = clock
+        self._queue_waits: deque = deque()  # (timestamp, seconds)
+        self._latencies: deque = deque()
+        self._level = NORMAL
+        self._healthy_since: float | None = None
+        self.transitions = 0
+
+    def record_queue_wait(self, seconds: float) -> None:
+        self._queue_waits.append((self.clock(), seconds))
+
+    def record_latency(self, seconds: float) -> None:
+        self._latencies.append((self.clock(), seconds))
+
+    def pressure(self) -> float:
+        """Returns the worst p95 as a multiple of its SLO (1.0 = at the SLO)."""
+        now = self.clock()
+        for samples in (self._queue_waits, self._latencies):
+            while samples and now - samples[0][0] > self.window:
+                samples.popleft()
+        ratios = []
+        if len(self._queue_waits) >= self.min_samples:
+            ratios.append(_p95(self._queue_waits) / self.queue_wait_slo)
+        if len(self._latencies) >= self.min_samples:
+            ratios.append(_p95(self._latencies) / self.latency_slo)
+        return max(ratios, default=0.0)
+
+    @property
+    def level(self) -> int:
+        pressure = self.pressure()
+        target = SHEDDING if pressure > 2 else DEGRADED if pressure > 1 else NORMAL
+        now = self.clock()
+        if target > self._level:
+            self._set_level(target)
+            self._healthy_since = None
+        elif self._level > NORMAL and pressure <= self.recovery_fraction:
+            if self._healthy_since is None:
+                self._healthy_since = now
+            elif now - self._healthy_since >= self.recover_after:
+                self._set_level(self._level - 1)
+                self._healthy_since = now
+        else:
+            self._healthy_since = None
+        return self._level
+
+    def _set_level(self, level: int) -> None:
+        logger.warning("LLM load level: %s -> %s", LEVEL_NAMES[self._level], LEVEL_NAMES[level])
+        self._level = level
+        self.transitions += 1
+
+    # --- Decisions ---
+
+    def model_tier(self) -> str:
+        """'primary' normally, 'fast' for the cheaper, faster model under pressure."""
+        return "fast" if self.level >= DEGRADED else "primary"
+
+    def history_limit(self, limit: int) -> int:
+        """Number of history messages to send with a conversational request."""
+        level = self.level
+        return limit if level == NORMAL else min(limit, 4) if level == DEGRADED else 0
+
+    def examples_limit(self, k: int) -> int:
+        """Number of few-shot examples to put into the intent prompt."""
+        return k if self.level == NORMAL else min(k, 2)
+
+    def memories_limit(self, k: int) -> int:
+        """Number of long-term memories to recall into a conversational request."""
+        return k if self.level == NORMAL else 0
+
+    def prefer_cache(self) -> bool:
+        """Whether cached answers should be served without asking the model."""
+        return self.level >= DEGRADED
+
+    def shed_conversation(self) -> bool:
+        """Whether conversational (non-tool) replies should be skipped."""
+        return self.level >= SHEDDING
+
+    def metrics(self) -> dict:
+        return {
+            "load_level": LEVEL_NAMES[self.level],
+            "load_pressure": self.pressure(),
+            "llm_latency_p95": _p95(self._latencies),
+            "load_transitions": self.transitions,
+        }
+
+
+# The policy shared by all Gemini callers, fed by the LLM gateway
+load_policy = AdaptiveLoadPolicy(
+    queue_wait_slo=float(os.getenv("LLM_QUEUE_WAIT_SLO", "1.0")),
+    latency_slo=float(os.getenv("LLM_LATENCY_SLO", "5.0")),
+)
@@ -0,0 +1,170 @@
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+# Fields every log line carries when known, set with log_context()
+CONTEXT_FIELDS = ("user_id", "update_id", "stage")
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_log_context: contextvars.ContextVar[dict] = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    Adds fields (e.g. user_id, update_id, stage) to every record logged in
+    this block, including by tasks started from it.
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current log_context() fields onto each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a share of the records of high-volume events.
+
+    The rate is looked up by the record's `event` (passed with `extra=`) and
+    then by logger name. Warnings and errors are never dropped. Kept records
+    carry `sample_rate`, so counts can be scaled back up.
+    """
+
+    def __init__(self, rates: dict[str, float], rng: Callable[[], float] = random.random):
+        super().__init__()
+        self.rates = rates
+        self.rng = rng
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rates.get(getattr(record, "event", None), self.rates.get(record.name))
+        if rate is None:
+            return True
+        if self.rng() < rate:
+            record.sample_rate = rate
+            return True
+        self.dropped += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, with context and `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats each record (tracebacks included) on the
+    calling thread; this one only merges the message arguments, so a log
+    call on the event loop costs little more than a queue put.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def parse_levels(spec: str) -> dict[str, int]:
+    """Parses 'apis=WARNING,bot.storage=DEBUG' into logger name -> level."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def parse_rates(spec: str) -> dict[str, float]:
+    """Parses 'cp_sk_request=0.1,message_handled=0.2' into event -> share kept."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(
+    level: str | None = None,
+    levels: dict[str, int] | None = None,
+    sampling: dict[str, float] | None = None,
+    json_lines: bool | None = None,
+    stream=None,
+) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a queue to a background listener thread,
+    which formats the records and writes them to `stream`.
+
+    Unset arguments are read from the environment: LOG_LEVEL, LOG_LEVELS
+    (per-module levels), LOG_SAMPLING (per-event shares kept) and
+    LOG_FORMAT ('json' or 'text').
+
+    Returns:
+        The started listener; stop() it on shutdown to flush the queue.
+    """
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    levels = parse_levels(os.getenv("LOG_LEVELS", "")) if levels is None else levels
+    sampling = parse_rates(os.getenv("LOG_SAMPLING", "")) if sampling is None else sampling
+    if json_lines is None:
+        json_lines = os.getenv("LOG_FORMAT", "json").lower() == "json"
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if json_lines else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(SamplingFilter(sampling))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener = logging.handlers.QueueListener(records, output)
+    listener.start()
+    return listener
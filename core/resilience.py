@@ -0,0 +1,238 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """
+    Returns a "full jitter" exponential backoff delay for a retry attempt.
+
+    Args:
+        attempt: The retry number, starting at 0.
+        base: The delay scale for the first retry.
+        cap: The maximum delay.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated failures of a dependency.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `allow_request()` returns False for `reset_timeout` seconds. Then a single
+    trial request is let through: success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.HALF_OPEN:
+            # Let this trial request through and hold back the others for another timeout.
+            self._opened_at = self._clock()
+        return state != self.OPEN
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.OPEN or self._failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+
+
+class LatencyTracker:
+    """Keeps the latest `size` latencies of a dependency and their percentiles."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> float:
+        if not self._samples:
+            return 0.0
+        values = sorted(self._samples)
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class ServiceUnavailableError(Exception):
+    """Raised when an external service timed out or its circuit is open."""
+
+
+def is_service_failure(error: Exception) -> bool:
+    """
+    Tells whether an error means the service is unhealthy. Client errors
+    (HTTP 4xx other than 429, e.g. an unknown city) are the caller's fault
+    and neither trip the circuit nor are retried.
+    """
+    status = getattr(error, "status", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+
+class ResilientService:
+    """
+    Calls an external HTTP API with a timeout, a circuit breaker and hedging.
+
+    Idempotent requests are hedged: if the first attempt has not answered
+    after the service's recent p95 latency, a duplicate is sent and the first
+    response wins, the other attempt being cancelled. An attempt that fails
+    early is replaced by the hedge at once. The whole call, including the
+    hedge, is bounded by `timeout`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = 5.0,
+        max_hedges: int = 1,
+        min_hedge_delay: float = 0.05,
+        min_samples: int = 20,
+        breaker: CircuitBreaker | None = None,
+        clock=time.monotonic,
+    ):
+        """
+        Args:
+            name: Service name used in errors and metrics.
+            timeout: Seconds a call may take in total.
+            max_hedges: Duplicate requests sent at most per call.
+            min_hedge_delay: Lower bound of the hedging delay, in seconds.
+            min_samples: Latencies needed before the p95 sets the hedging delay;
+                until then half the timeout is used.
+            breaker: Circuit breaker of the service.
+            clock: Monotonic clock in seconds.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.max_hedges = max_hedges
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self._clock = clock
+        self.counters = {
+            "requests": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "circuit_rejections": 0,
+        }
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for an attempt before sending a duplicate."""
+        if len(self.latencies) < self.min_samples:
+            return self.timeout / 2
+        return max(self.min_hedge_delay, self.latencies.percentile(0.95))
+
+    async def call(self, request, idempotent: bool = True):
+        """
+        Runs `request` (a no-argument coroutine function) against the service.
+
+        Args:
+            request: Performs one attempt and returns its result.
+            idempotent: Whether the request may be sent more than once.
+
+        Raises:
+            ServiceUnavailableError: The circuit is open or the call timed out.
+            Exception: The error of the last attempt when all of them failed.
+        """
+        self.counters["requests"] += 1
+        if not self.breaker.allow_request():
+            self.counters["circuit_rejections"] += 1
+            raise ServiceUnavailableError(f"{self.name} is unavailable (circuit open)")
+        try:
+            result = await asyncio.wait_for(self._race(request, self.max_hedges if idempotent else 0), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self.breaker.record_failure()
+            raise ServiceUnavailableError(f"{self.name} did not answer within {self.timeout:g} s")
+        except Exception as e:
+            if is_service_failure(e):
+                self.counters["failures"] += 1
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _timed(self, request):
+        started = self._clock()
+        result = await request()
+        self.latencies.record(self._clock() - started)
+        return result
+
+    async def _race(self, request, hedges: int):
+        first = asyncio.ensure_future(self._timed(request))
+        pending = {first}
+        error = None
+        try:
+            while pending:
+                delay = self.hedge_delay() if hedges else None
+                done, pending = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                    if not is_service_failure(error):
+                        raise error
+                if hedges and (not done or not pending):
+                    # Still waiting (or nothing left to wait for): send a duplicate
+                    hedges -= 1
+                    self.counters["hedges"] += 1
+                    pending.add(asyncio.ensure_future(self._timed(request)))
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def metrics(self) -> dict:
+        return {
+            **self.counters,
+            "latency_p50": self.latencies.percentile(0.5),
+            "latency_p95": self.latencies.percentile(0.95),
+            "hedge_delay": self.hedge_delay(),
+            "circuit": self.breaker.state,
+        }
+
+
+_services: dict[str, ResilientService] = {}
+
+
+def get_service(name: str, timeout: float = 5.0) -> ResilientService:
+    """Returns the shared ResilientService of an external API, creating it on first use."""
+    if name not in _services:
+        _services[name] = ResilientService(name, timeout=timeout)
+    return _services[name]
+
+
+def services_metrics() -> dict:
+    """Returns the metrics of every external API used so far."""
+    return {name: service.metrics() for name, service in _services.items()}
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+# A predictor looks at a message before its intent is known and returns the
+# fetch it expects to be needed as (key, start_fetch), or None.
+Predictor = Callable[[int, str, list], tuple | None]
+
+
+@dataclass
+class _Speculation:
+    key: Hashable
+    task: asyncio.Task
+    started_at: float
+    finished_at: float | None = None
+    claimed: bool = False
+
+
+@dataclass
+class _Budget:
+    tokens: float
+    updated_at: float
+
+
+class Speculator:
+    """
+    Starts the tool fetch a message most likely needs (e.g. the weather for
+    the user's saved city) while its intent is still being detected.
+
+    Feature handlers ask for their data through `result()`: if it matches
+    the speculation, they get the already running fetch, otherwise they
+    fetch as usual. Unclaimed speculations are cancelled by `finish()`.
+    Each user has a token bucket of speculations; a hit refunds its token,
+    so users whose messages are predicted well are never throttled.
+    """
+
+    def __init__(
+        self,
+        budget: int = 5,
+        refill_per_minute: float = 5.0,
+        history_size: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            budget: Speculations a user can have wasted before being throttled (0 disables speculation).
+            refill_per_minute: Rate at which a user's budget refills.
+            history_size: Number of recent intents per user given to the predictors.
+            clock: Monotonic clock in seconds.
+        """
+        self.budget = budget
+        self.refill_per_minute = refill_per_minute
+        self.history_size = history_size
+        self.clock = clock
+        self._predictors: list = []
+        self._pending: dict = {}  # user_id -> _Speculation
+        self._budgets: dict = {}  # user_id -> _Budget
+        self._recent: dict = {}  # user_id -> deque of intents
+        self.counters = {"started": 0, "hits": 0, "wasted": 0, "over_budget": 0}
+        self.latency_saved = 0.0
+
+    def register(self, predictor: Predictor) -> None:
+        """Adds a predictor; predictors are asked in registration order."""
+        self._predictors.append(predictor)
+
+    def record_intent(self, user_id: int, intent: str | None) -> None:
+        """Remembers the detected intent as a signal for the user's next messages."""
+        self._recent.setdefault(user_id, deque(maxlen=self.history_size)).append(intent)
+
+    def _spend(self, user_id: int) -> bool:
+        now = self.clock()
+        budget = self._budgets.setdefault(user_id, _Budget(self.budget, now))
+        budget.tokens = min(self.budget, budget.tokens + (now - budget.updated_at) * self.refill_per_minute / 60.0)
+        budget.updated_at = now
+        if budget.tokens < 1:
+            return False
+        budget.tokens -= 1
+        return True
+
+    def start(self, user_id: int, text: str) -> bool:
+        """
+        Starts the predicted fetch for a message, if any predictor expects
+        one and the user has budget left. Returns True if one was started.
+        """
+        if self.budget <= 0 or user_id in self._pending:
+            return False
+        recent = list(self._recent.get(user_id, ()))
+        for predictor in self._predictors:
+            prediction = predictor(user_id, text, recent)
+            if prediction:
+                break
+        else:
+            return False
+        if not self._spend(user_id):
+            self.counters["over_budget"] += 1
+            return False
+
+        key, start_fetch = prediction
+        speculation = _Speculation(key, asyncio.ensure_future(start_fetch()), self.clock())
+
+        def on_done(_):
+            speculation.finished_at = self.clock()
+
+        speculation.task.add_done_callback(on_done)
+        self._pending[user_id] = speculation
+        self.counters["started"] += 1
+        return True
+
+    async def result(self, user_id: int, key: Hashable, fetch: Callable[..., Awaitable], *args) -> Any:
+        """
+        Returns the speculative result for `key` if the user's speculation
+        fetched exactly that, otherwise awaits `fetch(*args)`.
+        """
+        speculation = self._pending.get(user_id)
+        if speculation is None or speculation.claimed or speculation.key != key:
+            return await fetch(*args)
+        speculation.claimed = True
+        self.counters["hits"] += 1
+        self._budgets[user_id].tokens = min(self.budget, self._budgets[user_id].tokens + 1)
+        # The time the fetch had already been running when the handler needed it
+        self.latency_saved += (speculation.finished_at or self.clock()) - speculation.started_at
+        try:
+            return await speculation.task
+        except Exception as e:
+            logger.info("Speculative fetch for %r failed, fetching again: %s", key, e)
+            return await fetch(*args)
+
+    def finish(self, user_id: int) -> None:
+        """Ends the message's speculation, cancelling it if it was not used."""
+        speculation = self._pending.pop(user_id, None)
+        if speculation is not None and not speculation.claimed:
+            speculation.task.cancel()
+            self.counters["wasted"] += 1
+
+    def metrics(self) -> dict:
+        """Returns the counters, hit and waste ratios, and seconds of latency saved."""
+        started = self.counters["started"]
+        return {
+            **self.counters,
+            "hit_ratio": self.counters["hits"] / started if started else 0.0,
+            "waste_ratio": self.counters["wasted"] / started if started else 0.0,
+            "latency_saved": self.latency_saved,
+        }
+
+
+speculator = Speculator(budget=int(os.getenv("SPECULATION_BUDGET", "5")))
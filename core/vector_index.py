@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+
+
+class VectorIndex:
+    """
+    An append-only set of unit vectors with their texts, searched by cosine
+    similarity (one matrix-vector product and a partial sort).
+
+    Without a path everything is kept in memory. With a path the vectors are
+    appended as raw float32 rows to `<path>.vec` and memory-mapped for search,
+    so only the pages a search touches are loaded, and the texts are appended
+    as JSON lines to `<path>.jsonl`.
+    """
+
+    def __init__(self, dimensions: int, path: str | None = None):
+        self.dimensions = dimensions
+        self.path = path
+        self.texts: list[str] = []
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._size = 0
+        self._mapped_size = 0
+        if path and os.path.exists(path + ".vec"):
+            self._load()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _load(self) -> None:
+        texts = []
+        with open(self.path + ".jsonl", "a+", encoding="utf-8") as f:
+            f.seek(0)
+            for line in f:
+                try:
+                    texts.append(json.loads(line))
+                except ValueError:
+                    break
+        rows = os.path.getsize(self.path + ".vec") // (4 * self.dimensions)
+        size = min(rows, len(texts))
+        # A crash between the two appends leaves an unmatched tail; drop it, or
+        # later rows would be paired with the wrong texts
+        if os.path.getsize(self.path + ".vec") != size * 4 * self.dimensions:
+            os.truncate(self.path + ".vec", size * 4 * self.dimensions)
+        if len(texts) != size or os.path.getsize(self.path + ".jsonl") != self._texts_size(texts[:size]):
+            self._write_texts(texts[:size], "w")
+        self.texts = texts[:size]
+        self._size = size
+
+    @staticmethod
+    def _text_line(text: str) -> str:
+        return json.dumps(text, ensure_ascii=False) + "\n"
+
+    def _texts_size(self, texts: list[str]) -> int:
+        return sum(len(self._text_line(text).encode("utf-8")) for text in texts)
+
+    def _write_texts(self, texts: list[str], mode: str) -> None:
+        with open(self.path + ".jsonl", mode, encoding="utf-8") as f:
+            f.writelines(self._text_line(text) for text in texts)
+
+    def add(self, vectors: np.ndarray, texts: list[str]) -> None:
+        """Appends vectors (one row per text, already normalized) and their texts."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        if len(vectors) != len(texts):
+            raise ValueError(f"{len(vectors)} vectors for {len(texts)} texts")
+        if self.path:
+            with open(self.path + ".vec", "ab") as f:
+                f.write(vectors.tobytes())
+            self._write_texts(texts, "a")
+        else:
+            needed = self._size + len(vectors)
+            if needed > len(self._vectors):
+                # Grows geometrically, so appending one row at a time stays amortized O(1)
+                grown = np.zeros((max(needed, 2 * len(self._vectors), 16), self.dimensions), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size:needed] = vectors
+        self.texts.extend(texts)
+        self._size += len(vectors)
+
+    def _matrix(self) -> np.ndarray:
+        if self.path and self._mapped_size != self._size:
+            # Remapped lazily, once per search after appends rather than once per append
+            self._vectors = np.memmap(self.path + ".vec", dtype=np.float32, mode="r", shape=(self._size, self.dimensions))
+            self._mapped_size = self._size
+        return self._vectors[:self._size]
+
+    def search(self, query: np.ndarray, k: int, exclude_latest: int = 0) -> list[tuple[float, str]]:
+        """
+        Returns up to k (similarity, text) pairs most similar to the query,
+        most similar first, leaving out the `exclude_latest` newest entries.
+        """
+        size = self._size - exclude_latest
+        if size <= 0 or k <= 0:
+            return []
+        scores = self._matrix()[:size] @ np.asarray(query, dtype=np.float32)
+        k = min(k, size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(float(scores[i]), self.texts[i]) for i in best]
@@ -0,0 +1,50 @@
+import asyncio
+import importlib
+import logging
+import time
+
+# Slow modules that are imported lazily by the features using them
+WARM_UP_MODULES = [
+    "googleapiclient.discovery",
+    "google.oauth2.credentials",
+    "google_auth_oauthlib.flow",
+    "bs4",
+    "lxml.etree",
+    "numpy",
+]
+
+
+def _load_model() -> None:
+    from core.intent_detector import get_model
+    get_model()
+
+
+def _load_example_retriever() -> None:
+    from core.example_retriever import get_retriever
+    get_retriever()
+
+
+async def warm_up() -> dict:
+    """
+    Loads the lazily imported clients in a background thread, so that the
+    first user request does not pay for them. Meant to run while the bot is
+    already receiving updates.
+
+    Returns:
+        Seconds spent on each step, keyed by step name.
+    """
+    steps = [("gemini_model", _load_model)]
+    steps += [(name, lambda name=name: importlib.import_module(name)) for name in WARM_UP_MODULES]
+    steps += [("intent_examples", _load_example_retriever)]
+
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(step)
+        except Exception as e:
+            logging.warning(f"Warm-up step '{name}' failed: {e}")
+        timings[name] = time.perf_counter() - started
+
+    logging.info(f"Warm-up finished in {sum(timings.values()):.2f}s.")
+    return timings
@@ -0,0 +1,109 @@
+import asyncio
+
+from apis.geocoder import get_geocoder
+from bot.user_data import get_storage
+
+NEARBY_STOPS_COUNT = 3
+LOCATION_KEYS = ("home_location", "university_location")
+
+
+def get_stop_locator(reload: bool = False):
+    # Imported here so that NumPy is loaded only when stops are located.
+    from apis.stop_locator import get_stop_locator
+    return get_stop_locator(reload=reload)
+
+
+def _apply_nearby_stops(location_data: dict, nearby: list[dict]) -> None:
+    """
+    Stores the nearby stops on a saved location and, unless the user chose
+    the stop themselves, uses the nearest one as the location's stop.
+    """
+    location_data["nearby_stops"] = nearby
+    if nearby and (not location_data.get("stop") or location_data.get("stop_source") == "nearest"):
+        location_data["stop"] = nearby[0]["name"]
+        location_data["stop_id"] = nearby[0]["stop_id"]
+        location_data["stop_source"] = "nearest"
+
+
+async def locate_nearby_stops(location_data: dict) -> None:
+    """
+    Geocodes the location's address and adds its coordinates ('lat', 'lon')
+    and the nearest stops. Leaves the location unchanged if there is no stop
+    list or the address cannot be found.
+    """
+    locator = get_stop_locator()
+    if locator is None or not location_data.get("address"):
+        return
+    point = await get_geocoder().geocode(location_data["address"])
+    if point is None:
+        return
+    location_data["lat"], location_data["lon"] = point
+    _apply_nearby_stops(location_data, locator.nearest_stops(*point, k=NEARBY_STOPS_COUNT))
+
+
+def _same_place(current: dict, located: dict) -> bool:
+    return all(current.get(field) == located.get(field) for field in ("address", "lat", "lon"))
+
+
+def find_nearby_stops(reload: bool = False) -> list[tuple[int, str, dict, list[dict]]]:
+    """
+    Computes the nearby stops of every geocoded location of every user in
+    one vectorized batch. Blocking; run it in a thread.
+
+    Returns:
+        (user_id, location key, location as read, nearby stops) for each location.
+    """
+    locator = get_stop_locator(reload=reload)
+    if locator is None:
+        return []
+
+    locations = []
+    for users in get_storage().iter_users(list(LOCATION_KEYS)):
+        for user_id, user in users:
+            for key in LOCATION_KEYS:
+                location_data = user[key]
+                if location_data and location_data.get("lat") is not None:
+                    locations.append((user_id, key, location_data))
+    if not locations:
+        return []
+    points = [(data["lat"], data["lon"]) for _, _, data in locations]
+    return [(user_id, key, location_data, nearby) for (user_id, key, location_data), nearby
+            in zip(locations, locator.nearest_stops_many(points, k=NEARBY_STOPS_COUNT))]
+
+
+def apply_nearby_stops(found: list[tuple[int, str, dict, list[dict]]]) -> int:
+    """
+    Stores the nearby stops found by find_nearby_stops() on the locations
+    that still have the same address. The locations are read again and
+    written without a pause, so an address saved in the meantime (/set_home)
+    is kept; only the stop fields change.
+
+    Returns:
+        The number of locations updated.
+    """
+    nearby_of = {(user_id, key): (located, nearby) for user_id, key, located, nearby in found}
+    updates = []
+    for users in get_storage().iter_users(list(LOCATION_KEYS)):
+        for user_id, user in users:
+            for key in LOCATION_KEYS:
+                current = user[key]
+                if (user_id, key) in nearby_of and current and _same_place(current, nearby_of[user_id, key][0]):
+                    _apply_nearby_stops(current, nearby_of[user_id, key][1])
+                    updates.append((user_id, key, current))
+    if updates:
+        # One write for all users instead of one per location
+        get_storage().set_many(updates)
+    return len(updates)
+
+
+async def refresh_nearby_stops(reload: bool = False) -> int:
+    """
+    Recomputes the nearby stops of all saved locations, e.g. after the stop
+    list was updated. The search runs in a thread; the results are applied
+    on the event loop, where handlers save locations, so none is overwritten.
+
+    Returns:
+        The number of locations updated.
+    """
+    found = await asyncio.to_thread(find_nearby_stops, reload)
+    return apply_nearby_stops(found) if found else 0
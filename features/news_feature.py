@@ -1,5 +1,18 @@
 from aiogram.types import Message
 from apis.news import get_news
+from core.speculation import speculator
+
+NEWS_KEYWORDS = ("новост", "нового", "заголов", "news", "headlines")
+TECHNOLOGY_KEYWORDS = ("технолог", "tech")
+
+
+def predict_news_fetch(user_id: int, text: str, recent_intents: list):
+    """Expects a news request when the message asks for news."""
+    folded = text.casefold()
+    if not any(keyword in folded for keyword in NEWS_KEYWORDS):
+        return None
+    category = "technology" if any(keyword in folded for keyword in TECHNOLOGY_KEYWORDS) else "world"
+    return ("news", category), lambda: get_news(category)
 
 async def handle_news_intent(message: Message, entities: dict) -> str:
     """
@@ -19,5 +32,5 @@ async def handle_news_intent(message: Message, entities: dict) -> str:
     # Use the mapped category, otherwise use the original, or default to "world"
     final_category = category_map_ru.get(category.lower(), category)
 
-    news_report = await get_news(final_category)
+    news_report = await speculator.result(message.from_user.id, ("news", final_category), get_news, final_category)
     return news_report
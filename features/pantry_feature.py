@@ -0,0 +1,131 @@
+from aiogram.types import Message
+
+from bot.user_data import get_storage
+from features.pantry_parser import PantryItem, normalize_name, parse_action_items, parse_items
+
+# Every item is stored under a key of its own ("pantry:<normalized name>"),
+# holding its name and its amounts per base unit. A command reads and writes
+# only the items it names, never the whole inventory or profile.
+PANTRY_PREFIX = "pantry:"
+
+UNIT_LABELS = {"g": "г", "ml": "мл", "pcs": "шт", "pack": "уп", "bottle": "бут"}
+# Base unit -> (larger unit label, factor) used when an amount reaches it
+LARGER_UNITS = {"g": ("кг", 1000), "ml": ("л", 1000)}
+
+
+def _key(item: PantryItem) -> str:
+    return PANTRY_PREFIX + item.key
+
+
+def add_items(user_id: int, items: list[PantryItem]) -> list[dict]:
+    """
+    Adds items to the user's pantry and returns their updated entries.
+
+    An item already in the pantry is not added again; its amounts are summed
+    per unit. Items without an amount are only marked as present.
+    """
+    store = get_storage()
+    entries = store.get_many(user_id, list(dict.fromkeys(_key(item) for item in items)))
+    for item in items:
+        entry = entries.setdefault(_key(item), {"name": item.name, "amounts": {}})
+        if item.quantity is not None:
+            entry["amounts"][item.unit] = entry["amounts"].get(item.unit, 0) + item.quantity
+    store.set_many([(user_id, key, entry) for key, entry in entries.items()])
+    return list(entries.values())
+
+
+def remove_items(user_id: int, items: list[PantryItem]) -> tuple[list[dict], list[dict], list[PantryItem]]:
+    """
+    Removes items, or amounts of them, from the user's pantry.
+
+    Returns:
+        The entries removed entirely, the entries with amounts left, and the
+        items that were not in the pantry.
+    """
+    store = get_storage()
+    entries = store.get_many(user_id, list(dict.fromkeys(_key(item) for item in items)))
+    removed, missing = {}, []
+    for item in items:
+        key = _key(item)
+        entry = entries.get(key)
+        if entry is None:
+            if key not in removed:
+                missing.append(item)
+            continue
+        left = entry["amounts"].get(item.unit, 0) - item.quantity if item.quantity is not None else 0
+        if left > 0:
+            entry["amounts"][item.unit] = left
+            continue
+        entry["amounts"].pop(item.unit, None)
+        # Without an amount, or when another unit is left, the item is gone only if nothing else is
+        if item.quantity is None or not entry["amounts"]:
+            removed[key] = entries.pop(key)
+    if removed:
+        store.delete_many([(user_id, key) for key in removed])
+    if entries:
+        store.set_many([(user_id, key, entry) for key, entry in entries.items()])
+    return list(removed.values()), list(entries.values()), missing
+
+
+def list_items(user_id: int) -> list[dict]:
+    """Returns the user's pantry entries sorted by name."""
+    entries = get_storage().get_prefix(user_id, PANTRY_PREFIX)
+    return sorted(entries.values(), key=lambda entry: normalize_name(entry["name"]))
+
+
+def format_amount(unit: str, quantity: float) -> str:
+    larger = LARGER_UNITS.get(unit)
+    if larger and quantity >= larger[1]:
+        return f"{quantity / larger[1]:g} {larger[0]}"
+    return f"{quantity:g} {UNIT_LABELS.get(unit, unit)}"
+
+
+def format_entry(entry: dict) -> str:
+    amounts = ", ".join(format_amount(unit, quantity) for unit, quantity in entry["amounts"].items())
+    name = entry["name"][:1].upper() + entry["name"][1:]
+    return f"{name} — {amounts}" if amounts else name
+
+
+def format_pantry(entries: list[dict]) -> str:
+    if not entries:
+        return "🛒 Кладовая пуста. Добавьте продукты, например: 'добавь молоко, 2 яйца и хлеб'."
+    return "\n".join(["🛒 В кладовой:", *(f"• {format_entry(entry)}" for entry in entries)])
+
+
+def _items_of(message: Message, action: str, entities: dict) -> list[PantryItem]:
+    items = parse_action_items(message.text or "", action)
+    if not items and entities.get("item"):
+        # The message did not parse (e.g. an unusual wording); use the item Gemini found
+        items = parse_items(str(entities["item"]))
+    return items
+
+
+async def handle_pantry_intent(message: Message, intent: str, entities: dict) -> str:
+    """
+    Handles the 'pantry_add', 'pantry_remove' and 'pantry_list' intents.
+
+    The items come from the local parser over the message, so a message
+    naming several items is handled at once. A message that both adds and
+    removes items gives each intent only the items under its own verbs.
+    """
+    user_id = message.from_user.id
+    if intent == "pantry_list":
+        return format_pantry(list_items(user_id))
+
+    items = _items_of(message, "add" if intent == "pantry_add" else "remove", entities)
+    if not items:
+        return "Не понял, какие продукты имеются в виду. Например: 'добавь молоко, 2 яйца и хлеб'."
+
+    if intent == "pantry_add":
+        entries = add_items(user_id, items)
+        return "✅ Добавлено в кладовую:\n" + "\n".join(f"• {format_entry(entry)}" for entry in entries)
+
+    removed, left, missing = remove_items(user_id, items)
+    lines = []
+    if removed:
+        lines.append("🗑️ Убрано из кладовой: " + ", ".join(entry["name"] for entry in removed))
+    if left:
+        lines.append("Осталось:\n" + "\n".join(f"• {format_entry(entry)}" for entry in left))
+    if missing:
+        lines.append("Этого не было в кладовой: " + ", ".join(item.name for item in missing))
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+import re
+from dataclasses import dataclass
+
+# Parses pantry commands such as "добавь молоко, 2 яйца и хлеб" or
+# "закончились 500 г муки" locally, in one pass over the text. Gemini only
+# tells the intent; the items are read here, so a message with several
+# items needs no further requests.
+
+ADD_VERBS = ("добав", "купил", "куплен", "полож", "закин", "прибав", "add", "put", "bought", "pridaj", "kúpil", "kupil")
+REMOVE_VERBS = ("удал", "убер", "убра", "законч", "кончил", "съел", "выпил", "использ", "израсход", "выкин",
+                "remove", "delete", "used", "ate", "odober", "vymaž", "vymaz", "minul")
+# Words that only make the request polite or explicit
+FILLER_WORDS = {"пожалуйста", "please", "ещё", "еще", "тоже", "также", "also", "мне", "у", "меня", "my", "the",
+                "some", "a", "an", "и", "and", "запиши", "запишите", "запомни", "немного", "of", "i", "som"}
+# Words that start another request ("... и покажи, что есть"); items end there
+STOP_WORDS = {"покажи", "скажи", "какая", "какой", "какие", "что", "как", "где", "когда", "сколько",
+              "show", "tell", "what", "how", "where", "when", "list", "ukáž", "ukaz", "aká", "aké", "čo"}
+PANTRY_PLACES = re.compile(
+    r"\b(?:в|во|из|с|со|to|into|from|in|do|zo|z)\s+(?:мою\s+|моей\s+|my\s+|the\s+)?"
+    r"(?:кладов\w*|холодильник\w*|спис\w*(?:\s+продуктов|\s+покупок)?|pantry|fridge|špajz\w*|spajz\w*|chladničk\w*)",
+    re.IGNORECASE,
+)
+
+# Unit word -> (base unit, factor); masses are kept in grams and volumes in millilitres
+UNITS = {
+    **dict.fromkeys(("г", "гр", "грамм", "грамма", "граммов", "g", "gram", "grams"), ("g", 1)),
+    **dict.fromkeys(("кг", "килограмм", "килограмма", "килограммов", "kg"), ("g", 1000)),
+    **dict.fromkeys(("мл", "ml"), ("ml", 1)),
+    **dict.fromkeys(("л", "литр", "литра", "литров", "l", "liter", "liters", "litre", "litres"), ("ml", 1000)),
+    **dict.fromkeys(("шт", "штук", "штуки", "штука", "штуку", "pcs", "pc", "ks"), ("pcs", 1)),
+    **dict.fromkeys(("уп", "упаковка", "упаковку", "упаковки", "упаковок", "пачка", "пачку", "пачки", "пачек", "pack", "packs"), ("pack", 1)),
+    **dict.fromkeys(("бутылка", "бутылку", "бутылки", "бутылок", "bottle", "bottles"), ("bottle", 1)),
+}
+NUMBER_WORDS = {
+    "один": 1, "одна": 1, "одно": 1, "одну": 1, "два": 2, "две": 2, "пару": 2, "пара": 2, "три": 3,
+    "четыре": 4, "пять": 5, "шесть": 6, "семь": 7, "восемь": 8, "девять": 9, "десять": 10, "дюжину": 12,
+    "пол": 0.5, "половину": 0.5, "полтора": 1.5, "полторы": 1.5,
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "dozen": 12,
+}
+
+_NUMBER = r"\d+(?:[.,]\d+)?|(?:" + "|".join(sorted(map(re.escape, NUMBER_WORDS), key=len, reverse=True)) + r")\b"
+_UNIT = "|".join(sorted(map(re.escape, UNITS), key=len, reverse=True))
+_LEADING_AMOUNT = re.compile(rf"^(?P<quantity>{_NUMBER})\s*(?:(?P<unit>{_UNIT})\.?(?=\s|$))?\s*(?P<name>.*)$", re.IGNORECASE)
+_TRAILING_AMOUNT = re.compile(rf"^(?P<name>.+?)\s+(?P<quantity>\d+(?:[.,]\d+)?)\s*(?:(?P<unit>{_UNIT})\.?)?$", re.IGNORECASE)
+_SEPARATORS = re.compile(r"\s*(?:(?<!\d),|,(?!\d)|[;:]|\s+и\s+|\s+and\s+)\s*", re.IGNORECASE)
+# "a" also separates items in Slovak ("chlieb a maslo"), but in English it is the article ("a dozen eggs")
+_SEPARATORS_SK = re.compile(r"\s*(?:(?<!\d),|,(?!\d)|[;:]|\s+и\s+|\s+and\s+|\s+a\s+(?=\S))\s*", re.IGNORECASE)
+_ENGLISH = re.compile(r"\b(?:i|add|put|bought|remove|delete|used|ate|and|the|to|my|of|some|please)\b", re.IGNORECASE)
+# Inflectional endings dropped to match "молоко" with "молока" and "eggs" with "egg"
+_ENDINGS = ("ами", "ями", "ов", "ев", "ей", "ам", "ям", "ах", "ях", "es", "а", "я", "о", "е", "ы", "и", "ь", "й", "у", "ю", "s")
+
+
+@dataclass
+class PantryItem:
+    name: str
+    quantity: float | None = None
+    unit: str | None = None
+
+    @property
+    def key(self) -> str:
+        return normalize_name(self.name)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Returns the key an item is stored under: the casefolded name with the
+    ending of its last word dropped, so inflected forms of a name share it.
+    """
+    words = name.casefold().replace("ё", "е").split()
+    if not words:
+        return ""
+    last = words[-1]
+    for ending in _ENDINGS:
+        if last.endswith(ending) and len(last) - len(ending) >= 3:
+            words[-1] = last[:-len(ending)]
+            break
+    return " ".join(words)
+
+
+def _action_of(word: str) -> str | None:
+    word = word.casefold()
+    if word.startswith(ADD_VERBS):
+        return "add"
+    if word.startswith(REMOVE_VERBS):
+        return "remove"
+    return None
+
+
+def detect_action(text: str) -> str | None:
+    """Returns 'add' or 'remove' for the first pantry verb in the text, or None."""
+    for word in re.findall(r"\w+", text):
+        action = _action_of(word)
+        if action:
+            return action
+    return None
+
+
+def split_actions(text: str) -> list[tuple[str | None, str]]:
+    """
+    Splits a command into (action, clause) pairs, a clause starting at each
+    pantry verb: "добавь молоко и убери яйца" gives ("add", "добавь молоко и ")
+    and ("remove", "убери яйца"). Words before the first verb belong to the
+    first clause; a text without verbs is one clause with the action None.
+    """
+    verbs = [(match.start(), action) for match in re.finditer(r"\w+", text)
+             if (action := _action_of(match.group()))]
+    if not verbs:
+        return [(None, text)]
+    ends = [start for start, _ in verbs[1:]] + [len(text)]
+    return [(action, text[0 if i == 0 else start:end]) for i, ((start, action), end) in enumerate(zip(verbs, ends))]
+
+
+def _parse_quantity(value: str) -> float:
+    folded = value.casefold()
+    return NUMBER_WORDS[folded] if folded in NUMBER_WORDS else float(folded.replace(",", "."))
+
+
+def parse_item(text: str) -> PantryItem | None:
+    """Parses one item such as "2 яйца", "500 г муки", "молоко 1 л" or "хлеб"."""
+    words = [word for word in text.split() if word.casefold().strip(".!?") not in FILLER_WORDS]
+    text = " ".join(words).strip(" .!?\"'")
+    if not text:
+        return None
+    quantity = unit = None
+    match = _LEADING_AMOUNT.match(text)
+    if match and match.group("name"):
+        quantity, unit, text = match.group("quantity"), match.group("unit"), match.group("name")
+    else:
+        match = _TRAILING_AMOUNT.match(text)
+        if match:
+            quantity, unit, text = match.group("quantity"), match.group("unit"), match.group("name")
+    if quantity is None:
+        return PantryItem(text.casefold())
+    base, factor = UNITS[unit.casefold()] if unit else ("pcs", 1)
+    return PantryItem(text.casefold(), _parse_quantity(quantity) * factor, base)
+
+
+def parse_items(text: str) -> list[PantryItem]:
+    """
+    Returns the items named in a pantry command, in order, leaving out the
+    verbs, the pantry itself ("в кладовку") and a following request
+    ("... и покажи, что есть").
+    """
+    text = PANTRY_PLACES.sub(" ", text)
+    items = []
+    # Sentences end at "." (but not in "1.5"), "!" and "?"
+    for sentence in re.split(r"[!?]+|\.(?!\d)", text):
+        separators = _SEPARATORS if _ENGLISH.search(sentence) else _SEPARATORS_SK
+        for part in separators.split(sentence):
+            words = [word for word in part.split() if not word.casefold().startswith(ADD_VERBS + REMOVE_VERBS)
+                     and word.casefold() not in FILLER_WORDS]
+            if words and words[0].casefold() in STOP_WORDS:
+                return items
+            item = parse_item(" ".join(words))
+            if item is not None:
+                items.append(item)
+    return items
+
+
+def parse_action_items(text: str, action: str) -> list[PantryItem]:
+    """
+    Returns the items named under the verbs of one action ('add' or
+    'remove'), so "добавь молоко и убери яйца" adds only the milk. Without
+    a verb of that action in the text, all its items are returned.
+    """
+    clauses = split_actions(text)
+    if all(clause_action != action for clause_action, _ in clauses):
+        return parse_items(text)
+    return [item for clause_action, clause in clauses if clause_action == action for item in parse_items(clause)]
@@ -1,6 +1,86 @@
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
 from aiogram.types import Message
-from apis.weather import get_weather
+from apis.forecast_cache import CityForecast
+from apis.weather import get_forecast, get_weather
 from bot.user_data import get_user_data, update_user_data
+from core.speculation import speculator
+
+WEATHER_KEYWORDS = ("погод", "температур", "градус", "дожд", "снег", "зонт", "холодно", "жарко", "weather")
+RAIN_KEYWORDS = ("дожд", "зонт", "осадк", "rain", "umbrella", "dážď", "dazd")
+
+# "в 8 утра", "at 8am", "в 19:30", "o 7 hod"
+_CLOCK_TIME = re.compile(
+    r"(?:\b(?:в|к|at|o|na)\s*(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2}))?(?!\d)|\b(?P<hour2>\d{1,2}):(?P<minute2>\d{2})(?!\d)"
+    r"|\b(?P<hour3>\d{1,2})\s*(?=am|pm))\s*(?P<suffix>утра|вечера|дня|ночи|am|pm)?"
+)
+PARTS_OF_DAY = {"утром": 8, "morning": 8, "ráno": 8, "днём": 14, "днем": 14, "afternoon": 14,
+                "вечером": 19, "evening": 19, "večer": 19, "ночью": 23, "night": 23}
+DAYS_AHEAD = {"послезавтра": 2, "pozajtra": 2, "завтра": 1, "tomorrow": 1, "zajtra": 1}
+
+
+def parse_forecast_time(text: str, now: datetime) -> datetime | None:
+    """
+    Returns the local time a weather question is about ("завтра в 8 утра",
+    "will it rain at 6pm", "вечером"), or None if it names no time or day.
+    A time of day already past today means tomorrow.
+    """
+    folded = text.casefold()
+    days = next((days for word, days in DAYS_AHEAD.items() if word in folded), None)
+    hour = minute = None
+    match = _CLOCK_TIME.search(folded)
+    if match:
+        hour = int(match.group("hour") or match.group("hour2") or match.group("hour3"))
+        minute = int(match.group("minute") or match.group("minute2") or 0)
+        suffix = match.group("suffix")
+        if suffix in ("вечера", "дня", "pm") and hour < 12:
+            hour += 12
+        elif suffix in ("ночи", "am") and hour == 12:
+            hour = 0
+        if hour > 23 or minute > 59:
+            hour = None
+    if hour is None:
+        hour = next((hour for word, hour in PARTS_OF_DAY.items() if word in folded), None)
+        minute = 0
+    if hour is None and days is None:
+        return None
+    when = now.replace(hour=12 if hour is None else hour, minute=minute or 0, second=0, microsecond=0)
+    if days is not None:
+        return when + timedelta(days=days)
+    return when if when > now else when + timedelta(days=1)
+
+
+def format_forecast(location: str, forecast: CityForecast, text: str, now: float | None = None) -> str:
+    """Answers a question about the weather at a time from the city's cached forecast."""
+    local_now = datetime.fromtimestamp((now or time.time()) + forecast.tz_offset, tz=timezone.utc).replace(tzinfo=None)
+    when = parse_forecast_time(text, local_now)
+    slot = forecast.at((when - datetime(1970, 1, 1)).total_seconds() - forecast.tz_offset)
+    if slot is None:
+        return f"Прогноз для города {location} на {when:%d.%m %H:%M} пока недоступен: он есть только на 5 дней вперёд."
+    answer = (
+        f"Прогноз для города {location} на {when:%d.%m %H:%M}: {slot['description']}, "
+        f"{slot['temp']:.0f}°C, вероятность осадков {slot['pop']:.0%}."
+    )
+    if any(keyword in text.casefold() for keyword in RAIN_KEYWORDS):
+        answer += " ☔ Возьмите зонт." if slot["wet"] or slot["pop"] >= 0.5 else " Дождя не ожидается."
+    return answer
+
+
+def predict_weather_fetch(user_id: int, text: str, recent_intents: list):
+    """
+    Expects a weather request for the user's saved city when the message
+    mentions the weather, or when most of their recent requests were for it.
+    """
+    folded = text.casefold()
+    mentions_weather = any(keyword in folded for keyword in WEATHER_KEYWORDS)
+    if not mentions_weather and not (len(recent_intents) >= 2 and recent_intents.count("weather") * 2 > len(recent_intents)):
+        return None
+    city = get_user_data(user_id, "city")
+    if not city:
+        return None
+    return ("weather", city.casefold()), lambda: get_weather(city)
 
 
 async def handle_set_city_intent(message: Message, entities: dict) -> str:
@@ -20,7 +100,8 @@ async def handle_set_city_intent(message: Message, entities: dict) -> str:
 async def handle_weather_intent(message: Message, entities: dict) -> str:
     """
     Handles the 'weather' intent by checking for a location in the message,
-    or falling back to the user's saved city.
+    or falling back to the user's saved city. Questions naming a time or day
+    are answered from the city's forecast.
     """
     user_id = message.from_user.id
     location = entities.get("location")
@@ -32,5 +113,13 @@ async def handle_weather_intent(message: Message, entities: dict) -> str:
     if not location:
         return "Я не знаю вашего города. Чтобы я его запомнил, напишите, например: 'мой город Москва'."
 
-    weather_report = await get_weather(location)
+    # Questions about a time ("пойдёт ли дождь в 8 утра") are answered from the forecast
+    text = message.text or ""
+    if parse_forecast_time(text, datetime.now()) is not None:
+        forecast = await get_forecast(location)
+        if forecast is None:
+            return f"Не удалось получить прогноз для города {location}. Пожалуйста, попробуйте позже."
+        return format_forecast(location, forecast, text)
+
+    weather_report = await speculator.result(user_id, ("weather", location.casefold()), get_weather, location)
     return weather_report
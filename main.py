@@ -5,21 +5,16 @@ import os
 from aiogram import Bot, Dispatcher
 from dotenv import load_dotenv
 
+from core.logging_setup import setup_logging
+
 # --- Main application ---
 
 async def main():
     """
     Main function to start the bot.
     """
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
-    )
     logging.info("Starting bot...")
 
-    # Load environment variables from .env file
-    load_dotenv()
     bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not bot_token:
         logging.error("TELEGRAM_BOT_TOKEN not found in .env file.")
@@ -29,22 +24,89 @@ async def main():
     bot = Bot(token=bot_token)
     dp = Dispatcher()
 
-    # Include routers
-    from bot.handlers import router as bot_router
-    dp.include_router(bot_router)
+    use_shared_store = os.getenv("USER_DATA_BACKEND", "json").lower() == "sqlite"
+    num_workers = int(os.getenv("WORKERS", "1"))
+    pool = None
+
+    if num_workers > 1:
+        if not use_shared_store:
+            logging.error("WORKERS > 1 requires USER_DATA_BACKEND=sqlite so that workers share user data.")
+            return
+
+        # This process only receives updates; workers handle them and run the scheduler.
+        from bot.workers import WorkerPool, ForwardToWorkersMiddleware
+        pool = WorkerPool(num_workers, bot_token)
+        pool.start()
+        dp.update.outer_middleware(ForwardToWorkersMiddleware(pool))
+        logging.info(f"Started {num_workers} worker processes.")
+    else:
+        # Include routers; admin commands go first, the regular handlers catch all messages
+        from bot.admin import router as admin_router
+        from bot.handlers import router as bot_router
+        dp.include_router(admin_router)
+        dp.include_router(bot_router)
 
-    # Setup and start the scheduler
-    from scheduler.scheduler import setup_scheduler
-    setup_scheduler(bot)
+        # Setup and start the scheduler
+        if use_shared_store:
+            # Other instances may share the store; only the elected leader runs jobs.
+            from bot.user_data import get_storage
+            from scheduler.leader import LeaderLease
+            from scheduler.scheduler import setup_scheduler_with_leader_election
+            setup_scheduler_with_leader_election(bot, LeaderLease(get_storage().path))
+        else:
+            from scheduler.scheduler import setup_scheduler
+            setup_scheduler(bot)
 
-    # Start polling
+    # Load slow clients in the background while updates already flow in
+    # (in multi-worker mode every worker does this itself)
+    warm_up_task = None
+    if pool is None:
+        from core.warmup import warm_up
+        warm_up_task = asyncio.create_task(warm_up())
+        # Event-loop lag statistics for the /loop_lag admin command
+        from core.diagnostics import loop_monitor
+        loop_monitor.start()
+        # Apply edits of the config file while running
+        from core.config import config
+        config.start()
+
+    # Start receiving updates
     try:
-        await dp.start_polling(bot)
+        if os.getenv("BOT_MODE", "polling").lower() == "webhook":
+            base_url = os.getenv("WEBHOOK_BASE_URL")
+            if not base_url:
+                logging.error("WEBHOOK_BASE_URL must be set when BOT_MODE=webhook.")
+                return
+
+            from bot.webhook import run_webhook, WEBHOOK_PATH
+            await run_webhook(
+                bot,
+                dp,
+                base_url=base_url,
+                host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+                port=int(os.getenv("WEBHOOK_PORT", "8080")),
+                secret_token=os.getenv("WEBHOOK_SECRET") or None,
+                path=os.getenv("WEBHOOK_PATH", WEBHOOK_PATH),
+            )
+        else:
+            await dp.start_polling(bot)
     finally:
+        if warm_up_task:
+            warm_up_task.cancel()
+            loop_monitor.stop()
+            config.stop()
+        if pool:
+            await asyncio.to_thread(pool.stop)
         await bot.session.close()
 
 if __name__ == '__main__':
+    # Load environment variables from .env file (including the logging settings)
+    load_dotenv()
+    # Log records are formatted and written by a background thread, off the event loop
+    log_listener = setup_logging()
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
         logging.info("Bot stopped manually.")
+    finally:
+        log_listener.stop()
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Hashable
+
+import aiohttp
+
+from apis.cp_sk_scraper import find_latest_departure
+from apis.forecast_cache import CityForecast, city_key
+from apis.google_calendar import get_first_event_for_day
+from apis.gtfs import find_latest_departure_offline
+from apis.news import fetch_headlines
+from apis.stop_index import get_stop_index
+from apis.weather import get_forecast
+from bot.user_data import SETUP_KEYS, get_storage
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+# Set MORNING_DIGEST=0 to send the reminders planned the evening before as they are
+MORNING_DIGEST = os.getenv("MORNING_DIGEST", "1") != "0"
+# Seconds a fetched forecast, headline list or route is shared with later digests
+DIGEST_CACHE_SECONDS = float(os.getenv("DIGEST_CACHE_SECONDS", "900"))
+# Seconds each part of a digest may take before the digest goes out without it
+DIGEST_TIMEOUT = float(os.getenv("DIGEST_TIMEOUT_SECONDS", "10"))
+# News category of users who have not chosen one (user key "news_category")
+DIGEST_NEWS_CATEGORY = os.getenv("DIGEST_NEWS_CATEGORY", "world")
+DIGEST_HEADLINES = int(os.getenv("DIGEST_HEADLINES", "3"))
+
+DIGEST_KEYS = (*SETUP_KEYS, "city", "news_category")
+
+
+def weather_line(forecast: CityForecast | None, when: datetime) -> str | None:
+    """Returns a plan's weather line for a time, or None without a forecast for it."""
+    slot = forecast.at(when.timestamp()) if forecast else None
+    if slot is None:
+        return None
+    line = f"- Погода в {when.strftime('%H:%M')}: {slot['description']}, {slot['temp']:.0f}°C"
+    if slot["wet"] or slot["pop"] >= 0.5:
+        line += ", возьмите зонт"
+    return line + "."
+
+
+async def plan_departure(home_loc: dict, uni_loc: dict, event_start: datetime) -> tuple[str | None, str | None]:
+    """
+    Finds the latest departure from the home stop that reaches the university
+    stop before an event.
+
+    Returns:
+        (departure "HH:MM", None); (None, None) if no connection was found; or
+        (None, a message for the user) if the stops cannot be used.
+    """
+    origin_stop = home_loc.get('stop')
+    dest_stop = uni_loc.get('stop')
+
+    if not (origin_stop and dest_stop):
+        return None, "Не могу рассчитать маршрут: не заданы названия остановок."
+
+    # Locations saved before the stop index existed may hold misspelled names;
+    # those would fail on cp.sk every time, so they are not sent there.
+    origin_id, dest_id = origin_stop, dest_stop
+    stop_index = get_stop_index()
+    if stop_index is not None:
+        origin = stop_index.get(home_loc.get('stop_id', '')) or stop_index.resolve(origin_stop)
+        dest = stop_index.get(uni_loc.get('stop_id', '')) or stop_index.resolve(dest_stop)
+        if not (origin and dest):
+            return None, (
+                f"Не могу рассчитать маршрут: неизвестная остановка «{dest_stop if origin else origin_stop}». "
+                "Обновите её командой /set_home или /set_university."
+            )
+        origin_id, dest_id = origin.stop_id, dest.stop_id
+        origin_stop, dest_stop = origin.name, dest.name
+
+    # The local timetable answers instantly; cp.sk is only asked when it cannot
+    departure = find_latest_departure_offline(origin_id, dest_id, event_start)
+    if not departure:
+        departure = await find_latest_departure(origin_stop, dest_stop, event_start)
+    return departure, None
+
+
+class SharedCache:
+    """
+    Fetch results shared by all digests assembled within `ttl` seconds.
+
+    The first digest that needs a key (e.g. a city's forecast) starts its
+    fetch and the others await the same task, so each key is fetched once
+    however many users share it. Failed fetches are not kept. Requests and
+    fetches are counted per kind, giving the sharing ratio.
+    """
+
+    def __init__(self, ttl: float = DIGEST_CACHE_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: dict[tuple, tuple[float, asyncio.Task]] = {}
+        self.requests = Counter()
+        self.fetches = Counter()
+
+    async def get(self, kind: str, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        now = self.clock()
+        self.requests[kind] += 1
+        entry = self._entries.get((kind, key))
+        if entry is None or entry[0] <= now or (entry[1].done() and entry[1].exception() is not None):
+            self._prune(now)
+            self.fetches[kind] += 1
+            entry = (now + self.ttl, asyncio.ensure_future(fetch()))
+            self._entries[(kind, key)] = entry
+        # A digest that times out must not cancel the fetch other digests are waiting for
+        return await asyncio.shield(entry[1])
+
+    def _prune(self, now: float) -> None:
+        expired = [key for key, (expires_at, task) in self._entries.items() if expires_at <= now and task.done()]
+        for key in expired:
+            del self._entries[key]
+
+    def sharing(self) -> dict[str, float]:
+        """Returns the requests served per fetch, by kind."""
+        return {kind: self.requests[kind] / self.fetches[kind] for kind in self.fetches}
+
+
+class MorningDigest:
+    """
+    Turns due morning reminders into a digest: today's first event, when
+    to leave, the weather at the event and the top headlines.
+
+    For every user the parts are gathered concurrently, each under
+    DIGEST_TIMEOUT; a part that fails or is late is left out, and without
+    the event or the departure the reminder planned the evening before is
+    kept. Forecasts, headlines and routes come through a SharedCache, so
+    each city, category and route is fetched once for all users.
+    """
+
+    def __init__(self, cache: SharedCache | None = None, timeout: float = DIGEST_TIMEOUT, now: Callable[[], datetime] | None = None):
+        self.cache = cache or SharedCache()
+        self.timeout = timeout
+        self.now = now or (lambda: datetime.now(config.settings.tzinfo))
+        # Seconds taken to assemble each recent digest
+        self.latencies: deque[float] = deque(maxlen=1000)
+
+    async def render(self, due: list[tuple[int, str]]) -> list[str]:
+        """Returns the digests of due (user_id, planned reminder) pairs, in the same order."""
+        if not due:
+            return []
+        store = get_storage()
+        users = await asyncio.to_thread(lambda: [store.get_many(user_id, list(DIGEST_KEYS)) for user_id, _ in due])
+        async with aiohttp.ClientSession() as session:
+            digests = await asyncio.gather(*(
+                self.assemble(session, user_id, user, planned) for (user_id, planned), user in zip(due, users)
+            ))
+        latencies = list(self.latencies)[-len(due):]
+        logger.info(
+            "Assembled %d morning digests, p50 %.0f ms, max %.0f ms per user; requests per fetch: %s",
+            len(due), statistics.median(latencies) * 1000, max(latencies) * 1000,
+            ", ".join(f"{kind} {ratio:.1f}" for kind, ratio in self.cache.sharing().items()),
+            extra={"event": "morning_digest", **self.metrics()},
+        )
+        return digests
+
+    async def _part(self, user_id: int, name: str, coro: Awaitable[Any]) -> Any:
+        try:
+            return await asyncio.wait_for(coro, self.timeout)
+        except Exception as e:
+            logger.warning("Morning digest left out the %s: %r", name, e, extra={"user_id": user_id, "stage": "morning_digest"})
+            return None
+
+    async def _event_and_departure(self, user_id: int, user: dict) -> tuple[dict | None, str | None]:
+        event = await get_first_event_for_day(user_id, self.now().date(), user.get('google_refresh_token'))
+        if not event or not (user.get('home_location') and user.get('university_location')):
+            return event, None
+        event_start = datetime.fromisoformat(event['start'])
+        home, uni = user['home_location'], user['university_location']
+        route = (home.get('stop_id') or home.get('stop'), uni.get('stop_id') or uni.get('stop'), event_start.isoformat())
+        departure, _ = await self.cache.get("route", route, lambda: plan_departure(home, uni, event_start))
+        return event, departure
+
+    async def _forecast(self, city: str | None) -> CityForecast | None:
+        if not city:
+            return None
+        return await self.cache.get("weather", city_key(city), lambda: get_forecast(city))
+
+    async def _headlines(self, session: aiohttp.ClientSession, category: str) -> list[str]:
+        api_key = os.getenv("NEWS_API_KEY")
+        if not api_key:
+            return []
+        articles = await self.cache.get(
+            "news", category, lambda: fetch_headlines(session, category, api_key, DIGEST_HEADLINES)
+        )
+        return [article.get('title') or 'Без заголовка' for article in articles[:DIGEST_HEADLINES]]
+
+    async def assemble(self, session: aiohttp.ClientSession, user_id: int, user: dict, planned: str) -> str:
+        """Gathers the parts of a user's digest concurrently and renders it."""
+        started = time.perf_counter()
+        plan, forecast, headlines = await asyncio.gather(
+            self._part(user_id, "plan", self._event_and_departure(user_id, user)),
+            self._part(user_id, "weather", self._forecast(user.get('city'))),
+            self._part(user_id, "news", self._headlines(session, user.get('news_category') or DIGEST_NEWS_CATEGORY)),
+        )
+        event, departure = plan or (None, None)
+
+        if event and departure:
+            event_start = datetime.fromisoformat(event['start'])
+            lines = [
+                "Доброе утро! Ваш день:",
+                f"- Первая пара: '{event['summary']}' в {event_start.strftime('%H:%M')}.",
+                f"- Выезжайте не позднее {departure}.",
+            ]
+        else:
+            event_start = self.now()
+            lines = [planned]
+        weather = weather_line(forecast, event_start)
+        if weather:
+            lines.append(weather)
+        if headlines:
+            lines.append("- Главные новости:")
+            lines.extend(f"  • {title}" for title in headlines)
+        self.latencies.append(time.perf_counter() - started)
+        return "\n".join(lines)
+
+    def metrics(self) -> dict:
+        return {
+            "digests": len(self.latencies),
+            **{f"requests_{kind}": count for kind, count in self.cache.requests.items()},
+            **{f"fetches_{kind}": count for kind, count in self.cache.fetches.items()},
+        }
+
+
+morning_digest = MorningDigest()
@@ -1,86 +1,136 @@
 import asyncio
+import logging
+import os
 from datetime import datetime, timedelta
 from aiogram import Bot
-from bot.user_data import get_all_user_ids, get_user_data
+from bot.user_data import SETUP_KEYS, has_completed_setup, iter_users
+from bot.retention import store_maintenance
 from apis.google_calendar import get_first_event_for_day
-from apis.cp_sk_scraper import find_latest_departure
+from apis.forecast_cache import city_key, forecast_cache
+from apis.weather import prefetch_forecasts
+from core.config import config
+from features.nearby_stops import refresh_nearby_stops
+from .digest import plan_departure, weather_line
 
-# This is a placeholder for the morning job, which we'll define in the next step.
-async def morning_notifier_job(bot: Bot, user_id: int, message: str):
-    """A simple job that sends a pre-defined message to a user."""
-    await bot.send_message(user_id, message)
+logger = logging.getLogger(__name__)
 
-async def evening_planning_job(bot: Bot, scheduler):
+# Minutes between two forecast prefetches for all saved cities
+FORECAST_REFRESH_MINUTES = int(os.getenv("FORECAST_REFRESH_MINUTES", "60"))
+
+
+async def evening_planning_job(bot: Bot, reminders):
+    """
+    Runs every evening to plan the next day for all users and schedules
+    their morning reminders on the reminder engine.
+    """
+    logger.info("Running evening planning job", extra={"stage": "evening_planning"})
+    morning_reminders = []
+
+    # Only the keys the plan needs are loaded, chunk by chunk, for users who completed setup
+    async for users in iter_users((*SETUP_KEYS, "city"), where=has_completed_setup):
+        for user_id, user in users:
+            home_loc = user['home_location']
+            uni_loc = user['university_location']
+
+            try:
+                # 1. Get the first event for the next day
+                tomorrow = datetime.now().date() + timedelta(days=1)
+                event = await get_first_event_for_day(user_id, tomorrow, user['google_refresh_token'])
+
+                if not event:
+                    await bot.send_message(user_id, "На завтра у вас нет запланированных пар. Отдыхайте!")
+                    continue
+
+                event_summary = event['summary']
+                event_start_str = event['start']
+                # Parse the event start time
+                event_start_time = datetime.fromisoformat(event_start_str)
+
+                # 2. Calculate the commute
+                departure_time_str, problem = await plan_departure(home_loc, uni_loc, event_start_time)
+                if problem:
+                    await bot.send_message(user_id, problem)
+                    continue
+
+                if not departure_time_str:
+                    await bot.send_message(user_id, f"Не удалось рассчитать время в пути для завтрашней пары '{event_summary}'.")
+                    continue
+
+                # 3. Send the evening summary
+                departure_dt = datetime.strptime(departure_time_str, "%H:%M").time()
+                plan = [
+                    f"- Первая пара: '{event_summary}' в {event_start_time.strftime('%H:%M')}.",
+                    f"- Чтобы успеть, вам нужно выехать не позднее {departure_time_str}.",
+                ]
+                forecast = forecast_cache.get_forecast(user['city']) if user['city'] else None
+                weather = weather_line(forecast, event_start_time)
+                if weather:
+                    plan.append(weather)
+                summary_message = "Добрый вечер! Ваш план на завтра:\n" + "\n".join(plan) + "\nХорошего вечера!"
+                await bot.send_message(user_id, summary_message)
+
+                # 4. Schedule the dynamic morning job
+                # Departure time is today's date + departure time, then add a day for tomorrow
+                departure_datetime = datetime.combine(datetime.now().date(), departure_dt) + timedelta(days=1)
+                morning_alert_time = departure_datetime - timedelta(hours=1)
+
+                morning_message = f"Доброе утро! Напоминаю, ваша первая пара сегодня в {event_start_time.strftime('%H:%M')}. Не забудьте выехать в {departure_time_str}!"
+
+                # Times are local to the configured time zone, like the scheduler's own
+                morning_alert_time = morning_alert_time.replace(tzinfo=config.settings.tzinfo)
+                morning_reminders.append((user_id, morning_alert_time, morning_message))
+
+            except Exception as e:
+                logger.exception("Failed to process evening plan", extra={"user_id": user_id, "stage": "evening_planning"})
+                # Optionally, send an error message to the user
+                await bot.send_message(user_id, "Произошла ошибка при планировании вашего завтрашнего дня.")
+
+    reminders.schedule_many(morning_reminders)
+    logger.info("Scheduled %d morning reminders", len(morning_reminders), extra={"stage": "evening_planning"})
+
+
+async def refresh_nearby_stops_job():
+    """
+    Reloads the stop list and recomputes the nearest stops of all saved
+    addresses, so that stop-list updates reach every user.
+    """
+    updated = await refresh_nearby_stops(True)
+    logger.info("Refreshed nearby stops for %d saved locations", updated)
+
+
+async def prefetch_forecasts_job():
+    """
+    Fetches the forecasts of all saved cities in one batch (each distinct
+    city once), so that weather questions and the evening plan are answered
+    from memory, and reports the upstream calls per user and day.
+    """
+    cities = []
+    async for users in iter_users(["city"], where=lambda user: bool(user["city"])):
+        cities.extend(user["city"] for _, user in users)
+    calls = await prefetch_forecasts(cities)
+    runs_per_day = 24 * 60 / FORECAST_REFRESH_MINUTES
+    logger.info(
+        "Prefetched forecasts for %d cities of %d users with %d upstream calls (%.3f per user per day)",
+        len({city_key(city) for city in cities}), len(cities), calls,
+        calls * runs_per_day / len(cities) if cities else 0.0,
+        extra={"event": "forecast_prefetch", **forecast_cache.metrics()},
+    )
+
+
+async def maintain_store_job():
     """
-    Runs every evening to plan the next day for all users.
+    Runs one step of the user store's retention: ages out histories,
+    archives inactive users and compacts the store, a slice at a time.
+    Reports the store size and scan time before and after each full pass.
     """
-    print("Running evening planning job...")
-    user_ids = get_all_user_ids()
-
-    for user_id in user_ids:
-        # Check if the user has configured the necessary data
-        home_loc = get_user_data(user_id, 'home_location')
-        uni_loc = get_user_data(user_id, 'university_location')
-        has_google_token = get_user_data(user_id, 'google_refresh_token')
-
-        if not (home_loc and uni_loc and has_google_token):
-            # Skip users who haven't completed setup
-            continue
-
-        try:
-            # 1. Get the first event for the next day
-            tomorrow = datetime.now().date() + timedelta(days=1)
-            event = await get_first_event_for_day(user_id, tomorrow)
-
-            if not event:
-                await bot.send_message(user_id, "На завтра у вас нет запланированных пар. Отдыхайте!")
-                continue
-
-            event_summary = event['summary']
-            event_start_str = event['start']
-            # Parse the event start time
-            event_start_time = datetime.fromisoformat(event_start_str)
-
-            # 2. Calculate the commute
-            origin_stop = home_loc.get('stop')
-            dest_stop = uni_loc.get('stop')
-
-            if not (origin_stop and dest_stop):
-                await bot.send_message(user_id, "Не могу рассчитать маршрут: не заданы названия остановок.")
-                continue
-
-            departure_time_str = await find_latest_departure(origin_stop, dest_stop, event_start_time)
-
-            if not departure_time_str:
-                await bot.send_message(user_id, f"Не удалось рассчитать время в пути для завтрашней пары '{event_summary}'.")
-                continue
-
-            # 3. Send the evening summary
-            departure_dt = datetime.strptime(departure_time_str, "%H:%M").time()
-            summary_message = (
-                f"Добрый вечер! Ваш план на завтра:\n"
-                f"- Первая пара: '{event_summary}' в {event_start_time.strftime('%H:%M')}.\n"
-                f"- Чтобы успеть, вам нужно выехать не позднее {departure_time_str}.\n"
-                f"Хорошего вечера!"
-            )
-            await bot.send_message(user_id, summary_message)
-
-            # 4. Schedule the dynamic morning job
-            # Departure time is today's date + departure time, then add a day for tomorrow
-            departure_datetime = datetime.combine(datetime.now().date(), departure_dt) + timedelta(days=1)
-            morning_alert_time = departure_datetime - timedelta(hours=1)
-
-            morning_message = f"Доброе утро! Напоминаю, ваша первая пара сегодня в {event_start_time.strftime('%H:%M')}. Не забудьте выехать в {departure_time_str}!"
-
-            scheduler.add_job(
-                morning_notifier_job,
-                'date',
-                run_date=morning_alert_time,
-                kwargs={'bot': bot, 'user_id': user_id, 'message': morning_message}
-            )
-            print(f"Scheduled morning job for user {user_id} at {morning_alert_time}")
-
-        except Exception as e:
-            print(f"Failed to process evening plan for user {user_id}: {e}")
-            # Optionally, send an error message to the user
-            await bot.send_message(user_id, "Произошла ошибка при планировании вашего завтрашнего дня.")
+    report = await asyncio.to_thread(store_maintenance.step)
+    if report is None:
+        return
+    logger.info(
+        "Store maintenance pass over %d users: %d histories dropped, %d users archived; "
+        "size %.2f -> %.2f MiB, batch scan %.0f -> %.0f ms, longest step %.0f ms",
+        report["users"], report["histories_dropped"], report["archived"],
+        report["size_before"] / 2**20, report["size_after"] / 2**20,
+        report["scan_before"] * 1000, report["scan_after"] * 1000, report["longest_step"] * 1000,
+        extra={"event": "store_maintenance", **report},
+    )
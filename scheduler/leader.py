@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """
+    A time-limited lease stored in SQLite. Only one holder can own a lease
+    with a given name at a time; it must be renewed before `ttl` runs out,
+    otherwise another instance may take it over.
+    """
+
+    def __init__(self, db_path: str, name: str = "scheduler", ttl: float = 30.0, holder: str | None = None):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY,"
+            " holder TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def try_acquire(self) -> bool:
+        """
+        Acquires or renews the lease.
+
+        Returns:
+            True if this instance holds the lease afterwards.
+        """
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at"
+            " WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+            (self.name, self.holder, now + self.ttl, now),
+        )
+        row = self._conn.execute("SELECT holder FROM leases WHERE name = ?", (self.name,)).fetchone()
+        return row is not None and row[0] == self.holder
+
+    def release(self) -> None:
+        """Gives up the lease so another instance can take over immediately."""
+        self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+
+
+async def run_leader_election(lease: LeaderLease, on_elected, on_lost) -> None:
+    """
+    Keeps trying to hold `lease` and calls the callbacks when leadership changes.
+
+    Args:
+        lease: The lease to compete for.
+        on_elected: Called (without arguments) when this instance becomes the leader.
+        on_lost: Called (without arguments) when this instance stops being the leader.
+    """
+    is_leader = False
+    try:
+        while True:
+            try:
+                acquired = lease.try_acquire()
+            except sqlite3.Error as e:
+                logger.warning("Leader election failed: %s", e)
+                acquired = False
+
+            if acquired and not is_leader:
+                logger.info("Instance %s became the '%s' leader", lease.holder, lease.name)
+                on_elected()
+            elif is_leader and not acquired:
+                logger.info("Instance %s lost the '%s' leadership", lease.holder, lease.name)
+                on_lost()
+            is_leader = acquired
+
+            # Renew well before the lease expires.
+            await asyncio.sleep(lease.ttl / 3)
+    finally:
+        if is_leader:
+            on_lost()
+            lease.release()
@@ -0,0 +1,213 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+REMINDER_KEY = "morning_reminder"
+
+
+def _timestamp(when) -> float:
+    return when.timestamp() if isinstance(when, datetime) else float(when)
+
+
+class ReminderEngine:
+    """
+    Fires one-off reminders (one pending reminder per user) from a single
+    asyncio task.
+
+    Reminders are kept as (fire_at, seq, user_id, message) tuples in a
+    min-heap, and `_live` maps each user to their current tuple. Cancelling
+    or rescheduling only replaces that mapping; stale heap entries are
+    skipped when popped and dropped when they make up most of the heap.
+    Pending reminders are mirrored to the user data store so they survive
+    restarts.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[int, str], Awaitable],
+        store=None,
+        render: Callable[[list[tuple[int, str]]], Awaitable[list[str]]] | None = None,
+        batch_size: int = 50,
+        max_lateness: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            send: Coroutine function delivering a message to a user.
+            store: Optional user data storage to persist pending reminders in.
+            render: Optional coroutine function turning a batch of due
+                (user_id, message) reminders into the messages to send
+                (e.g. a digest built at send time); the scheduled messages
+                are sent if it fails.
+            batch_size: Maximum number of reminders sent concurrently.
+            max_lateness: Seconds after which a missed reminder (e.g. while
+                the bot was down) is dropped instead of sent.
+            clock: Returns the current time as a UNIX timestamp.
+        """
+        self.send = send
+        self.store = store
+        self.render = render
+        self.batch_size = batch_size
+        self.max_lateness = max_lateness
+        self.clock = clock
+        self._heap: list = []
+        self._live: dict = {}  # user_id -> their pending heap entry
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def schedule(self, user_id: int, when, message: str) -> None:
+        """Schedules (or reschedules) the user's reminder."""
+        self.schedule_many([(user_id, when, message)])
+
+    def schedule_many(self, reminders: Iterable[tuple[int, datetime | float, str]], persist: bool = True) -> None:
+        """
+        Schedules many (user_id, when, message) reminders at once, replacing
+        any pending reminder of the same users.
+        """
+        entries = []
+        for user_id, when, message in reminders:
+            entry = (_timestamp(when), next(self._seq), user_id, message)
+            self._live[user_id] = entry
+            entries.append(entry)
+        if not entries:
+            return
+        if len(entries) * 4 > len(self._heap):
+            # Re-heapifying is linear, cheaper than pushing a large batch one by one.
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+        else:
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+        self._compact()
+        if persist and self.store is not None:
+            self.store.set_many([
+                (user_id, REMINDER_KEY, {"at": fire_at, "message": message}) for fire_at, _, user_id, message in entries
+            ])
+        self._wakeup.set()
+
+    def cancel(self, user_id: int) -> bool:
+        """Cancels the user's pending reminder. Returns False if there was none."""
+        if self._live.pop(user_id, None) is None:
+            return False
+        if self.store is not None:
+            self.store.set(user_id, REMINDER_KEY, None)
+        self._compact()
+        return True
+
+    def pending(self, user_id: int) -> tuple[float, str] | None:
+        """Returns the (fire_at, message) of the user's pending reminder."""
+        entry = self._live.get(user_id)
+        return (entry[0], entry[3]) if entry else None
+
+    def _compact(self) -> None:
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [entry for entry in self._heap if self._live.get(entry[2]) is entry]
+            heapq.heapify(self._heap)
+
+    def _discard_stale(self) -> None:
+        while self._heap and self._live.get(self._heap[0][2]) is not self._heap[0]:
+            heapq.heappop(self._heap)
+
+    def next_fire_time(self) -> float | None:
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float, limit: int | None = None) -> list[tuple[int, str, float]]:
+        """Removes and returns up to `limit` due reminders as (user_id, message, fire_at)."""
+        due = []
+        while self._heap and (limit is None or len(due) < limit):
+            entry = self._heap[0]
+            fire_at, _, user_id, message = entry
+            if self._live.get(user_id) is not entry:
+                heapq.heappop(self._heap)
+                continue
+            if fire_at > now:
+                break
+            heapq.heappop(self._heap)
+            del self._live[user_id]
+            due.append((user_id, message, fire_at))
+        return due
+
+    async def fire_due(self) -> int:
+        """Sends every due reminder, `batch_size` at a time. Returns how many were sent."""
+        sent = 0
+        while True:
+            now = self.clock()
+            due = self.pop_due(now, self.batch_size)
+            if not due:
+                return sent
+            if self.store is not None:
+                self.store.set_many([(user_id, REMINDER_KEY, None) for user_id, _, _ in due])
+            deliver = [(user_id, message) for user_id, message, fire_at in due if now - fire_at <= self.max_lateness]
+            if self.render is not None and deliver:
+                try:
+                    messages = await self.render(deliver)
+                    deliver = [(user_id, message) for (user_id, _), message in zip(deliver, messages, strict=True)]
+                except Exception:
+                    logger.exception("Failed to render reminders; sending them as scheduled", extra={"stage": "reminder"})
+            results = await asyncio.gather(
+                *(self.send(user_id, message) for user_id, message in deliver), return_exceptions=True
+            )
+            for (user_id, _), result in zip(deliver, results):
+                if isinstance(result, Exception):
+                    self.failed += 1
+                    logger.warning("Failed to send reminder: %s", result, extra={"user_id": user_id, "stage": "reminder"})
+                else:
+                    self.sent += 1
+                    sent += 1
+
+    def load(self) -> int:
+        """Replaces the pending reminders with those in the store. Returns how many were loaded."""
+        if self.store is None:
+            return 0
+        # The store is the source of truth, e.g. after another instance was the leader.
+        self._heap, self._live = [], {}
+        reminders = [
+            (user_id, data[REMINDER_KEY]["at"], data[REMINDER_KEY]["message"])
+            for users in self.store.iter_users([REMINDER_KEY])
+            for user_id, data in users
+            if data[REMINDER_KEY]
+        ]
+        self.schedule_many(reminders, persist=False)
+        return len(reminders)
+
+    async def run(self, max_sleep: float = 60.0) -> None:
+        """
+        Sleeps until the next reminder is due (or a new one is scheduled) and
+        fires it. Never sleeps longer than `max_sleep`, so wall clock changes
+        are noticed.
+        """
+        while True:
+            self._wakeup.clear()
+            next_fire = self.next_fire_time()
+            delay = max_sleep if next_fire is None else min(next_fire - self.clock(), max_sleep)
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except TimeoutError:
+                    pass
+                continue
+            await self.fire_due()
+
+    def start(self) -> None:
+        """Starts firing reminders in a background task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        """Stops firing reminders; pending ones stay scheduled."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
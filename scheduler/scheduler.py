@@ -1,23 +1,114 @@
+import asyncio
+import logging
+from datetime import datetime
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from aiogram import Bot
 
-from .jobs import evening_planning_job
+from bot.retention import RETENTION_STEP_SECONDS
+from bot.user_data import get_storage
+from core.config import Settings, config
+from .digest import MORNING_DIGEST, morning_digest
+from .jobs import (
+    FORECAST_REFRESH_MINUTES,
+    evening_planning_job,
+    maintain_store_job,
+    prefetch_forecasts_job,
+    refresh_nearby_stops_job,
+)
+from .leader import LeaderLease, run_leader_election
+from .reminders import ReminderEngine
+
+logger = logging.getLogger(__name__)
 
 # Initialize the scheduler
-scheduler = AsyncIOScheduler(timezone="Europe/Bratislava")
+scheduler = AsyncIOScheduler(timezone=config.settings.timezone)
+# Morning reminders are one-off per user, so they bypass APScheduler
+reminders: ReminderEngine | None = None
+
+def setup_reminders(bot: Bot) -> ReminderEngine:
+    """
+    Creates the reminder engine on first use, restores the pending
+    reminders from the user data store and starts firing them.
+    """
+    global reminders
+    if reminders is None:
+        # Reminders are turned into the morning digest when they fire
+        render = morning_digest.render if MORNING_DIGEST else None
+        reminders = ReminderEngine(bot.send_message, store=get_storage(), render=render)
+    loaded = reminders.load()
+    reminders.start()
+    logger.info("Reminder engine started with %d pending reminders", loaded)
+    return reminders
+
+def _reschedule_daily_jobs(settings: Settings) -> None:
+    """Moves the daily jobs to a new evening plan time or time zone."""
+    if scheduler.get_job('evening_planning') is None:
+        return
+    hour, minute = settings.evening_plan_hour_minute
+    scheduler.reschedule_job('evening_planning', trigger=CronTrigger(hour=hour, minute=minute, timezone=settings.tzinfo))
+    scheduler.reschedule_job('refresh_nearby_stops', trigger=CronTrigger(hour=4, minute=0, timezone=settings.tzinfo))
+    logger.info("Evening planning rescheduled to %s %s", settings.evening_plan_time, settings.timezone)
+
+config.subscribe(_reschedule_daily_jobs)
 
 def setup_scheduler(bot: Bot):
     """
     Adds jobs to the scheduler and starts it.
     """
+    hour, minute = config.settings.evening_plan_hour_minute
     scheduler.add_job(
         evening_planning_job,
         trigger='cron',
-        hour=20,  # 8 PM
+        hour=hour,  # 8 PM by default
+        minute=minute,
+        id='evening_planning',
+        kwargs={'bot': bot, 'reminders': setup_reminders(bot)}
+    )
+    scheduler.add_job(
+        refresh_nearby_stops_job,
+        trigger='cron',
+        hour=4,  # Before anyone needs their morning route
         minute=0,
-        kwargs={'bot': bot, 'scheduler': scheduler} # Pass scheduler to the job
+        id='refresh_nearby_stops',
+    )
+    scheduler.add_job(
+        prefetch_forecasts_job,
+        trigger='interval',
+        minutes=FORECAST_REFRESH_MINUTES,
+        next_run_time=datetime.now(scheduler.timezone),  # Fill the cache right away
+    )
+    scheduler.add_job(
+        maintain_store_job,
+        trigger='interval',
+        seconds=RETENTION_STEP_SECONDS,  # One small slice of users at a time
     )
 
-    print("Starting scheduler with evening job...")
+    logger.info("Starting scheduler with evening job")
     scheduler.start()
-    print("Scheduler started.")
+    logger.info("Scheduler started")
+
+
+def setup_scheduler_with_leader_election(bot: Bot, lease: LeaderLease) -> asyncio.Task:
+    """
+    Runs the scheduler only while this instance holds `lease`, so that
+    scheduled jobs fire once even when several bot instances are running.
+
+    Returns:
+        The background election task; cancel it to step down.
+    """
+    def on_elected():
+        if scheduler.running:
+            scheduler.resume()
+            setup_reminders(bot)
+        else:
+            setup_scheduler(bot)
+
+    def on_lost():
+        if scheduler.running:
+            scheduler.pause()
+        if reminders is not None:
+            reminders.stop()
+
+    return asyncio.create_task(run_leader_election(lease, on_elected, on_lost))
@@ -1,10 +1,12 @@
 import pytest
+from dataclasses import replace
 from unittest.mock import AsyncMock, patch, MagicMock
 
 from aiogram.types import Message, User, Chat, CallbackQuery, InlineKeyboardMarkup
 
-from bot.handlers import command_start_handler, command_help_handler, message_handler, process_callback_query
+from bot.handlers import command_start_handler, command_help_handler, command_set_home, message_handler, process_callback_query
 from bot.keyboards import create_main_menu_keyboard
+from core.config import config
 
 # Helper to create a mock message
 def create_mock_message(text: str) -> MagicMock:
@@ -19,6 +21,7 @@ def create_mock_message(text: str) -> MagicMock:
 def create_mock_callback_query(data: str) -> MagicMock:
     mock_callback_query = MagicMock(spec=CallbackQuery)
     mock_callback_query.data = data
+    mock_callback_query.from_user = User(id=123, is_bot=False, first_name="Test", last_name="User")
     mock_callback_query.message = create_mock_message("")
     mock_callback_query.answer = AsyncMock()
     mock_callback_query.message.edit_text = AsyncMock()
@@ -69,11 +72,12 @@ async def test_message_handler_weather_intent(mock_handle_weather, mock_detect_i
     mock_message.answer.assert_called_once_with("Weather in Berlin is sunny.")
 
 @pytest.mark.asyncio
+@patch('bot.handlers.long_term_memory.remember', new_callable=AsyncMock)
 @patch('bot.handlers.add_to_user_history')
 @patch('bot.handlers.get_user_history')
 @patch('bot.handlers.get_conversational_response', new_callable=AsyncMock)
 @patch('bot.handlers.detect_intent', new_callable=AsyncMock)
-async def test_message_handler_unknown_intent(mock_detect_intent, mock_get_conv_response, mock_get_history, mock_add_history):
+async def test_message_handler_unknown_intent(mock_detect_intent, mock_get_conv_response, mock_get_history, mock_add_history, mock_remember):
     """
     Tests the message handler with an 'unknown' intent, which should trigger the conversational fallback.
     """
@@ -93,24 +97,64 @@ async def test_message_handler_unknown_intent(mock_detect_intent, mock_get_conv_
     # Assertions
     mock_detect_intent.assert_called_once_with(user_text)
     mock_get_history.assert_called_once_with(user_id)
-    mock_get_conv_response.assert_called_once_with(user_text, []) # Called with empty history
+    mock_get_conv_response.assert_called_once_with(user_text, [], user_id=user_id) # Called with empty history
     mock_add_history.assert_called_once_with(user_id, user_text, bot_response)
     mock_message.answer.assert_called_once_with(bot_response)
+    mock_remember.assert_called_once_with(user_id, user_text, bot_response)
 
 @pytest.mark.asyncio
 async def test_process_callback_query():
     """
-    Tests the callback query handler.
+    Tests the callback query handler for a feature that has no menu yet.
     """
-    mock_callback_query = create_mock_callback_query("feature_weather")
+    mock_callback_query = create_mock_callback_query("feature_calendar")
 
     await process_callback_query(mock_callback_query)
 
     mock_callback_query.answer.assert_called_once()
-    mock_callback_query.message.edit_text.assert_called_once_with(
-        "Вы выбрали: feature_weather. Эта функция скоро появится!"
+    assert mock_callback_query.message.edit_text.call_args[0][0] == (
+        "Вы выбрали: feature_calendar. Эта функция скоро появится!"
     )
 
+@pytest.mark.asyncio
+@patch('bot.handlers.detect_intent', new_callable=AsyncMock)
+@patch('bot.menu.get_weather', new_callable=AsyncMock)
+@patch('bot.menu.get_user_data')
+async def test_weather_menu_uses_saved_city_without_llm(mock_get_user_data, mock_get_weather, mock_detect_intent):
+    """
+    Tests that the weather menu offers the saved city and its button fetches the weather directly.
+    """
+    mock_get_user_data.return_value = "Bratislava"
+    mock_get_weather.return_value = "Погода в городе Bratislava: ясно."
+
+    mock_callback_query = create_mock_callback_query("feature_weather")
+    await process_callback_query(mock_callback_query)
+    keyboard = mock_callback_query.message.edit_text.call_args[1]['reply_markup']
+    assert keyboard.inline_keyboard[0][0].callback_data == "weather_saved"
+    assert "Bratislava" in keyboard.inline_keyboard[0][0].text
+
+    mock_callback_query = create_mock_callback_query("weather_saved")
+    await process_callback_query(mock_callback_query)
+    mock_get_weather.assert_awaited_once_with("Bratislava")
+    assert mock_callback_query.message.edit_text.call_args[0][0] == "Погода в городе Bratislava: ясно."
+    mock_detect_intent.assert_not_called()
+
+@pytest.mark.asyncio
+@patch('bot.menu.get_news', new_callable=AsyncMock)
+async def test_news_menu_categories(mock_get_news):
+    """
+    Tests that the news menu lists categories and each one fetches its news.
+    """
+    mock_get_news.return_value = "Новости технологий"
+    mock_callback_query = create_mock_callback_query("feature_news")
+    await process_callback_query(mock_callback_query)
+    keyboard = mock_callback_query.message.edit_text.call_args[1]['reply_markup']
+    assert [button.callback_data for button in keyboard.inline_keyboard[0]] == ["news_world", "news_technology"]
+
+    mock_callback_query = create_mock_callback_query("news_technology")
+    await process_callback_query(mock_callback_query)
+    mock_get_news.assert_awaited_once_with("technology")
+
 def test_create_main_menu_keyboard():
     """
     Tests the creation of the main menu keyboard.
@@ -121,3 +165,123 @@ def test_create_main_menu_keyboard():
     assert len(keyboard.inline_keyboard[0]) == 2 # 2 buttons in first row
     assert keyboard.inline_keyboard[0][0].text == "🌦️ Weather"
     assert keyboard.inline_keyboard[0][0].callback_data == "feature_weather"
+
+@pytest.mark.asyncio
+@patch('bot.handlers.update_user_data')
+@patch('bot.handlers.get_stop_index')
+async def test_command_set_home_resolves_stop(mock_get_stop_index, mock_update_user_data):
+    """
+    Tests that /set_home stores the canonical stop name and ID for a misspelled stop.
+    """
+    from apis.stop_index import StopIndex
+    mock_get_stop_index.return_value = StopIndex([("ZO", "Zochova"), ("PA", "Patrónka")])
+    mock_message = create_mock_message("/set_home Hlavná 1 | zochva")
+
+    await command_set_home(mock_message)
+
+    mock_update_user_data.assert_called_once_with(
+        123, 'home_location', {"address": "Hlavná 1", "stop": "Zochova", "stop_id": "ZO"}
+    )
+
+@pytest.mark.asyncio
+@patch('bot.handlers.update_user_data')
+@patch('bot.handlers.get_stop_index')
+async def test_command_set_home_unknown_stop(mock_get_stop_index, mock_update_user_data):
+    """
+    Tests that /set_home rejects an unknown stop and offers suggestions.
+    """
+    from apis.stop_index import StopIndex
+    mock_get_stop_index.return_value = StopIndex([("MN", "Mlynské nivy"), ("MD", "Mlynská dolina")])
+    mock_message = create_mock_message("/set_home Hlavná 1 | mlyn")
+
+    await command_set_home(mock_message)
+
+    mock_update_user_data.assert_not_called()
+    reply = mock_message.answer.call_args[0][0]
+    assert "Не удалось найти остановку «mlyn»" in reply
+    assert "Mlynská dolina, Mlynské nivy" in reply
+
+@pytest.mark.asyncio
+@patch('bot.handlers.update_user_data')
+@patch('features.nearby_stops.get_geocoder')
+@patch('features.nearby_stops.get_stop_locator')
+async def test_command_set_home_picks_nearest_stop(mock_get_stop_locator, mock_get_geocoder, mock_update_user_data):
+    """
+    Tests that /set_home without a stop geocodes the address and saves the nearest stop.
+    """
+    from apis.geocoder import StubGeocoder
+    from apis.stop_locator import StopLocator
+    mock_get_stop_locator.return_value = StopLocator(["ZO", "PA"], ["Zochova", "Patrónka"], [48.1457, 48.1657], [17.1045, 17.0729])
+    mock_get_geocoder.return_value = StubGeocoder({"Hlavná 1": (48.1450, 17.1050)})
+    mock_message = create_mock_message("/set_home Hlavná 1")
+
+    await command_set_home(mock_message)
+
+    saved = mock_update_user_data.call_args[0][2]
+    assert saved["stop"] == "Zochova"
+    assert saved["stop_id"] == "ZO"
+    assert saved["stop_source"] == "nearest"
+    assert (saved["lat"], saved["lon"]) == (48.1450, 17.1050)
+    assert "Ближайшая остановка: Zochova" in mock_message.answer.call_args[0][0]
+
+@pytest.mark.asyncio
+@patch('bot.handlers.detect_intent', new_callable=AsyncMock)
+@patch('bot.handlers.handle_news_intent')
+@patch('bot.handlers.handle_weather_intent')
+async def test_message_handler_runs_several_intents_concurrently(mock_handle_weather, mock_handle_news, mock_detect_intent):
+    """
+    Tests that a message with several intents gets one reply with all parts, fetched concurrently.
+    """
+    import asyncio
+    running = []
+
+    def slow_reply(reply):
+        async def reply_later(message, entities):
+            running.append(reply)
+            await asyncio.sleep(0.05)
+            return reply
+        return reply_later
+
+    mock_detect_intent.return_value = {"intents": [
+        {"intent": "weather", "entities": {}},
+        {"intent": "news", "entities": {"category": "world"}},
+    ]}
+    mock_handle_weather.side_effect = slow_reply("Солнечно.")
+    mock_handle_news.side_effect = slow_reply("Новости.")
+    mock_message = create_mock_message("Какая погода и что нового в мире?")
+
+    started = asyncio.get_running_loop().time()
+    await message_handler(mock_message)
+
+    assert asyncio.get_running_loop().time() - started < 0.09
+    assert running == ["Солнечно.", "Новости."]
+    mock_handle_news.assert_called_once_with(mock_message, {"category": "world"})
+    mock_message.answer.assert_called_once_with("Солнечно.\n\nНовости.")
+
+@pytest.mark.asyncio
+@patch('bot.handlers.detect_intent', new_callable=AsyncMock)
+@patch('bot.handlers.handle_news_intent')
+@patch('bot.handlers.handle_set_city_intent', new_callable=AsyncMock)
+@patch.object(config, 'settings', replace(config.settings, tool_timeout_seconds=0.05))
+async def test_message_handler_sends_partial_results_on_timeout(mock_handle_set_city, mock_handle_news, mock_detect_intent):
+    """
+    Tests that a slow tool is cut off by the timeout while the other parts are still answered.
+    """
+    import asyncio
+
+    async def hang(message, entities):
+        await asyncio.sleep(10)
+
+    mock_detect_intent.return_value = {"intents": [
+        {"intent": "news", "entities": {}},
+        {"intent": "set_city", "entities": {"location": "Košice"}},
+    ]}
+    mock_handle_news.side_effect = hang
+    mock_handle_set_city.return_value = "Город сохранен."
+    mock_message = create_mock_message("Запомни Košice и покажи новости")
+
+    await message_handler(mock_message)
+
+    reply = mock_message.answer.call_args[0][0]
+    assert reply.startswith("⏳")
+    assert reply.endswith("Город сохранен.")
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from core.config import Config, ConfigError, Settings
+
+def test_file_overrides_environment_overrides_defaults():
+    settings = Settings.load(
+        {"news_page_size": 8, "evening_plan_time": "21:30"},
+        {"NEWS_PAGE_SIZE": "3", "TOOL_TIMEOUT_SECONDS": "2.5"},
+    )
+    assert settings.news_page_size == 8
+    assert settings.tool_timeout_seconds == 2.5
+    assert settings.max_history_length == Settings().max_history_length
+    assert settings.evening_plan_hour_minute == (21, 30)
+
+@pytest.mark.parametrize("values, problem", [
+    ({"news_page_size": 0}, "news_page_size = 0: must be at least 1"),
+    ({"news_page_size": 500}, "must be at most 100"),
+    ({"llm_max_concurrency": 2.5}, "expected int"),
+    ({"max_history_length": "many"}, "invalid literal"),
+    ({"evening_plan_time": "25:00"}, "expected HH:MM"),
+    ({"timezone": "Europe/Atlantis"}, "unknown time zone"),
+    ({"gemini_modle": "models/x"}, "gemini_modle: unknown setting"),
+])
+def test_invalid_values_are_rejected(values, problem):
+    with pytest.raises(ConfigError, match=problem):
+        Settings.load(values, {})
+
+def test_reload_applies_a_valid_file_and_keeps_settings_on_errors(tmp_path):
+    """
+    Tests that an edited file changes the settings and notifies the
+    listeners, while a file with an error is rejected as a whole.
+    """
+    path = tmp_path / "config.toml"
+    path.write_text('news_page_size = 5\n')
+    config = Config(str(path), environ={})
+    notified = []
+    config.subscribe(notified.append)
+
+    path.write_text('news_page_size = 7\nllm_max_concurrency = 2\n')
+    os.utime(path, (1, 1))
+    assert config.reload_if_changed() == ["llm_max_concurrency", "news_page_size"]
+    assert (config.settings.news_page_size, config.settings.llm_max_concurrency) == (7, 2)
+    assert notified == [config.settings]
+    assert config.reload_if_changed() == []
+
+    path.write_text('news_page_size = 9\nllm_max_concurrency = 0\n')
+    with pytest.raises(ConfigError, match="llm_max_concurrency"):
+        config.reload()
+    path.write_text('news_page_size = [')
+    os.utime(path, (2, 2))
+    assert config.reload_if_changed() == []
+    assert (config.settings.news_page_size, config.settings.llm_max_concurrency) == (7, 2)
+    assert len(notified) == 1
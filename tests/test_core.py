@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
 
-from core.intent_detector import detect_intent
+from core.intent_detector import detect_intent, intents_of
 
 @pytest.mark.asyncio
 async def test_detect_intent_success():
@@ -60,3 +60,67 @@ async def test_detect_intent_json_error():
 
         assert result['intent'] == 'error'
         assert 'message' in result['entities']
+
+@pytest.mark.asyncio
+async def test_detect_intent_several_intents():
+    """
+    Tests that a list of intents is returned with the first one also at the top level.
+    """
+    mock_response = MagicMock()
+    mock_response.text = ('{"intents": [{"intent": "weather", "entities": {}},'
+                          ' {"intent": "news", "entities": {"category": "world"}}]}')
+
+    with patch('core.intent_detector.model', new_callable=AsyncMock) as mock_model:
+        mock_model.generate_content_async.return_value = mock_response
+        result = await detect_intent("Какая погода и что нового в мире?")
+
+    assert result["intent"] == "weather"
+    assert intents_of(result) == [
+        {"intent": "weather", "entities": {}},
+        {"intent": "news", "entities": {"category": "world"}},
+    ]
+    assert intents_of({"intent": "news", "entities": {"category": "world"}}) == [
+        {"intent": "news", "entities": {"category": "world"}}
+    ]
+
+def test_example_retriever_ranks_similar_examples_first():
+    """
+    Tests that inflected and misspelled messages retrieve examples of the same intent.
+    """
+    from core.example_retriever import ExampleRetriever
+
+    retriever = ExampleRetriever([
+        {"text": "Какая погода в Братиславе?", "intent": "weather"},
+        {"text": "Покажи свежие новости", "intent": "news"},
+        {"text": "Добавь в кладовку гречку", "intent": "pantry_add"},
+    ])
+    assert [e["intent"] for e in retriever.top_k("какая погодa в Кошице", 2)][0] == "weather"
+    assert retriever.top_k("новостей покажи", 1)[0]["intent"] == "news"
+    assert retriever.top_k("anything", 0) == []
+
+def test_build_intent_prompt_uses_top_k_examples():
+    """
+    Tests that the dynamic prompt keeps the instructions and only the k closest examples.
+    """
+    from core.intent_detector import INTENT_INSTRUCTIONS, INTENT_PROMPT, build_intent_prompt
+
+    prompt = build_intent_prompt("Удали молоко из кладовки", k=2)
+    assert prompt.startswith(INTENT_INSTRUCTIONS)
+    assert prompt.count('User: "') == 2
+    assert "pantry_remove" in prompt.split("Here are some examples:")[1]
+    assert build_intent_prompt("Удали молоко из кладовки", k=0) == INTENT_PROMPT
+
+def test_startup_does_not_import_heavy_clients():
+    """
+    Tests that importing the bot's entry modules leaves the slow client libraries unloaded.
+    """
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, bot.handlers, scheduler.scheduler\n"
+        "heavy = ['google.generativeai', 'google_auth_oauthlib', 'googleapiclient', 'bs4', 'numpy']\n"
+        "print([name for name in heavy if name in sys.modules])\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
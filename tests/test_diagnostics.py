@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import CommandObject
+from aiogram.types import Message, Update, User, Chat
+
+from core.diagnostics import LoopLagMonitor, SamplingProfiler, top_allocations
+
+# Helper to create a mock message from an admin
+def create_mock_message(text: str) -> MagicMock:
+    mock_message = MagicMock(spec=Message)
+    mock_message.from_user = User(id=1, is_bot=False, first_name="Admin")
+    mock_message.chat = Chat(id=1, type="private")
+    mock_message.text = text
+    mock_message.answer = AsyncMock()
+    mock_message.answer_document = AsyncMock()
+    return mock_message
+
+def busy_wait(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampling_profiler_collects_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_wait, args=(stop,), name="busy")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.2)
+    collapsed = profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 10
+    busy = [line for line in collapsed.splitlines() if line.startswith("busy;")]
+    assert busy and "test_diagnostics.py:busy_wait" in busy[0]
+    stack, count = busy[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+@pytest.mark.asyncio
+async def test_loop_monitor_reports_lag_and_blocking_callback():
+    """
+    Tests that a callback blocking the loop shows up as lag, as a stall and
+    at the line where the loop was stuck.
+    """
+    monitor = LoopLagMonitor(interval=0.02, stall_threshold=0.1)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+        time.sleep(0.4)  # Blocks the event loop
+        await asyncio.sleep(0.1)
+    finally:
+        monitor.stop()
+
+    stats = monitor.stats()
+    assert stats["samples"] >= 3
+    assert stats["lag_max"] >= 0.3
+    assert stats["stalls"] == 1
+    [location] = monitor.slow_callbacks
+    assert "test_diagnostics.py" in location
+
+def test_top_allocations_starts_tracing_first():
+    assert not tracemalloc.is_tracing()
+    try:
+        assert top_allocations() is None
+        data = [bytearray(1024) for _ in range(1000)]
+        lines = top_allocations(limit=3)
+        assert 1 <= len(lines) <= 3
+        assert "test_diagnostics.py" in lines[0]
+        del data
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.asyncio
+async def test_profile_command_sends_collapsed_stack_file():
+    """
+    Tests that /profile runs until /profile_stop and sends the stacks as a file.
+    """
+    from bot.admin import command_profile, command_profile_stop
+
+    message = create_mock_message("/profile 30")
+    profile = asyncio.create_task(command_profile(message, CommandObject(command="profile", args="30")))
+    await asyncio.sleep(0.2)
+    await command_profile_stop(create_mock_message("/profile_stop"))
+    await asyncio.wait_for(profile, 5)
+
+    message.answer_document.assert_called_once()
+    document = message.answer_document.call_args[0][0]
+    assert document.filename.endswith(".collapsed")
+    assert b"MainThread;" in document.data
+
+@pytest.mark.asyncio
+async def test_admin_commands_are_for_admins_only():
+    """
+    Tests that admin commands of other users fall through to the next router.
+    """
+    from bot.admin import router as admin_router
+
+    received = []
+    fallback = Router()
+
+    @fallback.message()
+    async def record(message: Message) -> None:
+        received.append(message.text)
+
+    dp = Dispatcher()
+    dp.include_routers(admin_router, fallback)
+    update = Update.model_validate({
+        "update_id": 1,
+        "message": {"message_id": 1, "date": 0, "chat": {"id": 5, "type": "private"},
+                    "from": {"id": 5, "is_bot": False, "first_name": "User"}, "text": "/loop_lag"},
+    })
+    try:
+        await dp.feed_update(Bot(token="42:TEST"), update)
+    finally:
+        # A router can only be attached once; detach the shared one again
+        admin_router._parent_router = None
+    assert received == ["/loop_lag"]
@@ -0,0 +1,97 @@
+import asyncio
+import time
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from apis.forecast_cache import CityForecast
+from bot.storage import create_storage
+from scheduler.digest import MorningDigest, SharedCache
+
+EVENT_START = datetime(2026, 10, 20, 9, 0, tzinfo=timezone.utc)
+HOME = {"stop": "Zochova"}
+UNIVERSITY = {"stop": "Mlynské nivy"}
+
+def make_forecast() -> CityForecast:
+    start = int(EVENT_START.timestamp())
+    return CityForecast.from_owm({"city": {"id": 1, "name": "Bratislava"}, "list": [
+        {"dt": start + i * 10800, "main": {"temp": 11.0}, "weather": [{"id": 500, "description": "дождь"}], "pop": 0.9}
+        for i in range(2)
+    ]}, fetched_at=0)
+
+@pytest.fixture
+def store(tmp_path):
+    store = create_storage("json", str(tmp_path / "user_data.json"))
+    for user_id, city in ((1, "Bratislava"), (2, "bratislava"), (3, "Košice")):
+        store.set_many([
+            (user_id, "home_location", HOME), (user_id, "university_location", UNIVERSITY),
+            (user_id, "google_refresh_token", "token"), (user_id, "city", city),
+        ])
+    with patch("scheduler.digest.get_storage", return_value=store):
+        yield store
+
+@pytest.mark.asyncio
+async def test_digest_gathers_parts_concurrently_and_shares_fetches(store):
+    """
+    Tests that each user's parts are fetched at the same time, that a city,
+    category or route needed by several users is fetched once, and that a
+    user without today's event keeps the planned reminder.
+    """
+    async def first_event(user_id, day, token):
+        await asyncio.sleep(0.1)
+        return None if user_id == 3 else {"summary": "Algebra", "start": EVENT_START.isoformat()}
+
+    def slow(value):
+        async def fetch(*args):
+            await asyncio.sleep(0.1)
+            return value
+        return fetch
+
+    digest = MorningDigest(now=lambda: EVENT_START)
+    with patch("scheduler.digest.get_first_event_for_day", side_effect=first_event), \
+         patch("scheduler.digest.plan_departure", side_effect=slow(("08:12", None))) as mock_plan, \
+         patch("scheduler.digest.get_forecast", side_effect=slow(make_forecast())) as mock_forecast, \
+         patch("scheduler.digest.fetch_headlines", side_effect=slow([{"title": "Headline"}])) as mock_news, \
+         patch.dict("os.environ", {"NEWS_API_KEY": "test_key"}):
+        started = time.perf_counter()
+        digests = await digest.render([(1, "planned 1"), (2, "planned 2"), (3, "planned 3")])
+        elapsed = time.perf_counter() - started
+
+    # Calendar, then route, alongside weather and news: two fetch delays, not five per user
+    assert elapsed < 0.4
+    assert digests[0] == digests[1] == (
+        "Доброе утро! Ваш день:\n"
+        "- Первая пара: 'Algebra' в 09:00.\n"
+        "- Выезжайте не позднее 08:12.\n"
+        "- Погода в 09:00: дождь, 11°C, возьмите зонт.\n"
+        "- Главные новости:\n"
+        "  • Headline"
+    )
+    assert digests[2].startswith("planned 3\n- Погода")
+    assert mock_forecast.call_count == 2 and mock_news.call_count == 1 and mock_plan.call_count == 1
+    assert digest.cache.sharing() == {"weather": 1.5, "news": 3.0, "route": 2.0}
+    assert len(digest.latencies) == 3
+
+@pytest.mark.asyncio
+async def test_digest_goes_out_without_a_late_part(store):
+    async def hang(*args):
+        await asyncio.Event().wait()
+
+    digest = MorningDigest(timeout=0.05, now=lambda: EVENT_START)
+    with patch("scheduler.digest.get_first_event_for_day", side_effect=hang), \
+         patch("scheduler.digest.get_forecast", new_callable=AsyncMock, return_value=None), \
+         patch.dict("os.environ", {"NEWS_API_KEY": ""}):
+        assert await digest.render([(1, "planned")]) == ["planned"]
+
+@pytest.mark.asyncio
+async def test_shared_cache_retries_failed_fetches_and_expires():
+    now = [0.0]
+    cache = SharedCache(ttl=60, clock=lambda: now[0])
+    fetch = AsyncMock(side_effect=[RuntimeError("down"), "ok", "fresh"])
+    with pytest.raises(RuntimeError):
+        await cache.get("weather", "bratislava", fetch)
+    assert await cache.get("weather", "bratislava", fetch) == "ok"
+    assert await cache.get("weather", "bratislava", fetch) == "ok"
+    now[0] = 61
+    assert await cache.get("weather", "bratislava", fetch) == "fresh"
+    assert cache.fetches["weather"] == 3 and cache.requests["weather"] == 4
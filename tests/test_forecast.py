@@ -0,0 +1,127 @@
+import os
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aiogram.types import Chat, Message, User
+
+from apis.forecast_cache import CityForecast, ForecastCache
+from features.weather_feature import format_forecast, handle_weather_intent, parse_forecast_time
+
+START = 1_760_000_400  # A forecast slot, UTC
+CITIES = {"bratislava": 3060972, "košice": 724443}
+
+def make_forecast_response(city: str, city_id: int) -> dict:
+    slots = []
+    for i in range(8):
+        rainy = i == 2
+        slots.append({
+            "dt": START + i * 10800,
+            "main": {"temp": 10.0 + i},
+            "weather": [{"id": 500 if rainy else 800, "description": "небольшой дождь" if rainy else "ясно"}],
+            "pop": 0.8 if rainy else 0.0,
+            **({"rain": {"3h": 1.2}} if rainy else {}),
+        })
+    return {"city": {"id": city_id, "name": city.title(), "timezone": 7200}, "list": slots}
+
+# Helper to run a stub OpenWeatherMap with the forecast and group endpoints
+async def start_owm_stub() -> tuple[TestServer, list]:
+    requests = []
+
+    async def forecast(request: web.Request) -> web.Response:
+        requests.append(("forecast", request.query["q"]))
+        city = request.query["q"].casefold()
+        return web.json_response(make_forecast_response(city, CITIES[city]))
+
+    async def group(request: web.Request) -> web.Response:
+        requests.append(("group", request.query["id"]))
+        return web.json_response({"list": [
+            {"id": int(city_id), "weather": [{"description": "облачно"}], "main": {"temp": 12.5}}
+            for city_id in request.query["id"].split(",")
+        ]})
+
+    app = web.Application()
+    app.router.add_get("/forecast", forecast)
+    app.router.add_get("/group", group)
+    server = TestServer(app)
+    await server.start_server()
+    return server, requests
+
+# Helper to create a mock message object
+def create_mock_message(text: str) -> MagicMock:
+    mock_message = MagicMock(spec=Message)
+    mock_message.from_user = User(id=123, is_bot=False, first_name="Test")
+    mock_message.chat = Chat(id=456, type="private")
+    mock_message.text = text
+    return mock_message
+
+def test_parse_forecast_time():
+    now = datetime(2026, 10, 19, 10, 30)
+    assert parse_forecast_time("Пойдёт ли дождь в 8 утра?", now) == datetime(2026, 10, 20, 8, 0)
+    assert parse_forecast_time("will it rain at 6pm tomorrow", now) == datetime(2026, 10, 20, 18, 0)
+    assert parse_forecast_time("погода в 19:30", now) == datetime(2026, 10, 19, 19, 30)
+    assert parse_forecast_time("какая погода вечером", now) == datetime(2026, 10, 19, 19, 0)
+    assert parse_forecast_time("погода завтра", now) == datetime(2026, 10, 20, 12, 0)
+    assert parse_forecast_time("погода в Москве", now) is None
+    assert parse_forecast_time("погода на 14.10", now) is None
+
+def test_city_forecast_columns_round_trip():
+    forecast = CityForecast.from_owm(make_forecast_response("bratislava", 1), fetched_at=0)
+    assert len(forecast) == 8 and forecast.step == 10800
+    assert forecast.labels == ["ясно", "небольшой дождь"]
+    slot = forecast.at(START + 2 * 10800 + 3000)  # Nearest slot
+    assert slot["wet"] and slot["pop"] == pytest.approx(0.8) and slot["temp"] == 12.0
+    assert forecast.at(START - 10800) is None
+    assert CityForecast.from_json(forecast.to_json()).at(START + 2 * 10800) == slot
+
+@pytest.mark.asyncio
+async def test_prefetch_deduplicates_cities_and_batches_current_conditions(tmp_path):
+    """
+    Tests that each distinct city is fetched once, that current conditions
+    come in one group request, and that weather questions are then answered
+    from the cache, also in another process.
+    """
+    from apis import weather
+
+    server, requests = await start_owm_stub()
+    cache = ForecastCache(str(tmp_path / "forecast_cache.json"), clock=lambda: START)
+    try:
+        with patch.dict(os.environ, {"OPENWEATHER_API_KEY": "test_key"}), \
+             patch("apis.weather.FORECAST_URL", str(server.make_url("/forecast"))), \
+             patch("apis.weather.GROUP_URL", str(server.make_url("/group"))), \
+             patch("apis.weather.forecast_cache", cache):
+            calls = await weather.prefetch_forecasts(["Bratislava", "bratislava ", "Košice", "Bratislava"])
+            assert calls == 3
+            assert sorted(requests) == [("forecast", "Bratislava"), ("forecast", "Košice"), ("group", "3060972,724443")]
+
+            with patch("aiohttp.ClientSession.get") as mock_get:
+                assert await weather.get_weather("Košice") == "Погода в городе Košice: Облачно. Температура: 12.5°C."
+                assert (await weather.get_forecast("BRATISLAVA")).city_id == 3060972
+            mock_get.assert_not_called()
+    finally:
+        await server.close()
+
+    other_process = ForecastCache(str(tmp_path / "forecast_cache.json"), clock=lambda: START)
+    assert other_process.get_current("Bratislava") == ("облачно", 12.5)
+    assert other_process.get_forecast("Košice").at(START)["temp"] == 10.0
+    assert cache.upstream_calls() == 3
+
+@pytest.mark.asyncio
+async def test_rain_question_is_answered_from_forecast():
+    forecast = CityForecast.from_owm(make_forecast_response("bratislava", 1), fetched_at=0)
+    # The rainy slot, in the city's local time (UTC+2)
+    rainy_local = datetime.fromtimestamp(START + 2 * 10800 + 7200, tz=timezone.utc)
+    now = START - 3600
+    text = f"Будет дождь в {rainy_local:%H:%M}?"
+
+    answer = format_forecast("Bratislava", forecast, text, now=now)
+    assert "небольшой дождь" in answer and "80%" in answer and "зонт" in answer
+
+    with patch("features.weather_feature.get_forecast", new_callable=AsyncMock, return_value=forecast) as mock_get_forecast, \
+         patch("features.weather_feature.get_weather", new_callable=AsyncMock) as mock_get_weather:
+        reply = await handle_weather_intent(create_mock_message("Пойдёт ли дождь в 8 утра?"), {"location": "Bratislava"})
+    mock_get_forecast.assert_called_once_with("Bratislava")
+    mock_get_weather.assert_not_called()
+    assert reply.startswith("Прогноз для города Bratislava")
@@ -0,0 +1,56 @@
+import os
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from apis.gtfs import load_timetable, find_latest_departure_offline
+
+GTFS_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "gtfs")
+
+@pytest.fixture(scope="module")
+def timetable():
+    return load_timetable(GTFS_FIXTURE)
+
+def test_latest_departure_with_transfer(timetable):
+    """
+    Tests a weekday journey that needs a transfer at Zochova.
+    """
+    departure = timetable.latest_departure(
+        timetable.stops_named("Hlavná stanica"),
+        timetable.stops_named("Botanická záhrada"),
+        datetime(2026, 10, 20, 8, 0),  # Tuesday
+    )
+    assert departure == datetime(2026, 10, 20, 7, 45)
+
+def test_latest_departure_uses_service_calendar(timetable):
+    """
+    Tests that weekend and holiday services are used on the right days.
+    """
+    origins = timetable.stops_named("Hlavná stanica")
+    destinations = timetable.stops_named("Botanická záhrada")
+
+    # Saturday and Christmas Day (a weekday run on the weekend timetable) run every 30 minutes
+    assert timetable.latest_departure(origins, destinations, datetime(2026, 10, 24, 8, 0)) == datetime(2026, 10, 24, 7, 30)
+    assert timetable.latest_departure(origins, destinations, datetime(2026, 12, 25, 8, 0)) == datetime(2026, 12, 25, 7, 30)
+
+def test_latest_departure_no_connection(timetable):
+    """
+    Tests that None is returned when nothing arrives in time or a stop is unknown.
+    """
+    assert timetable.latest_departure(
+        timetable.stops_named("Hlavná stanica"),
+        timetable.stops_named("Botanická záhrada"),
+        datetime(2026, 10, 20, 5, 5),
+    ) is None
+    assert timetable.latest_departure([], timetable.stops_named("Zochova"), datetime(2026, 10, 20, 8, 0)) is None
+
+def test_find_latest_departure_offline(timetable):
+    """
+    Tests the name-based lookup used by the evening planning job.
+    """
+    with patch('apis.gtfs.get_timetable', return_value=timetable):
+        assert find_latest_departure_offline("hlavná stanica", "Mlynské nivy", datetime(2026, 10, 20, 9, 0)) == "08:45"
+        assert find_latest_departure_offline("Nowhere", "Mlynské nivy", datetime(2026, 10, 20, 9, 0)) is None
+
+    with patch('apis.gtfs.get_timetable', return_value=None):
+        assert find_latest_departure_offline("Zochova", "Mlynské nivy", datetime(2026, 10, 20, 9, 0)) is None
@@ -0,0 +1,66 @@
+import sys
+import pytest
+from unittest.mock import patch
+
+from bot.history import CODEC_NONE, CODEC_ZLIB, History, Turn, as_gemini
+from bot.storage import JsonFileStorage
+
+def make_history(turns: int, text: str = "Какая погода в Bratislave? ☀️") -> History:
+    history = History()
+    for i in range(turns):
+        history.append("user" if i % 2 == 0 else "model", f"{text} #{i}")
+    return history
+
+def test_history_round_trips_through_encoding():
+    """
+    Tests that histories survive encoding, small ones uncompressed and large ones compressed.
+    """
+    small = History([Turn("user", "Ahoj"), Turn("model", ""), Turn("user", "x" * 200)])
+    data = small.encode(compression="zlib", threshold=512)
+    assert data[0] & 0x0F == CODEC_NONE
+    assert History.decode(data) == small
+
+    large = make_history(40)
+    data = large.encode(compression="zlib", threshold=512)
+    assert data[0] & 0x0F == CODEC_ZLIB
+    assert len(data) < len(large.encode(compression="none")) / 3
+    assert History.decode(data) == large
+    assert History.loads(large.dumps()) == large
+
+def test_history_zstd_compression():
+    pytest.importorskip("zstandard")
+    history = make_history(40)
+    assert History.decode(history.encode(compression="zstd", threshold=0)) == history
+
+def test_history_reads_legacy_lists_and_converts_lazily():
+    legacy = [{"role": "user", "parts": ["Привет"]}, {"role": "model", "parts": ["Здравствуйте!"]}]
+    history = History.loads(legacy)
+    assert history[0] == Turn("user", "Привет")
+    assert history.to_gemini() == legacy
+    assert as_gemini(history[-1:]) == legacy[-1:]
+    assert as_gemini(legacy) == legacy
+    assert len(History.loads(None)) == 0
+
+def test_history_roles_are_interned():
+    history = History.decode(make_history(4).encode())
+    assert history[0].role is history[2].role is sys.intern("user")
+
+def test_add_to_user_history_trims_and_stores_compactly(tmp_path):
+    """
+    Tests that the stored history is encoded text holding the last max_history_length turns.
+    """
+    from bot.user_data import add_to_user_history, get_user_history
+    from core.config import config
+
+    MAX_HISTORY_LENGTH = config.settings.max_history_length
+    store = JsonFileStorage(str(tmp_path / "user_data.json"))
+    store.set(1, "history", [{"role": "user", "parts": ["старое"]}, {"role": "model", "parts": ["ответ"]}])
+    with patch("bot.user_data.get_storage", return_value=store):
+        for i in range(MAX_HISTORY_LENGTH):
+            add_to_user_history(1, f"вопрос {i}", f"ответ {i}")
+        history = get_user_history(1)
+
+    assert isinstance(store.get(1, "history"), str)
+    assert len(history) == MAX_HISTORY_LENGTH
+    assert history.to_gemini()[-2:] == [{"role": "user", "parts": [f"вопрос {MAX_HISTORY_LENGTH - 1}"]},
+                                        {"role": "model", "parts": [f"ответ {MAX_HISTORY_LENGTH - 1}"]}]
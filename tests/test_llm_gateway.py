@@ -0,0 +1,158 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from core.llm_gateway import LLMGateway, LLMUnavailableError, INTERACTIVE, BACKGROUND
+from core.resilience import CircuitBreaker
+
+class FakeAPIError(Exception):
+    """Mimics google.api_core exceptions, which carry the HTTP status in `code`."""
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+@pytest.fixture(autouse=True)
+def no_backoff():
+    with patch('core.llm_gateway.backoff_delay', return_value=0):
+        yield
+
+@pytest.mark.asyncio
+async def test_gateway_retries_rate_limit_errors():
+    """
+    Tests that 429 and 5xx errors are retried until the call succeeds.
+    """
+    gateway = LLMGateway()
+    request = AsyncMock(side_effect=[FakeAPIError(429), FakeAPIError(503), "ok"])
+
+    result = await gateway.call(request, "prompt")
+
+    assert result == "ok"
+    assert request.call_count == 3
+    assert gateway.metrics()["retries"] == 2
+    assert gateway.metrics()["rate_limited"] == 1
+
+@pytest.mark.asyncio
+async def test_gateway_does_not_retry_other_errors():
+    """
+    Tests that non-transient errors are raised immediately.
+    """
+    gateway = LLMGateway()
+    request = AsyncMock(side_effect=FakeAPIError(400))
+
+    with pytest.raises(FakeAPIError):
+        await gateway.call(request, "prompt")
+    assert request.call_count == 1
+
+@pytest.mark.asyncio
+async def test_gateway_serves_cached_fallback_when_circuit_opens():
+    """
+    Tests that after repeated failures the circuit opens and cached answers are served.
+    """
+    gateway = LLMGateway(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    assert await gateway.call(AsyncMock(return_value="cached"), "prompt", cache_key="k") == "cached"
+
+    failing = AsyncMock(side_effect=FakeAPIError(500))
+    assert await gateway.call(failing, "prompt", cache_key="k") == "cached"
+    with pytest.raises(LLMUnavailableError):
+        await gateway.call(failing, "prompt", cache_key="other")
+
+    # The circuit is open now: requests fail fast without reaching the model
+    assert await gateway.call(failing, "prompt", cache_key="k") == "cached"
+    assert failing.call_count == 2
+    metrics = gateway.metrics()
+    assert metrics["circuit"] == "open"
+    assert metrics["circuit_rejections"] == 1
+    assert metrics["fallbacks_served"] == 2
+
+@pytest.mark.asyncio
+async def test_gateway_limits_concurrency_and_prefers_interactive():
+    """
+    Tests the concurrency limit and that waiting interactive requests go before background ones.
+    """
+    gateway = LLMGateway(max_concurrency=1)
+    release = asyncio.Event()
+    order = []
+
+    async def blocker():
+        await release.wait()
+        return "first"
+
+    def tracked(name):
+        async def request():
+            order.append(name)
+            return name
+        return request
+
+    first = asyncio.create_task(gateway.call(blocker, "prompt"))
+    await asyncio.sleep(0)
+    background = asyncio.create_task(gateway.call(tracked("background"), "prompt", priority=BACKGROUND))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(gateway.call(tracked("interactive"), "prompt", priority=INTERACTIVE))
+    await asyncio.sleep(0)
+
+    assert gateway.metrics()["queued"] == 2
+    release.set()
+    await asyncio.gather(first, background, interactive)
+
+    assert order == ["interactive", "background"]
+    assert gateway.metrics()["queue_wait_max"] > 0
+
+@pytest.mark.asyncio
+async def test_gateway_concurrency_can_be_changed_while_calls_wait():
+    """
+    Tests that raising the limit starts queued calls and lowering it lets
+    the running calls finish before new ones start.
+    """
+    gateway = LLMGateway(max_concurrency=1)
+    release = asyncio.Event()
+
+    async def blocker():
+        await release.wait()
+        return "done"
+
+    calls = [asyncio.create_task(gateway.call(blocker, "prompt")) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert (gateway.metrics()["in_flight"], gateway.metrics()["queued"]) == (1, 2)
+
+    gateway.set_max_concurrency(3)
+    await asyncio.sleep(0)
+    assert (gateway.metrics()["in_flight"], gateway.metrics()["queued"]) == (3, 0)
+
+    gateway.set_max_concurrency(1)
+    late = asyncio.create_task(gateway.call(blocker, "prompt"))
+    await asyncio.sleep(0)
+    assert (gateway.metrics()["in_flight"], gateway.metrics()["queued"]) == (3, 1)
+
+    release.set()
+    assert await asyncio.gather(*calls, late) == ["done"] * 4
+
+@pytest.mark.asyncio
+async def test_gateway_send_message_uses_chat():
+    """
+    Tests the chat helper forwards the message to the chat session.
+    """
+    gateway = LLMGateway()
+    chat = MagicMock()
+    chat.history = [{"role": "user", "parts": ["hi"]}]
+    chat.send_message_async = AsyncMock(return_value="reply")
+
+    assert await gateway.send_message(chat, "hello") == "reply"
+    chat.send_message_async.assert_called_once_with("hello")
+
+def test_circuit_breaker_half_open_allows_single_trial():
+    """
+    Tests that an open circuit lets one trial request through after the timeout.
+    """
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    now[0] = 11
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from core.llm_gateway import LLMGateway
+from core.load_policy import AdaptiveLoadPolicy, NORMAL, DEGRADED, SHEDDING
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_policy(clock):
+    return AdaptiveLoadPolicy(queue_wait_slo=1.0, latency_slo=2.0, window=60, min_samples=3,
+                              recover_after=30, clock=clock)
+
+
+def test_policy_degrades_under_overload_and_recovers_gradually():
+    """
+    Tests that slow Gemini responses degrade service at once, and that it
+    recovers one level at a time once latencies stay low.
+    """
+    clock = FakeClock()
+    policy = make_policy(clock)
+    assert policy.level == NORMAL
+    assert policy.model_tier() == "primary"
+    assert policy.history_limit(10) == 10
+    assert policy.examples_limit(4) == 4
+    assert policy.memories_limit(3) == 3
+
+    for _ in range(5):
+        policy.record_latency(3.0)  # 1.5x the SLO
+    assert policy.level == DEGRADED
+    assert policy.model_tier() == "fast"
+    assert policy.history_limit(10) == 4
+    assert policy.examples_limit(4) == 2
+    assert policy.memories_limit(3) == 0
+    assert policy.prefer_cache()
+    assert not policy.shed_conversation()
+
+    for _ in range(5):
+        policy.record_queue_wait(5.0)  # 5x the SLO
+    assert policy.level == SHEDDING
+    assert policy.shed_conversation()
+    assert policy.history_limit(10) == 0
+
+    # The overload passes: old samples leave the window, new ones are fast
+    clock.now = 61
+    for _ in range(5):
+        policy.record_latency(0.5)
+    assert policy.level == SHEDDING  # healthy, but not for long enough yet
+    clock.now = 91
+    assert policy.level == DEGRADED
+    clock.now = 100
+    assert policy.level == DEGRADED  # recovery restarts for every step
+    clock.now = 121
+    assert policy.level == NORMAL
+    assert policy.metrics()["load_transitions"] == 4
+
+
+def test_policy_needs_enough_samples():
+    """
+    Tests that a single slow response does not degrade service.
+    """
+    policy = make_policy(FakeClock())
+    policy.record_latency(100.0)
+    assert policy.level == NORMAL
+
+
+@pytest.mark.asyncio
+async def test_gateway_overload_degrades_policy_and_serves_cache():
+    """
+    Simulates an overload: slow responses behind a single slot raise queue
+    waits and latencies, the gateway feeds them to the policy, and the
+    degraded policy makes cached intents be served without a request.
+    """
+    policy = AdaptiveLoadPolicy(queue_wait_slo=0.01, latency_slo=0.02, min_samples=3)
+    gateway = LLMGateway(max_concurrency=1, policy=policy)
+    request = AsyncMock()
+
+    async def slow():
+        await request()
+        await asyncio.sleep(0.05)
+        return "intent"
+
+    await asyncio.gather(*(gateway.call(slow, "prompt", cache_key=i % 2) for i in range(6)))
+    assert policy.level == SHEDDING
+    assert gateway.metrics()["load_level"] == "shedding"
+
+    calls = request.call_count
+    assert await gateway.call(slow, "prompt", cache_key=0, prefer_cache=policy.prefer_cache()) == "intent"
+    assert request.call_count == calls
+    assert gateway.metrics()["cached_answers"] == 1
+
+
+@pytest.mark.asyncio
+async def test_conversation_is_shed_and_history_shortened():
+    """
+    Tests that conversational replies use a shorter history under load and
+    are declined without a Gemini call when shedding.
+    """
+    from bot.handlers import get_conversational_response
+
+    clock = FakeClock()
+    policy = make_policy(clock)
+    model = MagicMock()
+    history = [{"role": "user", "parts": [str(i)]} for i in range(10)]
+
+    with patch('bot.handlers.load_policy', policy), \
+         patch('bot.handlers.get_model', return_value=model) as mock_get_model, \
+         patch('bot.handlers.gateway.send_message', new_callable=AsyncMock) as mock_send:
+        mock_send.return_value.text = "reply"
+        for _ in range(5):
+            policy.record_latency(3.0)
+        assert await get_conversational_response("hi", history) == "reply"
+        mock_get_model.assert_called_with("fast")
+        model.start_chat.assert_called_with(history=history[-4:])
+
+        for _ in range(5):
+            policy.record_latency(10.0)
+        response = await get_conversational_response("hi", history)
+        assert "перегружен" in response
+        assert mock_send.call_count == 1
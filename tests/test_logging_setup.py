@@ -0,0 +1,100 @@
+import asyncio
+import io
+import json
+import logging
+import threading
+import pytest
+
+from core.logging_setup import SamplingFilter, log_context, parse_levels, parse_rates, setup_logging
+
+@pytest.fixture
+def log_stream():
+    """Runs the logging pipeline into a buffer and restores the previous logging setup."""
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    saved_module_level = logging.getLogger("tests.quiet").level
+    stream = io.StringIO()
+    listener = setup_logging(level="INFO", levels={"tests.quiet": logging.WARNING},
+                             sampling={"chatty": 0.0}, json_lines=True, stream=stream)
+
+    def lines() -> list[dict]:
+        listener.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield lines
+    if listener._thread is not None:
+        listener.stop()
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+    logging.getLogger("tests.quiet").setLevel(saved_module_level)
+
+@pytest.mark.asyncio
+async def test_records_are_json_lines_with_context(log_stream):
+    """
+    Tests that records carry the log_context() fields, including in tasks
+    started inside the block, and their `extra` fields.
+    """
+    logger = logging.getLogger("tests.app")
+
+    async def tool():
+        logger.info("fetched %s", "weather", extra={"duration_ms": 12})
+
+    with log_context(update_id=7, user_id=123):
+        with log_context(stage="tools"):
+            await asyncio.create_task(tool())
+        logger.info("answered")
+    logger.info("outside")
+
+    fetched, answered, outside = log_stream()
+    assert fetched["message"] == "fetched weather"
+    assert fetched["level"] == "INFO"
+    assert fetched["logger"] == "tests.app"
+    assert (fetched["update_id"], fetched["user_id"], fetched["stage"]) == (7, 123, "tools")
+    assert fetched["duration_ms"] == 12
+    assert answered["user_id"] == 123 and "stage" not in answered
+    assert "user_id" not in outside
+
+def test_records_are_written_by_the_listener_thread(log_stream):
+    written_by = []
+    logger = logging.getLogger("tests.app")
+
+    class Unprintable:
+        def __repr__(self):
+            written_by.append(threading.current_thread().name)
+            return "value"
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed", extra={"detail": Unprintable()})
+
+    [record] = log_stream()
+    assert "ValueError: boom" in record["exc"]
+    assert record["detail"] == "value"
+    assert written_by and written_by[0] != threading.current_thread().name
+
+def test_module_levels_and_sampling(log_stream):
+    """
+    Tests per-module levels and that sampled events are dropped, except
+    warnings and errors.
+    """
+    logging.getLogger("tests.quiet").info("hidden")
+    logging.getLogger("tests.quiet").warning("shown")
+    logging.getLogger("tests.app").info("sampled out", extra={"event": "chatty"})
+    logging.getLogger("tests.app").error("kept", extra={"event": "chatty"})
+
+    assert [record["message"] for record in log_stream()] == ["shown", "kept"]
+
+def test_sampling_filter_keeps_the_configured_share():
+    values = iter([0.05, 0.5, 0.09, 0.95])
+    sampling = SamplingFilter({"cp_sk_request": 0.1}, rng=lambda: next(values))
+    records = [logging.makeLogRecord({"levelno": logging.INFO, "event": "cp_sk_request"}) for _ in range(4)]
+
+    kept = [record for record in records if sampling.filter(record)]
+    assert len(kept) == 2
+    assert kept[0].sample_rate == 0.1
+    assert sampling.dropped == 2
+
+def test_parse_settings():
+    assert parse_levels("apis=WARNING, bot.storage=debug") == {"apis": logging.WARNING, "bot.storage": logging.DEBUG}
+    assert parse_rates("message_handled=0.2,") == {"message_handled": 0.2}
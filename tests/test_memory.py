@@ -0,0 +1,92 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bot.memory import LongTermMemory, with_memories
+from core.config import config
+from core.embeddings import HashingEmbedder
+from core.vector_index import VectorIndex
+
+EXCHANGES = [
+    ("Моя собака — такса по кличке Бублик", "Какое милое имя!"),
+    ("Я учусь на факультете информатики", "Здорово, удачи в учебе!"),
+    ("Завтра у меня экзамен по линейной алгебре", "Удачи на экзамене!"),
+    ("Люблю гулять в парке у Дуная", "Отличное место для прогулок."),
+]
+
+@pytest.mark.asyncio
+async def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dimensions=256)
+    vectors = await embedder.embed(["Какая погода?", "Какая погода?", "расписание автобусов"])
+    assert vectors.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+def test_vector_index_searches_and_persists(tmp_path):
+    """
+    Tests top-k search in memory and on disk, and that a torn append is dropped on reopening.
+    """
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"запись {i}" for i in range(100)]
+    path = str(tmp_path / "1")
+
+    for index in (VectorIndex(8), VectorIndex(8, path)):
+        for i in range(0, 100, 7):  # Appended in uneven batches
+            index.add(vectors[i:i + 7], texts[i:i + 7])
+        results = index.search(vectors[42], k=3)
+        assert len(results) == 3
+        assert results[0] == (pytest.approx(1.0), "запись 42")
+        assert results[0][0] >= results[1][0] >= results[2][0]
+        assert all(text != "запись 99" for _, text in index.search(vectors[99], k=5, exclude_latest=1))
+
+    with open(path + ".vec", "ab") as f:
+        f.write(vectors[0].tobytes()[:20])  # A crash in the middle of an append
+    reopened = VectorIndex(8, path)
+    assert len(reopened) == 100
+    reopened.add(vectors[:1], ["новая"])
+    reopened = VectorIndex(8, path)
+    assert len(reopened) == 101
+    assert {text for _, text in reopened.search(vectors[0], k=2)} == {"новая", "запись 0"}
+
+EXAM = "Пользователь: Завтра у меня экзамен по линейной алгебре\nАссистент: Удачи на экзамене!"
+
+@pytest.mark.asyncio
+async def test_long_term_memory_recalls_relevant_exchanges(tmp_path):
+    memory = LongTermMemory(HashingEmbedder(), path=str(tmp_path))
+    for user_message, model_message in EXCHANGES:
+        await memory.remember(1, user_message, model_message)
+
+    assert await memory.recall(1, "Какой у меня завтра экзамен?") == [EXAM]
+    # The newest exchanges are still in the recent history
+    recalled = await memory.recall(1, "Люблю гулять в парке у Дуная", k=4, min_score=0, exclude_latest=1)
+    assert len(recalled) == 3 and "Дуная" not in "".join(recalled)
+    # Users without memories get nothing, without an embedding request
+    with patch.object(memory.embedder, "embed", AsyncMock()) as embed:
+        assert await memory.recall(2, "Какой у меня завтра экзамен?") == []
+    embed.assert_not_called()
+
+    reopened = LongTermMemory(HashingEmbedder(), path=str(tmp_path))
+    assert await reopened.recall(1, "Какой у меня завтра экзамен?") == [EXAM]
+
+@pytest.mark.asyncio
+async def test_conversational_response_includes_recalled_memories():
+    from bot.handlers import get_conversational_response
+
+    memory = LongTermMemory(HashingEmbedder(), path=None)
+    for user_message, model_message in EXCHANGES:
+        await memory.remember(7, user_message, model_message)
+    model = MagicMock()
+    chat = model.start_chat.return_value
+    chat.send_message_async = AsyncMock(return_value=MagicMock(text="По линейной алгебре."))
+
+    with patch("bot.handlers.get_model", return_value=model), patch("bot.handlers.long_term_memory", memory), \
+            patch.object(config, "settings", replace(config.settings, max_history_length=0)):
+        reply = await get_conversational_response("Какой у меня завтра экзамен?", [], user_id=7)
+
+    assert reply == "По линейной алгебре."
+    chat.send_message_async.assert_called_once_with(with_memories("Какой у меня завтра экзамен?", [EXAM]))
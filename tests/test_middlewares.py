@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram.types import Message, User, Chat
+
+from bot.middlewares import UserSerializationMiddleware, BACKPRESSURE_REPLY
+
+# Helper to create a mock message whose copies keep the updated text
+def create_mock_message(text: str, user_id: int = 123) -> MagicMock:
+    mock_message = MagicMock(spec=Message)
+    mock_message.from_user = User(id=user_id, is_bot=False, first_name="Test", last_name="User")
+    mock_message.chat = Chat(id=456, type="private")
+    mock_message.text = text
+    mock_message.answer = AsyncMock()
+    mock_message.model_copy.side_effect = lambda update: create_mock_message(update["text"], user_id)
+    return mock_message
+
+@pytest.mark.asyncio
+async def test_messages_of_one_user_are_serialized():
+    """
+    Tests that a user's messages never run the handler concurrently and keep their order.
+    """
+    middleware = UserSerializationMiddleware(max_pending=10)
+    active = 0
+    max_active = 0
+    handled = []
+
+    async def handler(event, data):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.01)
+        handled.append(event.text)
+        active -= 1
+
+    await asyncio.gather(*(middleware(handler, create_mock_message(str(i)), {}) for i in range(5)))
+
+    assert max_active == 1
+    assert handled == ["0", "1", "2", "3", "4"]
+
+@pytest.mark.asyncio
+async def test_different_users_run_concurrently():
+    """
+    Tests that serialization is per user, not global.
+    """
+    middleware = UserSerializationMiddleware()
+    active = 0
+    max_active = 0
+
+    async def handler(event, data):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    await asyncio.gather(*(middleware(handler, create_mock_message("hi", user_id=i), {}) for i in range(3)))
+
+    assert max_active == 3
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_one_handler_call():
+    """
+    Tests that messages sent within the debounce window are merged into one.
+    """
+    middleware = UserSerializationMiddleware(debounce_window=0.05)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.text)
+
+    async def send(text, delay):
+        await asyncio.sleep(delay)
+        await middleware(handler, create_mock_message(text), {})
+
+    await asyncio.gather(send("какая погода", 0), send("в Братиславе", 0.01), send("завтра", 0.02))
+
+    assert handled == ["какая погода\nв Братиславе\nзавтра"]
+    assert middleware.stats["llm_calls_saved"] == 2
+
+@pytest.mark.asyncio
+async def test_commands_are_not_coalesced():
+    """
+    Tests that a command ends the current burst and is handled on its own, after it.
+    """
+    middleware = UserSerializationMiddleware(debounce_window=0.05)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.text)
+
+    async def send(text, delay):
+        await asyncio.sleep(delay)
+        await middleware(handler, create_mock_message(text), {})
+
+    await asyncio.gather(send("привет", 0), send("/help", 0.01), send("как дела", 0.02))
+
+    assert handled == ["привет", "/help", "как дела"]
+
+@pytest.mark.asyncio
+async def test_backpressure_reply_when_queue_is_full():
+    """
+    Tests that messages beyond the per-user limit are rejected with a reply.
+    """
+    middleware = UserSerializationMiddleware(max_pending=1)
+    release = asyncio.Event()
+
+    async def wait_for_release(event, data):
+        await release.wait()
+
+    handler = AsyncMock(side_effect=wait_for_release)
+
+    first = asyncio.create_task(middleware(handler, create_mock_message("one"), {}))
+    await asyncio.sleep(0)
+    rejected = create_mock_message("two")
+    await middleware(handler, rejected, {})
+    release.set()
+    await first
+
+    handler.assert_called_once()
+    rejected.answer.assert_called_once_with(BACKPRESSURE_REPLY)
+    assert middleware.stats["rejected"] == 1
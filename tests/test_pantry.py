@@ -0,0 +1,128 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiogram.types import Chat, Message, User
+
+from bot.storage import create_storage
+from features.pantry_feature import add_items, list_items, remove_items
+from features.pantry_parser import PantryItem, detect_action, parse_action_items, parse_items
+
+# Helper to create a mock message object
+def create_mock_message(text: str) -> MagicMock:
+    mock_message = MagicMock(spec=Message)
+    mock_message.from_user = User(id=123, is_bot=False, first_name="Test")
+    mock_message.chat = Chat(id=456, type="private")
+    mock_message.text = text
+    mock_message.answer = AsyncMock()
+    return mock_message
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    store = create_storage(request.param, str(tmp_path / f"store.{request.param}"))
+    with patch("features.pantry_feature.get_storage", return_value=store):
+        yield store
+
+@pytest.mark.parametrize("text, items", [
+    ("добавь молоко, 2 яйца и хлеб", [("молоко", None, None), ("яйца", 2, "pcs"), ("хлеб", None, None)]),
+    ("Добавь в кладовку 1,5 л молока и пол кг сыра", [("молока", 1500, "ml"), ("сыра", 500, "g")]),
+    ("Закончились 500 г муки", [("муки", 500, "g")]),
+    ("Купил яйца, запиши", [("яйца", None, None)]),
+    ("Add 2 l milk and a dozen eggs to my pantry", [("milk", 2000, "ml"), ("eggs", 12, "pcs")]),
+    ("Pridaj chlieb do špajze", [("chlieb", None, None)]),
+    ("Kúpil som chlieb a 2 vajcia", [("chlieb", None, None), ("vajcia", 2, "pcs")]),
+    ("I bought a dozen eggs", [("eggs", 12, "pcs")]),
+    ("Добавь хлеб и покажи, что есть в кладовке", [("хлеб", None, None)]),
+    ("Убери сахар из списка продуктов. Какая погода?", [("сахар", None, None)]),
+])
+def test_parse_items(text, items):
+    assert [(item.name, item.quantity, item.unit) for item in parse_items(text)] == items
+
+def test_detect_action_and_inflected_names():
+    assert detect_action("Добавь молоко") == "add"
+    assert detect_action("Молоко закончилось") == "remove"
+    assert detect_action("Что в кладовке?") is None
+    assert PantryItem("молоко").key == PantryItem("молока").key
+    assert PantryItem("eggs").key == PantryItem("egg").key
+
+def test_mixed_command_splits_items_by_verb():
+    text = "Добавь молоко и убери яйца, ещё добавь 2 л сока"
+    assert [item.name for item in parse_action_items(text, "add")] == ["молоко", "сока"]
+    assert [item.name for item in parse_action_items(text, "remove")] == ["яйца"]
+    # Without a verb of the action, e.g. when Gemini reads the intent differently, every item is used
+    assert [item.name for item in parse_action_items("молоко и хлеб", "remove")] == ["молоко", "хлеб"]
+
+def test_pantry_inventory_merges_and_subtracts(store):
+    """
+    Tests set semantics for items, summing amounts per unit, and partial and full removal.
+    """
+    add_items(1, parse_items("добавь молоко, 2 яйца и 500 г муки"))
+    add_items(1, parse_items("купил 1 л молока, ещё 4 яйца и 1 кг муки"))
+    store.set(1, "city", "Bratislava")
+
+    entries = {entry["name"]: entry["amounts"] for entry in list_items(1)}
+    assert entries == {"молоко": {"ml": 1000}, "яйца": {"pcs": 6}, "муки": {"g": 1500}}
+
+    removed, left, missing = remove_items(1, parse_items("убери 2 яйца, молоко и сахар"))
+    assert [entry["name"] for entry in removed] == ["молоко"]
+    assert left == [{"name": "яйца", "amounts": {"pcs": 4}}]
+    assert [item.name for item in missing] == ["сахар"]
+    assert [entry["name"] for entry in list_items(1)] == ["муки", "яйца"]
+    assert store.get(1, "city") == "Bratislava"
+
+def test_pantry_commands_touch_only_named_items(tmp_path):
+    """
+    Tests that a command reads and writes the items it names, not the whole inventory.
+    """
+    store = create_storage("sqlite", str(tmp_path / "store.db"))
+    store.set_many([(1, f"pantry:item{i}", {"name": f"item{i}", "amounts": {}}) for i in range(1000)])
+    store.set_many = MagicMock(wraps=store.set_many)
+    with patch("features.pantry_feature.get_storage", return_value=store):
+        add_items(1, parse_items("добавь молоко и хлеб"))
+    [items] = store.set_many.call_args[0]
+    assert sorted(key for _, key, _ in items) == ["pantry:молок", "pantry:хлеб"]
+
+@pytest.mark.asyncio
+@patch('bot.handlers.detect_intent', new_callable=AsyncMock)
+async def test_message_handler_adds_all_items_once(mock_detect_intent, tmp_path):
+    """
+    Tests that a message naming several items adds each of them once, even
+    when Gemini returns one pantry request per item.
+    """
+    from bot.handlers import message_handler
+
+    mock_detect_intent.return_value = {"intents": [
+        {"intent": "pantry_add", "entities": {"item": "молоко"}},
+        {"intent": "pantry_add", "entities": {"item": "яйца"}},
+        {"intent": "pantry_list", "entities": {}},
+    ]}
+    store = create_storage("json", str(tmp_path / "user_data.json"))
+    message = create_mock_message("Добавь молоко и 2 яйца, и покажи кладовку")
+    with patch("features.pantry_feature.get_storage", return_value=store):
+        await message_handler(message)
+
+    reply = message.answer.call_args[0][0]
+    assert "Добавлено" in reply and "В кладовой:\n• Молоко\n• Яйца — 2 шт" in reply
+    assert store.get(123, "pantry:яйц") == {"name": "яйца", "amounts": {"pcs": 2}}
+
+@pytest.mark.asyncio
+@patch('bot.handlers.detect_intent', new_callable=AsyncMock)
+async def test_message_handler_applies_mixed_command_items_to_their_own_action(mock_detect_intent, tmp_path):
+    """
+    Tests that a message adding one item and removing another keeps each
+    item under its own verb.
+    """
+    from bot.handlers import message_handler
+
+    mock_detect_intent.return_value = {"intents": [
+        {"intent": "pantry_add", "entities": {"item": "молоко"}},
+        {"intent": "pantry_remove", "entities": {"item": "яйца"}},
+    ]}
+    store = create_storage("json", str(tmp_path / "user_data.json"))
+    store.set(123, "pantry:яйц", {"name": "яйца", "amounts": {}})
+    message = create_mock_message("Добавь молоко и убери яйца")
+    with patch("features.pantry_feature.get_storage", return_value=store):
+        await message_handler(message)
+
+    reply = message.answer.call_args[0][0]
+    assert reply == "✅ Добавлено в кладовую:\n• Молоко\n\n🗑️ Убрано из кладовой: яйца"
+    assert store.get_prefix(123, "pantry:") == {"pantry:молок": {"name": "молоко", "amounts": {}}}
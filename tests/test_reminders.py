@@ -0,0 +1,114 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock
+
+from bot.storage import JsonFileStorage
+from scheduler.reminders import REMINDER_KEY, ReminderEngine
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_engine(store=None, clock=None):
+    sent = []
+
+    async def send(user_id, message):
+        sent.append((user_id, message))
+
+    return ReminderEngine(send, store=store, clock=clock or FakeClock()), sent
+
+@pytest.mark.asyncio
+async def test_reminders_fire_in_time_order():
+    """
+    Tests that only due reminders fire, earliest first.
+    """
+    clock = FakeClock()
+    engine, sent = make_engine(clock=clock)
+    engine.schedule_many([(1, clock.now + 30, "c"), (2, clock.now + 10, "a"), (3, clock.now + 20, "b")])
+
+    clock.now += 25
+    assert await engine.fire_due() == 2
+    assert sent == [(2, "a"), (3, "b")]
+    assert len(engine) == 1
+    assert engine.next_fire_time() == clock.now + 5
+
+@pytest.mark.asyncio
+async def test_reschedule_and_cancel_by_user():
+    """
+    Tests that rescheduling replaces a user's reminder and cancelling removes it.
+    """
+    clock = FakeClock()
+    engine, sent = make_engine(clock=clock)
+    engine.schedule(1, clock.now + 10, "old")
+    engine.schedule(1, clock.now + 20, "new")
+    engine.schedule(2, clock.now + 10, "cancelled")
+    assert engine.cancel(2)
+    assert not engine.cancel(2)
+    assert engine.pending(1) == (clock.now + 20, "new")
+
+    clock.now += 30
+    await engine.fire_due()
+    assert sent == [(1, "new")]
+
+@pytest.mark.asyncio
+async def test_missed_reminders_are_dropped():
+    clock = FakeClock()
+    engine, sent = make_engine(clock=clock)
+    engine.schedule_many([(1, clock.now - 2 * engine.max_lateness, "stale"), (2, clock.now - 60, "late")])
+    await engine.fire_due()
+    assert sent == [(2, "late")]
+
+@pytest.mark.asyncio
+async def test_reminders_persist_in_store(tmp_path):
+    """
+    Tests that pending reminders survive a restart and fired ones are cleared from the store.
+    """
+    store = JsonFileStorage(str(tmp_path / "user_data.json"))
+    clock = FakeClock()
+    engine, _ = make_engine(store, clock)
+    engine.schedule_many([(1, clock.now + 10, "a"), (2, clock.now + 100, "b")])
+
+    clock.now += 20
+    await engine.fire_due()
+    assert store.get(1, REMINDER_KEY) is None
+
+    restarted, sent = make_engine(store, clock)
+    assert restarted.load() == 1
+    clock.now += 100
+    await restarted.fire_due()
+    assert sent == [(2, "b")]
+
+@pytest.mark.asyncio
+async def test_run_wakes_up_for_new_reminders():
+    """
+    Tests that the background task fires a reminder scheduled while it is sleeping.
+    """
+    engine, sent = make_engine(clock=time.time)
+    engine.start()
+    await asyncio.sleep(0)
+    engine.schedule(1, time.time() + 0.05, "wake up")
+    await asyncio.sleep(0.2)
+    engine.stop()
+    assert sent == [(1, "wake up")]
+
+@pytest.mark.asyncio
+async def test_render_replaces_messages_and_falls_back_on_error():
+    """
+    Tests that due reminders are sent as rendered at send time, and as scheduled when rendering fails.
+    """
+    clock = FakeClock()
+    engine, sent = make_engine(clock=clock)
+    engine.render = AsyncMock(side_effect=lambda due: [f"{message}!" for _, message in due])
+    engine.schedule_many([(1, clock.now + 10, "a"), (2, clock.now + 10, "b")])
+    clock.now += 20
+    await engine.fire_due()
+    assert sorted(sent) == [(1, "a!"), (2, "b!")]
+
+    engine.render = AsyncMock(side_effect=RuntimeError("calendar down"))
+    engine.schedule(3, clock.now, "c")
+    await engine.fire_due()
+    assert sent[-1] == (3, "c")
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+import pytest
+from unittest.mock import patch
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from core.resilience import CircuitBreaker, ResilientService, ServiceUnavailableError
+
+# Helper to run a stub API whose responses are scripted per request:
+# each entry is (delay in seconds, HTTP status), the last one repeats.
+async def start_stub_server(script: list) -> tuple[TestServer, list]:
+    served = []
+
+    async def handle(request: web.Request) -> web.Response:
+        delay, status = script[min(len(served), len(script) - 1)]
+        served.append(request.query.get("q"))
+        await asyncio.sleep(delay)
+        return web.json_response({"attempt": len(served), "weather": [{"description": "clear sky"}],
+                                  "main": {"temp": 20}}, status=status)
+
+    app = web.Application()
+    app.router.add_get("/data", handle)
+    server = TestServer(app)
+    await server.start_server()
+    return server, served
+
+def make_fetch(session: aiohttp.ClientSession, url: str):
+    async def fetch():
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await response.json()
+    return fetch
+
+@pytest.mark.asyncio
+async def test_slow_response_is_hedged_and_first_answer_wins():
+    """
+    Tests that a duplicate request is sent when the first one is slow, and
+    that the fast duplicate answers the call.
+    """
+    server, served = await start_stub_server([(2.0, 200), (0.0, 200)])
+    service = ResilientService("stub", timeout=5, min_samples=1)
+    service.latencies.record(0.05)  # recent p95: hedge after 50 ms
+    try:
+        async with aiohttp.ClientSession() as session:
+            started = time.monotonic()
+            data = await service.call(make_fetch(session, str(server.make_url("/data"))))
+            elapsed = time.monotonic() - started
+    finally:
+        await server.close()
+
+    assert data["attempt"] == 2
+    assert elapsed < 1.0
+    assert len(served) == 2
+    assert service.metrics()["hedges"] == 1
+    assert service.metrics()["hedge_wins"] == 1
+
+@pytest.mark.asyncio
+async def test_non_idempotent_request_is_not_hedged():
+    server, served = await start_stub_server([(0.3, 200)])
+    service = ResilientService("stub", timeout=5, min_samples=1, min_hedge_delay=0.01)
+    service.latencies.record(0.01)
+    try:
+        async with aiohttp.ClientSession() as session:
+            data = await service.call(make_fetch(session, str(server.make_url("/data"))), idempotent=False)
+    finally:
+        await server.close()
+    assert data["attempt"] == 1
+    assert len(served) == 1
+
+@pytest.mark.asyncio
+async def test_failed_attempt_is_replaced_by_hedge():
+    """
+    Tests that a 503 is answered by an immediate duplicate, and that 4xx
+    errors are raised without a duplicate or a circuit failure.
+    """
+    server, served = await start_stub_server([(0.0, 503), (0.0, 200), (0.0, 404)])
+    service = ResilientService("stub", timeout=5)
+    try:
+        async with aiohttp.ClientSession() as session:
+            fetch = make_fetch(session, str(server.make_url("/data")))
+            assert (await service.call(fetch))["attempt"] == 2
+            with pytest.raises(aiohttp.ClientResponseError) as error:
+                await service.call(fetch)
+    finally:
+        await server.close()
+    assert error.value.status == 404
+    assert len(served) == 3
+    assert service.metrics()["failures"] == 0
+
+@pytest.mark.asyncio
+async def test_timeouts_open_the_circuit():
+    """
+    Tests that a hung service times out, and that after repeated failures
+    calls fail fast without reaching it.
+    """
+    server, served = await start_stub_server([(10.0, 200)])
+    service = ResilientService("stub", timeout=0.2, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    try:
+        async with aiohttp.ClientSession() as session:
+            fetch = make_fetch(session, str(server.make_url("/data")))
+            for _ in range(2):
+                with pytest.raises(ServiceUnavailableError):
+                    await service.call(fetch)
+            requests_before = len(served)
+            started = time.monotonic()
+            with pytest.raises(ServiceUnavailableError):
+                await service.call(fetch)
+            assert time.monotonic() - started < 0.05
+    finally:
+        await server.close()
+    assert len(served) == requests_before
+    metrics = service.metrics()
+    assert metrics["timeouts"] == 2
+    assert metrics["circuit"] == "open"
+    assert metrics["circuit_rejections"] == 1
+
+@pytest.mark.asyncio
+async def test_get_weather_against_slow_stub_server():
+    """
+    Tests get_weather end to end against a stub API that hangs on the first request.
+    """
+    from apis.weather import get_weather
+
+    server, served = await start_stub_server([(10.0, 200), (0.0, 200)])
+    service = ResilientService("openweathermap", timeout=3, min_samples=1)
+    service.latencies.record(0.05)
+    try:
+        with patch.dict(os.environ, {"OPENWEATHER_API_KEY": "test_key"}), \
+             patch('apis.weather.WEATHER_URL', str(server.make_url("/data"))), \
+             patch('apis.weather.weather_service', service):
+            result = await get_weather("Bratislava")
+    finally:
+        await server.close()
+    assert result == "Погода в городе Bratislava: Clear sky. Температура: 20°C."
+    assert served == ["Bratislava", "Bratislava"]
@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram.types import User
+
+from bot.middlewares import ActivityMiddleware
+from bot.retention import DAY, LAST_ACTIVE_KEY, ActivityTracker, ColdArchive, StoreMaintenance
+from bot.storage import create_storage
+
+NOW = 1_800_000_000.0
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    return create_storage(request.param, str(tmp_path / f"store.{request.param}"))
+
+def test_maintenance_ages_out_histories_and_archives_inactive_users(store, tmp_path):
+    """
+    Tests a full pass in small slices: recent users are untouched, stale
+    histories are dropped, long-inactive users move to the archive, and
+    users never seen active start being counted.
+    """
+    store.set_many([
+        (1, LAST_ACTIVE_KEY, NOW - DAY), (1, "history", "recent"), (1, "city", "Bratislava"),
+        (2, LAST_ACTIVE_KEY, NOW - 40 * DAY), (2, "history", "old"), (2, "city", "Košice"),
+        (3, LAST_ACTIVE_KEY, NOW - 200 * DAY), (3, "history", "older"), (3, "google_refresh_token", "token"),
+        (4, "history", "unknown"),
+    ])
+    archive = ColdArchive(str(tmp_path / "archive.jsonl"))
+    maintenance = StoreMaintenance(store, archive, history_days=30, archive_days=180, slice_users=1, clock=lambda: NOW)
+
+    report = maintenance.run_pass()
+    assert (report["users"], report["histories_dropped"], report["archived"]) == (4, 1, 1)
+    assert report["size_after"] <= report["size_before"] and report["scan_after"] >= 0
+
+    assert store.get_many(1, ["history", "city"]) == {"history": "recent", "city": "Bratislava"}
+    assert store.get_many(2, ["history", "city"]) == {"city": "Košice"}
+    assert 3 not in store.user_ids() and 3 in archive
+    assert store.get_many(4, [LAST_ACTIVE_KEY, "history"]) == {LAST_ACTIVE_KEY: NOW, "history": "unknown"}
+
+    # The next pass waits for its time
+    assert maintenance.step() is None
+
+def test_user_active_during_the_step_is_not_archived(store, tmp_path):
+    """
+    Tests that a user who writes after the slice was read keeps their data
+    and is not restored from a stale archived copy later.
+    """
+    store.set_many([(3, LAST_ACTIVE_KEY, NOW - 200 * DAY), (3, "city", "Žilina")])
+    archive = ColdArchive(str(tmp_path / "archive.jsonl"))
+    archive_users = archive.archive
+
+    def archive_while_user_writes(users, archived_at):
+        archive_users(users, archived_at)
+        store.set_many([(3, LAST_ACTIVE_KEY, NOW), (3, "history", "new")])
+
+    archive.archive = archive_while_user_writes
+    report = StoreMaintenance(store, archive, history_days=30, archive_days=180, clock=lambda: NOW).run_pass()
+
+    assert report["archived"] == 0
+    assert store.get_many(3, ["city", "history"]) == {"city": "Žilina", "history": "new"}
+    assert 3 not in archive and 3 not in ColdArchive(archive.path)
+
+def test_returning_user_is_restored_once_a_day(store, tmp_path):
+    archive = ColdArchive(str(tmp_path / "archive.jsonl"))
+    archive.archive([(3, {"city": "Žilina", LAST_ACTIVE_KEY: NOW - 200 * DAY})], archived_at=NOW - DAY)
+    now = [NOW]
+    tracker = ActivityTracker(store, archive, clock=lambda: now[0])
+
+    assert tracker.seen(3)
+    tracker.record(3)
+    assert store.get_many(3, ["city", LAST_ACTIVE_KEY]) == {"city": "Žilina", LAST_ACTIVE_KEY: NOW}
+    assert 3 not in archive and 3 not in ColdArchive(archive.path)
+
+    now[0] += 60
+    assert not tracker.seen(3) and tracker.last_seen(3) == NOW + 60
+    now[0] += DAY
+    assert tracker.seen(3)
+
+@pytest.mark.asyncio
+async def test_activity_middleware_records_before_the_handler():
+    tracker = MagicMock()
+    tracker.seen.return_value = True
+    handler = AsyncMock()
+    await ActivityMiddleware(tracker)(handler, MagicMock(), {"event_from_user": User(id=7, is_bot=False, first_name="T")})
+    tracker.record.assert_called_once_with(7)
+    handler.assert_awaited_once()
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiogram.types import Chat, Message, User
+
+from core.speculation import Speculator
+from features.news_feature import predict_news_fetch
+from features.weather_feature import predict_weather_fetch
+
+def create_mock_message(text: str) -> MagicMock:
+    mock_message = MagicMock(spec=Message)
+    mock_message.from_user = User(id=123, is_bot=False, first_name="Test", last_name="User")
+    mock_message.chat = Chat(id=456, type="private")
+    mock_message.text = text
+    mock_message.answer = AsyncMock()
+    return mock_message
+
+def make_speculator(**kwargs):
+    fetches = []
+
+    async def fetch(city):
+        fetches.append(city)
+        await asyncio.sleep(0.01)
+        return f"weather in {city}"
+
+    def predictor(user_id, text, recent):
+        return (("weather", "bratislava"), lambda: fetch("Bratislava")) if "погода" in text else None
+
+    speculator = Speculator(**kwargs)
+    speculator.register(predictor)
+    return speculator, fetch, fetches
+
+@pytest.mark.asyncio
+async def test_matching_speculation_is_reused():
+    """
+    Tests that a handler asking for the predicted data gets the speculative fetch instead of a new one.
+    """
+    speculator, fetch, fetches = make_speculator()
+    assert speculator.start(1, "какая погода?")
+    await asyncio.sleep(0.02)
+
+    assert await speculator.result(1, ("weather", "bratislava"), fetch, "Bratislava") == "weather in Bratislava"
+    speculator.finish(1)
+
+    assert fetches == ["Bratislava"]
+    metrics = speculator.metrics()
+    assert (metrics["hits"], metrics["wasted"], metrics["hit_ratio"]) == (1, 0, 1.0)
+    assert metrics["latency_saved"] > 0
+
+@pytest.mark.asyncio
+async def test_mismatched_speculation_is_cancelled():
+    """
+    Tests that a different request fetches normally and the unused speculation is cancelled.
+    """
+    speculator, fetch, fetches = make_speculator()
+    speculator.start(1, "погода")
+    task = speculator._pending[1].task
+
+    assert await speculator.result(1, ("weather", "košice"), fetch, "Košice") == "weather in Košice"
+    speculator.finish(1)
+    await asyncio.sleep(0)
+
+    assert task.cancelled()
+    assert speculator.metrics()["waste_ratio"] == 1.0
+
+@pytest.mark.asyncio
+async def test_budget_limits_wasted_speculation():
+    """
+    Tests that wasted speculations use up the user's budget while hits refund it.
+    """
+    speculator, fetch, _ = make_speculator(budget=2, refill_per_minute=0)
+    for _ in range(2):
+        assert speculator.start(1, "погода")
+        speculator.finish(1)
+    assert not speculator.start(1, "погода")
+    assert speculator.counters["over_budget"] == 1
+    assert speculator.start(2, "погода")  # Budgets are per user
+
+    speculator = make_speculator(budget=1, refill_per_minute=0)[0]
+    for _ in range(3):
+        assert speculator.start(1, "погода")
+        await speculator.result(1, ("weather", "bratislava"), fetch, "Bratislava")
+        speculator.finish(1)
+
+@patch('features.weather_feature.get_user_data')
+def test_weather_predictor(mock_get_user_data):
+    """
+    Tests that weather is predicted from keywords or recent intents, for the saved city only.
+    """
+    mock_get_user_data.return_value = "Bratislava"
+    assert predict_weather_fetch(1, "Будет дождь?", [])[0] == ("weather", "bratislava")
+    assert predict_weather_fetch(1, "а завтра?", ["weather", "news", "weather"])[0] == ("weather", "bratislava")
+    assert predict_weather_fetch(1, "привет", ["weather", "unknown"]) is None
+
+    mock_get_user_data.return_value = None
+    assert predict_weather_fetch(1, "Какая погода?", []) is None
+
+def test_news_predictor():
+    assert predict_news_fetch(1, "Что нового в мире технологий?", [])[0] == ("news", "technology")
+    assert predict_news_fetch(1, "Покажи новости", [])[0] == ("news", "world")
+    assert predict_news_fetch(1, "Какая погода?", []) is None
+
+@pytest.mark.asyncio
+@patch('features.weather_feature.get_weather', new_callable=AsyncMock)
+@patch('features.weather_feature.get_user_data')
+async def test_weather_fetch_overlaps_intent_detection(mock_get_user_data, mock_get_weather):
+    """
+    Tests that the handler starts the weather fetch before intent detection returns and reuses it.
+    """
+    from bot.handlers import message_handler
+
+    mock_get_user_data.return_value = "Bratislava"
+    mock_get_weather.return_value = "Sunny"
+    calls_during_detection = []
+
+    async def detect_intent(text):
+        await asyncio.sleep(0.01)
+        calls_during_detection.append(mock_get_weather.await_count)
+        return {"intent": "weather", "entities": {}}
+
+    message = create_mock_message("Какая сегодня погода?")
+    with patch('bot.handlers.detect_intent', side_effect=detect_intent):
+        await message_handler(message)
+
+    assert calls_during_detection == [1]
+    mock_get_weather.assert_awaited_once_with("Bratislava")
+    message.answer.assert_called_once_with("Sunny")
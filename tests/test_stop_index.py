@@ -0,0 +1,59 @@
+import os
+import pytest
+
+from apis.stop_index import StopIndex, fold, levenshtein, load_stop_index
+
+GTFS_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "gtfs")
+
+@pytest.fixture(scope="module")
+def index():
+    return load_stop_index(GTFS_FIXTURE)
+
+def test_fold_strips_slovak_diacritics():
+    """
+    Tests that names differing only in case, diacritics and punctuation fold equally.
+    """
+    assert fold("Kamenné námestie") == "kamenne namestie"
+    assert fold("ĽUDOVÍT-ŠTÚR  ") == "ludovit stur"
+    assert fold("Dúbravka, Ôsma") == "dubravka osma"
+
+def test_levenshtein():
+    assert levenshtein("zochova", "zochva") == 1
+    assert levenshtein("kitten", "sitting") == 3
+    assert levenshtein("abc", "abcdefgh", max_distance=2) == 3
+
+def test_resolve_exact_and_folded_names(index):
+    """
+    Tests exact lookups, ignoring case and diacritics.
+    """
+    assert index.resolve("Kamenné námestie").name == "Kamenné námestie"
+    assert index.resolve("kamenne namestie").stop_id == "KN"
+    assert index.resolve("PATRONKA").stop_id == "PA"
+
+def test_resolve_unique_prefix_and_typos(index):
+    """
+    Tests that unique prefixes and small typos resolve, but ambiguous or unknown names do not.
+    """
+    assert index.resolve("botanicka").stop_id == "BZ"
+    assert index.resolve("namestie").stop_id == "KN"  # Word in the middle of the name
+    assert index.resolve("Zochva").stop_id == "ZO"
+    assert index.resolve("Hlavna stanca").stop_id == "HS"
+    assert index.resolve("mlyn") is None  # Mlynské nivy or Mlynská dolina
+    assert index.resolve("Petrzalka") is None
+
+def test_suggest_ranks_best_matches_first(index):
+    """
+    Tests the suggestions offered for ambiguous and misspelled names.
+    """
+    assert [s.name for s in index.suggest("mlyn")] == ["Mlynská dolina", "Mlynské nivy"]
+    assert index.suggest("Mlynske nyvy")[0].name == "Mlynské nivy"
+    assert index.suggest("") == []
+
+def test_stops_with_the_same_name_are_merged():
+    """
+    Tests that platforms sharing a name become one stop with several IDs.
+    """
+    index = StopIndex([("A1", "Zochova"), ("A2", "Zochova"), ("B", "Patrónka")])
+    assert len(index) == 2
+    assert index.resolve("zochova").stop_ids == ["A1", "A2"]
+    assert index.get("A2").name == "Zochova"
@@ -0,0 +1,96 @@
+import os
+import pytest
+import numpy as np
+from unittest.mock import patch
+
+from apis.geocoder import CachingGeocoder, StubGeocoder
+from apis.stop_locator import StopLocator, load_stop_locator
+from bot.storage import JsonFileStorage
+from features.nearby_stops import apply_nearby_stops, find_nearby_stops, refresh_nearby_stops
+
+GTFS_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "gtfs")
+
+@pytest.fixture(scope="module")
+def locator():
+    return load_stop_locator(GTFS_FIXTURE)
+
+def test_nearest_stops(locator):
+    """
+    Tests that the nearest stops are returned closest first, with distances in meters.
+    """
+    nearby = locator.nearest_stops(48.1450, 17.1050, k=2)
+    assert [stop["stop_id"] for stop in nearby] == ["ZO", "KN"]
+    assert 50 < nearby[0]["distance_m"] < 150
+
+def test_nearest_many_matches_single_queries(locator):
+    """
+    Tests the vectorized batch against the grid search for random points, including far away ones.
+    """
+    rng = np.random.default_rng(1)
+    lats = rng.uniform(48.10, 48.20, 200)
+    lons = rng.uniform(17.00, 17.20, 200)
+    indexes, distances = locator.nearest_many(lats, lons, k=3)
+    for row, (lat, lon) in enumerate(zip(lats, lons)):
+        single = locator.nearest(lat, lon, k=3)
+        assert [i for i, _ in single] == list(indexes[row])
+        assert np.allclose([d for _, d in single], distances[row])
+
+def test_platforms_with_the_same_name_count_once():
+    locator = StopLocator(["A1", "A2", "B"], ["Zochova", "Zochova", "Patrónka"],
+                          [48.1457, 48.1458, 48.1657], [17.1045, 17.1046, 17.0729])
+    assert [stop["stop_id"] for stop in locator.nearest_stops(48.1457, 17.1045, k=2)] == ["A1", "B"]
+
+@pytest.mark.asyncio
+async def test_caching_geocoder(tmp_path):
+    """
+    Tests that answers, including unknown addresses, are cached and persisted.
+    """
+    path = str(tmp_path / "geocode_cache.json")
+    geocoder = CachingGeocoder(StubGeocoder({"Hlavná 1, Bratislava": (48.15, 17.10)}), path)
+    assert await geocoder.geocode("hlavná 1,  Bratislava") == (48.15, 17.10)
+    assert await geocoder.geocode("Hlavná 1, Bratislava") == (48.15, 17.10)
+    assert await geocoder.geocode("Nowhere 7") is None
+    assert await geocoder.geocode("nowhere 7") is None
+    assert (geocoder.hits, geocoder.misses) == (2, 2)
+
+    reloaded = CachingGeocoder(StubGeocoder(), path)
+    assert await reloaded.geocode("Hlavná 1, Bratislava") == (48.15, 17.10)
+    assert reloaded.misses == 0
+
+@pytest.mark.asyncio
+async def test_refresh_nearby_stops_keeps_user_chosen_stops(locator, tmp_path):
+    """
+    Tests that the batch refresh updates automatically picked stops but not stops the user typed.
+    """
+    store = JsonFileStorage(str(tmp_path / "user_data.json"))
+    store.save_all({
+        "1": {"home_location": {"address": "A", "lat": 48.1450, "lon": 17.1050, "stop": "Patrónka",
+                                "stop_id": "PA", "stop_source": "nearest"}},
+        "2": {"home_location": {"address": "B", "lat": 48.1450, "lon": 17.1050, "stop": "Patrónka", "stop_id": "PA"},
+              "university_location": {"address": "C", "stop": "Zochova"}},
+    })
+    with patch("features.nearby_stops.get_stop_locator", return_value=locator), \
+         patch("features.nearby_stops.get_storage", return_value=store):
+        assert await refresh_nearby_stops() == 2
+
+    assert store.get(1, "home_location")["stop_id"] == "ZO"
+    assert store.get(2, "home_location")["stop_id"] == "PA"
+    assert store.get(2, "home_location")["nearby_stops"][0]["stop_id"] == "ZO"
+    assert "nearby_stops" not in store.get(2, "university_location")
+
+def test_nearby_stops_refresh_keeps_an_address_saved_meanwhile(locator, tmp_path):
+    """
+    Tests that a location saved while the stops were being computed keeps
+    its new address and gets no stops of the old one.
+    """
+    store = JsonFileStorage(str(tmp_path / "user_data.json"))
+    old = {"address": "A", "lat": 48.1450, "lon": 17.1050, "stop": "Patrónka", "stop_id": "PA", "stop_source": "nearest"}
+    store.save_all({"1": {"home_location": old, "university_location": dict(old, address="C")}})
+    with patch("features.nearby_stops.get_stop_locator", return_value=locator), \
+         patch("features.nearby_stops.get_storage", return_value=store):
+        found = find_nearby_stops()
+        store.set(1, "home_location", {"address": "New 5", "stop": "Hlavná"})
+        assert apply_nearby_stops(found) == 1
+
+    assert store.get(1, "home_location") == {"address": "New 5", "stop": "Hlavná"}
+    assert store.get(1, "university_location")["stop_id"] == "ZO"
@@ -0,0 +1,186 @@
+import pytest
+
+from bot.storage import JsonFileStorage, SQLiteStorage, create_storage
+from scheduler.leader import LeaderLease
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    return create_storage(request.param, str(tmp_path / f"store.{request.param}"))
+
+def test_storage_set_and_get(storage):
+    """
+    Tests that values round-trip through every backend.
+    """
+    storage.set(1, "city", "Bratislava")
+    storage.set(1, "home_location", {"address": "Main 1", "stop": "Centrum"})
+    storage.set(2, "city", "Košice")
+
+    assert storage.get(1, "city") == "Bratislava"
+    assert storage.get(1, "home_location") == {"address": "Main 1", "stop": "Centrum"}
+    assert storage.get(1, "missing") is None
+    assert storage.get(3, "city") is None
+    assert sorted(storage.user_ids()) == [1, 2]
+    assert storage.load_all()["2"] == {"city": "Košice"}
+
+def test_storage_overwrites_value(storage):
+    """
+    Tests that setting an existing key replaces its value.
+    """
+    storage.set(1, "city", "Bratislava")
+    storage.set(1, "city", "Žilina")
+    assert storage.get(1, "city") == "Žilina"
+
+def test_sqlite_storage_is_shared_between_connections(tmp_path):
+    """
+    Tests that two instances on the same database (e.g. two workers) see each other's writes.
+    """
+    path = str(tmp_path / "shared.db")
+    first = SQLiteStorage(path)
+    second = SQLiteStorage(path)
+
+    first.set(42, "city", "Nitra")
+    assert second.get(42, "city") == "Nitra"
+
+def test_sqlite_reads_in_threads_stay_out_of_open_write_transactions(tmp_path):
+    """
+    Tests that a read in a worker thread (batch jobs, the digest) uses its
+    own connection instead of joining a transaction the writer has open.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    storage = SQLiteStorage(str(tmp_path / "store.db"))
+    storage.set(1, "city", "Nitra")
+    with ThreadPoolExecutor(1) as pool, storage._lock, storage._conn:
+        storage._conn.execute("BEGIN")
+        storage._conn.execute("UPDATE user_data SET value = '\"Trnava\"' WHERE user_id = 1")
+        assert pool.submit(storage.get, 1, "city").result() == "Nitra"
+        assert pool.submit(lambda: list(storage.iter_users(["city"]))).result() == [[(1, {"city": "Nitra"})]]
+    assert storage.get(1, "city") == "Trnava"
+    storage.close()
+
+def test_create_storage_unknown_backend(tmp_path):
+    """
+    Tests that an unknown backend name is rejected.
+    """
+    with pytest.raises(ValueError):
+        create_storage("redis", str(tmp_path / "x"))
+
+def test_leader_lease_single_holder(tmp_path):
+    """
+    Tests that only one instance holds the lease until it is released.
+    """
+    path = str(tmp_path / "lease.db")
+    first = LeaderLease(path, holder="a")
+    second = LeaderLease(path, holder="b")
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert first.try_acquire()  # Renewal by the holder
+
+    first.release()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+
+def test_leader_lease_expires(tmp_path):
+    """
+    Tests that an expired lease can be taken over by another instance.
+    """
+    path = str(tmp_path / "lease.db")
+    first = LeaderLease(path, holder="a", ttl=-1)  # Expires immediately
+    second = LeaderLease(path, holder="b")
+
+    assert first.try_acquire()
+    assert second.try_acquire()
+
+def test_storage_set_many(storage):
+    """
+    Tests that a batch of writes lands like individual sets.
+    """
+    storage.set(1, "city", "Bratislava")
+    storage.set_many([(1, "city", "Žilina"), (2, "city", "Košice"), (2, "stop", None)])
+    assert storage.get(1, "city") == "Žilina"
+    assert storage.load_all()["2"] == {"city": "Košice", "stop": None}
+
+def test_storage_writes_from_threads_do_not_overwrite_each_other(storage):
+    """
+    Tests that writers in several threads (the retention job, activity
+    tracking, handlers) each keep their changes.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    storage.set_many([(user_id, "history", "old") for user_id in range(200)])
+
+    def write(user_id):
+        storage.set(user_id, "city", "Nitra")
+        storage.delete_many([(user_id, "history")])
+        storage.delete_users([1000 + user_id])
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(write, range(200)))
+    assert storage.load_all() == {str(user_id): {"city": "Nitra"} for user_id in range(200)}
+
+def test_storage_reads_and_deletes_selected_keys(storage):
+    """
+    Tests reading keys by name and by prefix, and deleting keys, without touching other users.
+    """
+    storage.set_many([(1, "pantry:молок", {"name": "молоко"}), (1, "pantry:хлеб", {"name": "хлеб"}),
+                      (1, "pantry", "x"), (1, "pantrz", "y"), (2, "pantry:хлеб", {"name": "хлеб"})])
+    assert storage.get_many(1, ["pantry:хлеб", "pantry:сыр"]) == {"pantry:хлеб": {"name": "хлеб"}}
+    assert storage.get_many(1, []) == {}
+    assert storage.get_prefix(1, "pantry:") == {"pantry:молок": {"name": "молоко"}, "pantry:хлеб": {"name": "хлеб"}}
+    assert len(storage.get_prefix(1, "")) == 4
+
+    storage.delete_many([(1, "pantry:хлеб"), (1, "pantry:сыр")])
+    assert storage.get_prefix(1, "pantry:") == {"pantry:молок": {"name": "молоко"}}
+    assert storage.get(2, "pantry:хлеб") == {"name": "хлеб"}
+
+def test_storage_iter_users_projects_keys_in_chunks(storage):
+    """
+    Tests that batch iteration yields every user once, in chunks, with only the requested keys.
+    """
+    storage.set_many(
+        [(user_id, "city", f"Město {user_id}") for user_id in range(1, 8)]
+        + [(3, "history", [{"role": "user", "parts": ["ahoj \"svet\"\n{}"]}]), (5, "home_location", {"stop": "Zochova"})]
+    )
+
+    chunks = list(storage.iter_users(["home_location", "city"], chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    users = dict(pair for chunk in chunks for pair in chunk)
+    assert sorted(users) == list(range(1, 8))
+    assert users[5] == {"home_location": {"stop": "Zochova"}, "city": "Město 5"}
+    assert users[3] == {"home_location": None, "city": "Město 3"}
+
+    everything = dict(pair for chunk in storage.iter_users() for pair in chunk)
+    assert everything[3]["history"][0]["parts"] == ["ahoj \"svet\"\n{}"]
+
+def test_json_storage_streams_across_read_blocks(tmp_path):
+    """
+    Tests the incremental parser with blocks smaller than a single value.
+    """
+    from bot.storage import _iter_json_object
+
+    storage = JsonFileStorage(str(tmp_path / "store.json"))
+    data = {str(user_id): {"name": "Žofia" * user_id, "n": [user_id, 1.5, None, True]} for user_id in range(20)}
+    storage.save_all(data)
+    with open(storage.path, encoding="utf-8") as f:
+        assert dict(_iter_json_object(f, read_size=7)) == data
+
+    with open(storage.path, "w", encoding="utf-8") as f:
+        f.write('{"1": {"city": "Bratislava"}, "2": {"ci')
+    assert list(storage.iter_users()) == []
+
+@pytest.mark.asyncio
+async def test_iter_users_filters_completed_setup(storage):
+    from unittest.mock import patch
+    from bot.user_data import SETUP_KEYS, has_completed_setup, iter_users
+
+    for user_id in (1, 2, 3):
+        storage.set(user_id, "history", ["..."])
+    for key in SETUP_KEYS:
+        storage.set(2, key, {"stop": "Zochova"} if key.endswith("location") else "token")
+    storage.set(3, "home_location", {"stop": "Patrónka"})
+
+    with patch("bot.user_data.get_storage", return_value=storage):
+        chunks = [chunk async for chunk in iter_users(SETUP_KEYS, chunk_size=1, where=has_completed_setup)]
+    assert chunks == [[(2, {"home_location": {"stop": "Zochova"}, "university_location": {"stop": "Zochova"},
+                            "google_refresh_token": "token"})]]
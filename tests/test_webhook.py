@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from bot.webhook import create_webhook_app, WEBHOOK_PATH, HEALTH_PATH, WEBHOOK_HANDLER_KEY
+
+SECRET = "test-secret"
+
+# Helper to build a fake Telegram update with a text message
+def create_fake_update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 456, "type": "private"},
+            "from": {"id": 123, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+def create_test_dispatcher(received: list, release: asyncio.Event | None = None) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def record(message: Message) -> None:
+        if release is not None:
+            await release.wait()
+        received.append(message.text)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+@pytest.mark.asyncio
+async def test_webhook_dispatches_update():
+    """
+    Tests that a fake update posted to the webhook reaches the handlers.
+    """
+    received = []
+    bot = Bot(token="123456:TEST-token")
+    app = create_webhook_app(bot, create_test_dispatcher(received), secret_token=SECRET)
+
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(
+            WEBHOOK_PATH,
+            json=create_fake_update(1, "hello"),
+            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+        )
+        assert response.status == 200
+        await asyncio.sleep(0.05)
+
+    assert received == ["hello"]
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_wrong_secret():
+    """
+    Tests that updates without the right secret token are rejected.
+    """
+    received = []
+    bot = Bot(token="123456:TEST-token")
+    app = create_webhook_app(bot, create_test_dispatcher(received), secret_token=SECRET)
+
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(
+            WEBHOOK_PATH,
+            json=create_fake_update(1, "hello"),
+            headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+        )
+        assert response.status == 401
+
+    assert received == []
+
+@pytest.mark.asyncio
+async def test_webhook_health_endpoint():
+    """
+    Tests the health endpoint reports the server as ready.
+    """
+    bot = Bot(token="123456:TEST-token")
+    app = create_webhook_app(bot, create_test_dispatcher([]), secret_token=SECRET)
+
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get(HEALTH_PATH)
+        assert response.status == 200
+        assert (await response.json()) == {"status": "ok", "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_webhook_shutdown_drains_in_flight_updates():
+    """
+    Tests that shutdown waits for updates that are still being processed.
+    """
+    received = []
+    release = asyncio.Event()
+    bot = Bot(token="123456:TEST-token")
+    app = create_webhook_app(bot, create_test_dispatcher(received, release), secret_token=SECRET)
+    handler = app[WEBHOOK_HANDLER_KEY]
+
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    response = await client.post(
+        WEBHOOK_PATH,
+        json=create_fake_update(1, "slow"),
+        headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+    )
+    assert response.status == 200
+    assert handler.in_flight == 1
+
+    # Let the handler finish only after shutdown has started
+    asyncio.get_running_loop().call_later(0.05, release.set)
+    await client.close()
+
+    assert handler.draining
+    assert received == ["slow"]
@@ -0,0 +1,66 @@
+import asyncio
+import queue
+import pytest
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from bot.workers import consume_updates, extract_user_id, route_update
+
+# Helper to build a fake Telegram update with a text message
+def create_fake_update(update_id: int, user_id: int, text: str = "hi") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+def test_extract_user_id():
+    """
+    Tests extracting the user from messages, callback queries and user-less updates.
+    """
+    assert extract_user_id(create_fake_update(1, 123)) == 123
+    callback = {"update_id": 2, "callback_query": {"id": "x", "from": {"id": 77}, "chat_instance": "c"}}
+    assert extract_user_id(callback) == 77
+    assert extract_user_id({"update_id": 3, "channel_post": {"chat": {"id": -1}}}) is None
+
+def test_route_update_is_stable_per_user():
+    """
+    Tests that every update of a user is routed to the same worker.
+    """
+    workers = {route_update(create_fake_update(i, 123), 4) for i in range(50)}
+    assert len(workers) == 1
+    spread = {route_update(create_fake_update(1, user_id), 4) for user_id in range(100)}
+    assert spread == {0, 1, 2, 3}
+
+@pytest.mark.asyncio
+async def test_consume_updates_preserves_per_user_order():
+    """
+    Tests that a user's updates are handled in order even when earlier ones are slower.
+    """
+    handled = []
+    router = Router()
+
+    @router.message()
+    async def slow_first(message: Message) -> None:
+        # Earlier messages sleep longer, so concurrent handling would reorder them.
+        await asyncio.sleep(0.03 - int(message.text) * 0.01)
+        handled.append((message.from_user.id, int(message.text)))
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    updates = queue.Queue()
+    for i in range(3):
+        updates.put(create_fake_update(i, 1, str(i)))
+        updates.put(create_fake_update(10 + i, 2, str(i)))
+    updates.put(None)
+
+    await consume_updates(updates, dp, Bot(token="123456:TEST-token"))
+
+    assert [n for user, n in handled if user == 1] == [0, 1, 2]
+    assert [n for user, n in handled if user == 2] == [0, 1, 2]